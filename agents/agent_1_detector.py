@@ -1,33 +1,188 @@
 import time
+T_INICIO = time.monotonic()  # Referencia del cronometraje de arranque (antes de los imports pesados)
 import cv2
 import zmq
 import base64
 import sys
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 # Fix de rutas para que no haya problemas con los imports
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from ultralytics import YOLO
 from core.database import DatabaseManager
+from core.bus import (Percepcion, PUERTO_VIDEO, PUERTO_PERCEPCION, PUERTO_FRAMES, PUERTO_VISORES, crear_publicador,
+                      crear_pull, publicar, publicar_json, topico_camara)
+from core.pipeline import Fases, LatestQueue, StageStats
+from core.tracking import CentroidTracker, CLASE_CELULAR
+from core.detector_backends import calentar, crear_backend, exportar_en_fondo
+from core.adaptive_inference import AdaptiveScheduler
+from core.frame_ring import FrameRing, nombre_anillo
+from core.stream_quality import Codificador, ControlCalidad
+from core.tracing import Trazador, nuevo_trace
+from core import config
+
+ARRANQUE = Fases(T_INICIO)
+ARRANQUE.marcar("imports")
+
+
+def fuentes_camaras(cfg):
+    """
+    Cámaras desde el entorno: SERPIENTE_CAMARAS="0,rtsp://10.0.0.5/stream,grabacion.mp4".
+    Las líneas de seguridad por cámara salen de la config (detector.lineas; SERPIENTE_LINEAS como valor inicial).
+    Sin SERPIENTE_CAMARAS se usa la primera webcam disponible (índice 0 o 1).
+    """
+    fuentes = [f.strip() for f in os.getenv("SERPIENTE_CAMARAS", "").split(",") if f.strip()]
+    return [(f"cam{i}", int(f) if f.isdigit() else f, cfg.detector.linea(f"cam{i}")) for i, f in enumerate(fuentes)]
+
+
+class Camara:
+    """Estado propio de cada cámara: captura, línea, tracker y planificador (el modelo es compartido)"""
+
+    def __init__(self, cam_id, fuente, line_x, backend, adaptativo=True, anillo=True):
+        self.id = cam_id
+        self.fuente = fuente
+        self.line_x = line_x
+        self.es_archivo = isinstance(fuente, str) and os.path.isfile(fuente)
+        self.cap = None
+        self.seq = 0
+        self.last_db_update = 0
+
+        self.q_captura = LatestQueue(maxsize=1)
+        self.q_encode = LatestQueue(maxsize=1)
+        self.stats_captura = StageStats(f"CAPTURA {cam_id}")
+        self.stats_encode = StageStats(f"ENCODE {cam_id}")
+        # fps / calidad / resolución del JPEG según lo que consumen sus visores
+        self.calidad = ControlCalidad(fps_defecto=float(os.getenv("STREAM_FPS_MAX", "15")))
+
+        self.tracker = CentroidTracker()
+        self.scheduler = AdaptiveScheduler(backend, line_x, activo=adaptativo)
+
+        # Frames crudos para consumidores locales (memoria compartida, sin JPEG)
+        self.anillo = FrameRing.crear(nombre_anillo(cam_id)) if anillo else None
+
+    def abrir(self):
+        self.cap = cv2.VideoCapture(self.fuente)
+        return self.cap.isOpened()
 
 
 class VisionCore:
-    def __init__(self):
-        print("🔌 [DETECTOR] Conectando a Base de Datos...")
-        self.db = DatabaseManager().get_client()
+    def __init__(self, db=None, writer=None, backend=None, bus=True, gestor_config=None):
+        """
+        db / writer / backend / gestor_config se pueden inyectar (replays, pruebas). Con bus=False no se abre
+        ningún socket: solo se usa paso() para procesar frames sueltos.
+        """
+        # Config recargable en caliente: se aplica entre lotes de frames (ver _aplicar_config)
+        self.gestor_config = gestor_config or config.gestor()
+        self.cfg = self.gestor_config.actual()
+        self.fases = ARRANQUE if bus else Fases()
 
-        print("🧠 [DETECTOR] Cargando YOLOv8...")
-        self.model = YOLO('yolov8n.pt')
+        # Cámaras configuradas (sin configuración: una webcam, como siempre)
+        fuentes = fuentes_camaras(self.cfg) if bus else []
 
-        print("📡 [DETECTOR] Abriendo socket ZMQ (Puerto 5555)...")
-        self.context = zmq.Context()
-        self.socket = self.context.socket(zmq.PUB)
-        self.socket.bind("tcp://*:5555")
+        # 1. Arranque en paralelo: BD, apertura de cámaras (un RTSP puede tardar segundos) y carga del modelo no
+        #    dependen entre sí; los sockets ZMQ se abren mientras tanto en este hilo.
+        #    Un único modelo para todas las cámaras; lote estático = número de cámaras.
+        #    Backend: SERPIENTE_BACKEND=auto|torch|onnx|openvino, SERPIENTE_PRECISION=fp32|fp16|int8
+        print("🔌 [DETECTOR] Conectando a Base de Datos | 📷 abriendo cámaras | 🧠 cargando YOLOv8 (en paralelo)...")
+        lote = max(1, len(fuentes))
+        with ThreadPoolExecutor(max_workers=3, thread_name_prefix="arranque") as pool:
+            f_bd = pool.submit(self.fases.medir, "bd", self._conectar_bd, db, writer)
+            f_capturas = pool.submit(self.fases.medir, "camaras", self._abrir_capturas, fuentes) if bus else None
+            f_modelo = pool.submit(self.fases.medir, "modelo", lambda: backend or crear_backend(lote=lote))
+            if bus:
+                self.fases.medir("bus", self._abrir_bus)
+            self.backend = f_modelo.result()
+            self.db, self.writer = f_bd.result()
+            capturas = f_capturas.result() if f_capturas else []
+        print(f"🧠 [DETECTOR] Backend de inferencia: {self.backend.nombre}")
 
-        # Configuración de la línea de seguridad
-        self.line_x = 300
+        # YOLO solo cuando hace falta: gating por movimiento, ROI en la línea y propagación entre detecciones
+        self.adaptativo = os.getenv("SERPIENTE_ADAPTATIVO", "1") != "0"
+        self.camaras = []
+        for cam_id, fuente, line_x, cap in capturas:
+            camara = Camara(cam_id, fuente, line_x, self.backend, self.adaptativo)
+            camara.cap = cap
+            self.camaras.append(camara)
         self.maintenance_mode = False
+        self._protegido = False  # Ya se publicó la primera percepción
+
+        # Pipeline por etapas: captura (por cámara) -> inferencia en lote (compartida) -> dibujo/JPEG (por cámara)
+        self.hay_frames = threading.Event()
+        self.stats_inferencia = StageStats("INFERENCIA")
+
+        if bus:
+            self._abrir_camaras()
+            # 2. Calentamiento: la primera inferencia paga la inicialización perezosa del modelo (fusión de capas,
+            #    reservas de memoria); mejor aquí que sobre el primer frame real.
+            self.fases.medir("calentamiento", calentar, self.backend, max(1, len(self.camaras)))
+            # 3. Enlazar la percepción es la señal de "listo" para el supervisor (sonda de puerto)
+            self.percepcion_socket = crear_publicador(self.context, PUERTO_PERCEPCION)
+            self.fases.marcar("listo")
+            print(f"⏱️ [ARRANQUE] Listo | {self.fases.resumen()}")
+            # Sin caché ONNX: se genera en segundo plano para que el próximo arranque no cargue torch
+            exportar_en_fondo(self.backend)
+        # Histogramas de latencia por etapa (publicados al servidor de métricas si hay bus)
+        self.traza = Trazador("detector", self.context if bus else None)
+        self.traza.agregar("bd_escritura", self.writer.histograma)
+
+    def _conectar_bd(self, db, writer):
+        db = db or DatabaseManager().get_client()
+        # Supabase solo como sumidero de auditoría (write-behind, fuera del lazo de control)
+        return db, writer or DatabaseManager().get_writer("DETECTOR")
+
+    def _abrir_bus(self):
+        """
+        Sockets ZMQ del detector (video, feedback de visores y avisos de frames crudos).
+        La percepción (PUERTO_PERCEPCION) se enlaza al final del arranque: marca que el detector está listo.
+        """
+        print(f"📡 [DETECTOR] Abriendo sockets ZMQ (Video {PUERTO_VIDEO} | Frames {PUERTO_FRAMES})...")
+        self.context = zmq.Context()
+        # XPUB: el detector se entera de qué cámaras tienen visores y solo codifica JPEG para esas
+        self.socket = self.context.socket(zmq.XPUB)
+        self.socket.setsockopt(zmq.SNDHWM, 10)
+        self.socket.setsockopt(zmq.LINGER, 0)
+        self.socket.bind(f"tcp://*:{PUERTO_VIDEO}")
+        self.suscripciones = set()  # Tópicos con al menos un visor (b"" = todas las cámaras)
+        self._lock_video = threading.Lock()  # Los hilos de encode de cada cámara comparten el socket de video
+        self.feedback_socket = crear_pull(self.context, PUERTO_VISORES)  # Consumo de los visores (mismo lock)
+        self.codificador = Codificador()
+        self.frames_socket = crear_publicador(self.context, PUERTO_FRAMES)
+        self._lock_frames = threading.Lock()  # Compartido por los hilos de captura
+
+    def _sync_loop(self):
+        """Lectura periódica de modo mantenimiento (hilo propio, fuera del pipeline)"""
+        while True:
+            try:
+                data = self.db.table("estado_maquina").select("modo_mantenimiento").eq("id", 1).maybe_single().execute()
+                if data and data.data:
+                    self.maintenance_mode = data.data['modo_mantenimiento']
+            except Exception:
+                pass
+            time.sleep(self.cfg.detector.intervalo_mantenimiento_s)
+
+    def _aplicar_config(self):
+        """Toma la config vigente; si cambió, mueve las líneas de las cámaras (entre frames, nunca a mitad)"""
+        cfg = self.gestor_config.actual()
+        if cfg.version != self.cfg.version:
+            for camara in self.camaras:
+                camara.line_x = camara.scheduler.line_x = cfg.detector.linea(camara.id)
+            print(f"🔧 [DETECTOR] Config {cfg.version} aplicada | líneas "
+                  f"{ {c.id: c.line_x for c in self.camaras} }")
+            self.cfg = cfg
+        return cfg
+
+    def _registrar_percepcion(self, camara, percepcion):
+        """Fila de auditoría en mundo_percepcion (write-behind)"""
+        distancia_relativa = camara.line_x - percepcion.punto_medio_x
+        self.writer.insert("mundo_percepcion", {
+            "hay_persona": True,
+            "punto_medio_x": percepcion.punto_medio_x,
+            "tiene_celular": percepcion.tiene_celular,
+            "zona_peligro": percepcion.punto_medio_x > camara.line_x,
+            "zona_advertencia": 0 < distancia_relativa < self.cfg.detector.zona_advertencia_px
+        })
 
     def get_camera(self):
         # Intentamos abrir la cámara (índice 0 o 1)
@@ -38,104 +193,247 @@ class VisionCore:
                 return cap
         return None
 
-    def run(self):
-        cap = self.get_camera()
-        if not cap:
-            print("❌ ERROR: No hay cámara. El detector no puede iniciar.")
-            return
+    def _abrir_capturas(self, fuentes):
+        """Abre todas las capturas a la vez. Devuelve [(cam_id, fuente, line_x, cap)]"""
+        if not fuentes:
+            cap = self.get_camera()
+            return [("cam0", 0, self.cfg.detector.linea("cam0"), cap)] if cap else []
+        with ThreadPoolExecutor(max_workers=len(fuentes), thread_name_prefix="abrir-camara") as pool:
+            caps = list(pool.map(cv2.VideoCapture, [fuente for _, fuente, _ in fuentes]))
+        return [(cam_id, fuente, line_x, cap) for (cam_id, fuente, line_x), cap in zip(fuentes, caps)]
 
-        print("👁️ [DETECTOR] Iniciando bucle de visión de alta velocidad...")
-        last_state_check = 0
-        last_db_update = 0
+    def _abrir_camaras(self):
+        """Deja solo las cámaras con captura abierta (las que fallaron en el arranque se reintentan una vez)"""
+        abiertas = []
+        for camara in self.camaras:
+            if (camara.cap is not None and camara.cap.isOpened()) or camara.abrir():
+                print(f"✅ Cámara {camara.id} abierta ({camara.fuente}) | línea x={camara.line_x}")
+                abiertas.append(camara)
+            else:
+                print(f"⚠️ No se pudo abrir {camara.id} ({camara.fuente}), se omite.")
+                camara.anillo.cerrar()
+        self.camaras = abiertas
+        return bool(abiertas)
 
+    # --- ETAPA 1: CAPTURA (un hilo por cámara) ---
+    def _capture_loop(self, camara):
+        intervalo = 0.0
+        if camara.es_archivo:
+            # Los archivos se reproducen a su ritmo real (y en bucle), no tan rápido como se pueda leer
+            intervalo = 1.0 / (camara.cap.get(cv2.CAP_PROP_FPS) or 30.0)
         while True:
-            ret, frame = cap.read()
+            t0 = time.time()
+            ret, frame = camara.cap.read()
+            ts_captura = time.time()
+            mono_captura = time.monotonic()
             if not ret:
-                print("⚠️ Fallo de lectura de cámara.")
+                if camara.es_archivo:
+                    camara.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                    continue
+                print(f"⚠️ Fallo de lectura de cámara {camara.id}.")
                 time.sleep(0.5)
+                if not isinstance(camara.fuente, int):
+                    # RTSP/HTTP: se reabre el stream
+                    camara.cap.release()
+                    camara.abrir()
                 continue
 
             # Redimensionamos para que el YOLO vuele
             frame = cv2.resize(frame, (640, 480))
-
             frame = cv2.flip(frame, 1)
 
-            # --- 1. SINCRONIZACIÓN DE ESTADO (BD) ---
-            if time.time() - last_state_check > 2:
-                try:
-                    data = self.db.table("estado_maquina").select("modo_mantenimiento").eq("id",
-                                                                                           1).maybe_single().execute()
-                    if data and data.data:
-                        self.maintenance_mode = data.data['modo_mantenimiento']
-                except:
-                    pass
-                last_state_check = time.time()
-
-            # --- 2. INFERENCIA CON YOLO ---
-            # Detectamos personas (class 0) y celulares (class 67)
-            results = self.model(frame, verbose=False, classes=[0, 67])
-
-            # --- 3. DIBUJADO Y CÁLCULO DE CENTROS ---
-            color_ui = (0, 255, 0) if self.maintenance_mode else (0, 0, 255)
-            cv2.line(frame, (self.line_x, 0), (self.line_x, 480), color_ui, 2)
-
-            detected = False
-            punto_medio_x = 0
-            has_phone = False
-
-            for r in results:
-                for box in r.boxes:
-                    cls = int(box.cls[0])
-                    x1, y1, x2, y2 = map(int, box.xyxy[0])
-
-                    if cls == 67:  # Celular
-                        has_phone = True
-                        cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 255), 2)
-                        cv2.putText(frame, "CELL", (x1, y1 - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 2)
-
-                    if cls == 0:  # Persona
-                        detected = True
-                        # Calculamos el centro exacto del bounding box
-                        cx = int((x1 + x2) / 2)
-                        cy = int((y1 + y2) / 2)
-                        punto_medio_x = cx  # Este es el valor que nos interesa
-
-                        # Marcamos el punto medio con un círculo para visualización
-                        cv2.circle(frame, (cx, cy), 5, (255, 0, 0), -1)
-
-                        # Lógica de color según posición del centro respecto a la línea
-                        # (Asumiendo que cruzar hacia la derecha es peligro)
-                        es_peligro = cx > self.line_x
-                        col = (0, 0, 255) if es_peligro else (0, 255, 0)
-
-                        cv2.rectangle(frame, (x1, y1), (x2, y2), col, 2)
-                        cv2.putText(frame, f"MID: {cx}", (x1, y1 - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, col, 2)
-
-            # --- 4. ENVÍO A BD (Actualizando a Punto Medio) ---
-            if detected and (time.time() - last_db_update > 0.8):
-                try:
-                    # Determinamos zonas basadas en el punto medio absoluto
-                    # zona_peligro: el centro cruzó la línea
-                    # zona_advertencia: el centro está a menos de 80px de la línea
-                    distancia_relativa = self.line_x - punto_medio_x
-
-                    self.db.table("mundo_percepcion").insert({
-                        "hay_persona": True,
-                        "punto_medio_x": punto_medio_x,  # REEMPLAZO DE DISTANCIA_LINEA
-                        "tiene_celular": has_phone,
-                        "zona_peligro": punto_medio_x > self.line_x,
-                        "zona_advertencia": 0 < distancia_relativa < 80
-                    }).execute()
-
-                    print(f"📡 BD Sync | Punto Medio: {punto_medio_x}px | Cel: {has_phone}")
-                    last_db_update = time.time()
-                except Exception as e:
-                    print(f"⚠️ Error BD: {e}")
-
-            # --- 5. TRANSMISIÓN STREAMING (ZMQ) ---
-            _, buffer = cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), 60])
-            self.socket.send(buffer)
+            camara.seq += 1
+            # Frame crudo al anillo compartido + aviso (slot, seq) a los consumidores locales
+            slot = camara.anillo.escribir(frame, camara.seq, ts_captura)
+            with self._lock_frames:
+                publicar_json(self.frames_socket, camara.id, {"anillo": camara.anillo.shm.name, "slot": slot,
+                                                              "seq": camara.seq, "ts": ts_captura})
+            camara.q_captura.put((camara.seq, ts_captura, mono_captura, frame))
+            self.hay_frames.set()
+            camara.stats_captura.tick(time.time() - ts_captura)
+            self.traza.desde("captura", mono_captura)
+
+            if intervalo:
+                time.sleep(max(0.0, intervalo - (time.time() - t0)))
+
+    # --- ETAPA 2: INFERENCIA EN LOTE + PUBLICACIÓN DE PERCEPCIÓN ---
+    def _inference_loop(self):
+        while True:
+            if not self.hay_frames.wait(timeout=1.0):
+                continue
+            self.hay_frames.clear()
+            # El frame más reciente de cada cámara que tenga uno nuevo
+            lote = []
+            for camara in self.camaras:
+                item = camara.q_captura.get(timeout=0)
+                if item is not None:
+                    lote.append((camara, *item))
+            if not lote:
+                continue
+            t0 = time.time()
+            cfg = self._aplicar_config()
+
+            # 1. Cada planificador decide si su cámara necesita modelo (frame completo, ROI o nada)
+            planes = [camara.scheduler.planificar(frame, ts) for camara, _, ts, _, frame in lote]
+            imagenes = [plan[0] for plan in planes if plan[0] is not None]
+
+            # 2. Un solo forward para todas las cámaras: personas (0) y celulares (67)
+            t_modelo = time.monotonic()
+            crudas = iter(self.backend.detectar_lote(imagenes) if imagenes else [])
+            if imagenes:
+                self.traza.desde("inferencia", t_modelo)
+
+            for (camara, seq, ts_captura, mono_captura, frame), plan in zip(lote, planes):
+                detecciones, _ = camara.scheduler.completar(plan, next(crudas) if plan[0] is not None else None)
+                percepcion = self.percibir(camara, seq, ts_captura, detecciones, mono_captura)
+
+                # Publicación inmediata al Cerebro en el tópico de la cámara (antes de dibujar o codificar)
+                publicar_json(self.percepcion_socket, camara.id, percepcion.to_dict())
+                self.traza.desde("captura_a_percepcion", mono_captura)
+                if not self._protegido:
+                    self._protegido = True
+                    self.fases.marcar("primer_frame")
+                    print(f"⏱️ [ARRANQUE] Primer frame protegido | {self.fases.resumen()}")
+
+                # Auditoría asíncrona en BD (máx. una fila por intervalo y cámara, nunca bloquea el lazo)
+                if percepcion.hay_persona and (time.time() - camara.last_db_update > cfg.detector.intervalo_bd_s):
+                    self._registrar_percepcion(camara, percepcion)
+                    print(f"📡 BD Sync | {camara.id} | Punto Medio: {percepcion.punto_medio_x}px | "
+                          f"Cel: {percepcion.tiene_celular} | Seq: {seq}")
+                    camara.last_db_update = time.time()
+
+                camara.q_encode.put((frame, detecciones, percepcion))
+            self.stats_inferencia.tick(time.time() - t0)
+
+    def paso(self, camara, seq, ts_captura, frame):
+        """Un frame de una cámara, de forma síncrona (sin colas ni sockets): detección + tracking"""
+        mono_captura = time.monotonic()
+        self._aplicar_config()
+        detecciones, modo = camara.scheduler.detectar(frame, ts_captura)
+        return self.percibir(camara, seq, ts_captura, detecciones, mono_captura), detecciones, modo
+
+    def percibir(self, camara, seq, ts_captura, detecciones, mono_captura=0.0):
+        """Tracking de todas las personas del frame a partir de las cajas (cls, x1, y1, x2, y2, conf)"""
+        tracks = camara.tracker.actualizar(detecciones, ts_captura)
+        percepcion = Percepcion(seq=seq, ts=ts_captura, camara=camara.id, line_x=camara.line_x,
+                                hay_persona=bool(tracks), personas=[t.to_dict() for t in tracks],
+                                trace=nuevo_trace(camara.id, seq), mono_captura=mono_captura,
+                                config=self.cfg.version)
+        percepcion.tiene_celular = any(d[0] == CLASE_CELULAR for d in detecciones)
+        if tracks:
+            # Resumen para auditoría: la persona más adentrada hacia la zona de peligro
+            lider = max(tracks, key=lambda t: t.cx)
+            percepcion.punto_medio_x = int(lider.cx)
+            percepcion.punto_medio_y = int(lider.cy)
+        return percepcion
+
+    # --- ETAPA 3: DIBUJADO + JPEG + STREAMING (ZMQ, un hilo por cámara) ---
+    def _hay_visores(self, camara):
+        """Procesa altas/bajas de suscripción del XPUB (llamar con _lock_video tomado)"""
+        while True:
+            try:
+                evento = self.socket.recv(zmq.NOBLOCK)
+            except zmq.Again:
+                break
+            if evento[:1] == b"\x01":
+                self.suscripciones.add(evento[1:])
+            elif evento[:1] == b"\x00":
+                self.suscripciones.discard(evento[1:])
+        return b"" in self.suscripciones or topico_camara(camara.id) in self.suscripciones
+
+    def _leer_feedback(self):
+        """Consumo real reportado por los servidores de stream (llamar con _lock_video tomado)"""
+        while True:
+            try:
+                datos = self.feedback_socket.recv_json(zmq.NOBLOCK)
+            except zmq.Again:
+                break
+            camara = next((c for c in self.camaras if c.id == datos.get("camara")), None)
+            if camara:
+                camara.calidad.feedback(datos)
+
+    def _encode_loop(self, camara):
+        while True:
+            item = camara.q_encode.get(timeout=1.0)
+            if item is None:
+                continue
+            with self._lock_video:
+                self._leer_feedback()
+                visores = self._hay_visores(camara)
+            # Nadie mira esta cámara (ni dibujo ni JPEG), o los visores no consumen a este ritmo
+            if not visores or not camara.calidad.toca_codificar():
+                continue
+            frame, detecciones, percepcion = item
+            t0 = time.time()
+            t_mono = time.monotonic()
+
+            self.dibujar(frame, camara.line_x, detecciones, percepcion.personas)
+            if camara.calidad.escala < 1.0:
+                frame = cv2.resize(frame, None, fx=camara.calidad.escala, fy=camara.calidad.escala,
+                                   interpolation=cv2.INTER_AREA)
+            buffer = self.codificador.codificar(frame, camara.calidad.calidad)
+            with self._lock_video:
+                publicar(self.socket, camara.id, buffer)
+            camara.stats_encode.tick(time.time() - t0)
+            self.traza.desde("codificacion", t_mono)
+            self.traza.desde("captura_a_video", percepcion.mono_captura)
+
+    def dibujar(self, frame, line_x, detecciones, personas):
+        color_ui = (0, 255, 0) if self.maintenance_mode else (0, 0, 255)
+        cv2.line(frame, (line_x, 0), (line_x, 480), color_ui, 2)
+
+        for cls, x1, y1, x2, y2, *_ in detecciones:
+            if cls == CLASE_CELULAR:
+                cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 255), 2)
+                cv2.putText(frame, "CELL", (x1, y1 - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 2)
+
+        for persona in personas:
+            x1, y1, x2, y2 = persona["caja"]
+            cx, cy = persona["x"], persona["y"]
+            # Marcamos el punto medio con un círculo para visualización
+            cv2.circle(frame, (cx, cy), 5, (255, 0, 0), -1)
+
+            # Lógica de color según posición del centro respecto a la línea
+            # (Asumiendo que cruzar hacia la derecha es peligro)
+            es_peligro = cx > line_x
+            col = (0, 0, 255) if es_peligro else (0, 255, 0)
+
+            cv2.rectangle(frame, (x1, y1), (x2, y2), col, 2)
+            cv2.putText(frame, f"#{persona['id']} MID: {cx}", (x1, y1 - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, col, 2)
+
+    def run(self):
+        # Las cámaras ya se abrieron en el arranque (ver __init__)
+        if not self.camaras:
+            print("❌ ERROR: No hay cámara. El detector no puede iniciar.")
+            return
+
+        print(f"👁️ [DETECTOR] Iniciando pipeline de visión para {len(self.camaras)} cámara(s) "
+              f"(captura | inferencia en lote | encode {self.codificador.nombre} | BD)...")
+        etapas = [threading.Thread(target=self._inference_loop, daemon=True, name="inferencia")]
+        for camara in self.camaras:
+            etapas.append(threading.Thread(target=self._capture_loop, args=(camara,), daemon=True,
+                                           name=f"captura-{camara.id}"))
+            etapas.append(threading.Thread(target=self._encode_loop, args=(camara,), daemon=True,
+                                           name=f"encode-{camara.id}"))
+        threading.Thread(target=self._sync_loop, daemon=True, name="sync-bd").start()
+        for t in etapas:
+            t.start()
+
+        # El hilo principal solo supervisa y reporta métricas por etapa
+        try:
+            while all(t.is_alive() for t in etapas):
+                time.sleep(5)
+                print(f"📊 [PIPELINE] {self.stats_inferencia.resumen()} | {self.writer.resumen()}")
+                for camara in self.camaras:
+                    print(f"📊 [PIPELINE] {camara.stats_captura.resumen(camara.q_captura)} | "
+                          f"{camara.stats_encode.resumen(camara.q_encode)} {camara.calidad.resumen()} "
+                          f"{camara.scheduler.resumen()}")
+                print(f"⏱️ [LATENCIA] {self.traza.resumen()}")
+            print("❌ [DETECTOR] Una etapa del pipeline terminó inesperadamente.")
+        finally:
+            for camara in self.camaras:
+                camara.anillo.cerrar()
 
 
 if __name__ == "__main__":
-    VisionCore().run()
\ No newline at end of file
+    VisionCore().run()
@@ -1,118 +1,77 @@
 import time
 import sys
 import os
-import math
+import uuid
 from datetime import datetime, timezone
 
+import zmq
+
 # Fix de rutas para el entorno local
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-try:
-    from core.database import DatabaseManager
-except ImportError:
-    # Mock para pruebas sin infraestructura
-    class DatabaseManager:
-        def get_client(self): return self
-
-        def table(self, _): return self
-
-        def select(self, _): return self
-
-        def order(self, *args, **kwargs): return self
-
-        def limit(self, _): return self
-
-        def eq(self, *args, **kwargs): return self
-
-        def maybe_single(self): return self
-
-        def execute(self):
-            class Res: data = [{"id": 1, "punto_medio_x": 280, "tiene_celular": False}]
-
-            return Res()
-
-        def update(self, _): return self
-
-        def insert(self, _): return self
-
-
-# --- MOTOR DE LÓGICA DIFUSA (FUZZY LOGIC CORE) ---
-
-def trap_mf(x, a, b, c, d):
-    """Función de pertenencia Trapezoidal"""
-    return max(0, min((x - a) / (b - a) if b > a else 1, 1, (d - x) / (d - c) if d > c else 1))
-
-
-def logic_fuzzy_risk(punto_x, line_x, vel, cel):
-    """
-    Motor de Inferencia Difusa Real (12 Reglas).
-    Variables de Entrada:
-    - dist_rel: Distancia del punto medio a la línea de seguridad (line_x - punto_x).
-    - vel: Velocidad de aproximación (px/s).
-    """
-    dist_rel = line_x - punto_x
-
-    # 1. FUZZIFICACIÓN: Definición de Conjuntos (Membership Functions)
-
-    # Distancia (px)
-    d_critica = trap_mf(dist_rel, -500, -500, 0, 30)  # Ya cruzó o está a nada
-    d_peligro = trap_mf(dist_rel, 20, 50, 80, 120)  # En la zona naranja
-    d_segura = trap_mf(dist_rel, 100, 200, 1000, 1000)  # Lejos
-
-    # Velocidad (px/s) - Positivo es que se acerca a la línea
-    v_asustado = trap_mf(vel, 60, 100, 1000, 1000)  # Viene volando
-    v_normal = trap_mf(vel, 5, 20, 40, 60)  # Caminando normal
-    v_quieto = trap_mf(vel, -15, -5, 5, 15)  # Parado o micro-movimientos
-    v_se_va = trap_mf(vel, -1000, -1000, -30, -10)  # Se está alejando
-
-    # 2. BASE DE REGLAS (Heurística de 12 Reglas)
-    # Formato: (Grado de Verdad, Valor de Riesgo)
-
-    reglas = [
-        # Bloque: Distancia Crítica
-        (min(d_critica, v_asustado), 100),  # Regla 1: Encima y rápido -> CATÁSTROFE
-        (min(d_critica, v_normal), 98),  # Regla 2: Encima y normal -> PARADA YA
-        (min(d_critica, v_quieto), 95),  # Regla 3: Encima y quieto -> RIESGO EXTREMO
-        (min(d_critica, v_se_va), 80),  # Regla 4: Encima pero saliendo -> ALERTA MÁXIMA
-
-        # Bloque: Distancia Peligro
-        (min(d_peligro, v_asustado), 90),  # Regla 5: Cerca y volando -> PRE-PARADA
-        (min(d_peligro, v_normal), 65),  # Regla 6: Cerca y normal -> ADVERTENCIA FUERTE
-        (min(d_peligro, v_quieto), 40),  # Regla 7: Cerca y quieto -> MONITOREO
-        (min(d_peligro, v_se_va), 20),  # Regla 8: Cerca pero saliendo -> BAJA ALERTA
-
-        # Bloque: Distancia Segura
-        (min(d_segura, v_asustado), 45),  # Regla 9: Lejos pero viene rápido -> OJO AHÍ
-        (min(d_segura, v_normal), 15),  # Regla 10: Lejos y normal -> NOMINAL
-        (min(d_segura, v_quieto), 5),  # Regla 11: Lejos y quieto -> TODO FINO
-        (min(d_segura, v_se_va), 0)  # Regla 12: Lejos y se va -> RELAX TOTAL
-    ]
-
-    # 3. DEFUZZIFICACIÓN (Promedio Ponderado)
-    numerador = sum(grado * riesgo for grado, riesgo in reglas)
-    denominador = sum(grado for grado, _ in reglas)
-
-    riesgo_base = (numerador / denominador) if denominador > 0 else 0
-
-    # Modificador por Celular (Multiplicador Heurístico de Peligro)
-    # Si tiene celular, el riesgo percibido sube un 40% porque no está atento
-    if cel:
-        riesgo_base = min(99.9, riesgo_base * 1.4)
-
-    return riesgo_base
+from core.bus import (Percepcion, Orden, PUERTO_PERCEPCION, PUERTO_ORDENES, PUERTO_ACKS, PUERTO_TELEMETRIA,
+                      TIPO_ORDEN, TIPO_RIESGO, crear_suscriptor, crear_publicador, crear_push, crear_pull,
+                      recibir_json)
+# Motor difuso compartido (16 reglas, vectorizado)
+from core.fuzzy_logic import logic_fuzzy_risk_batch
+from core.kinematics import FiltroKalman
+from core.clock import RELOJ_REAL
+from core.tracing import Trazador
+from core.database import DatabaseManager
+from core import config
 
 
 class AgentBrain:
-    def __init__(self):
-        self.db = DatabaseManager().get_client()
-        self.last_processed_id = 0
-        self.prev_dist_rel = None
-        self.prev_time = None
-        self.line_x = 300  # Debe coincidir con el VisionCore
-
-        print("🧠 [CEREBRO] Inicializando Lógica Difusa V4.5 (12 Reglas)...")
+    def __init__(self, camaras=None, db=None, writer=None, sockets=None, reloj=None, gestor_config=None):
+        """
+        db / writer / reloj / gestor_config se pueden inyectar (replays, pruebas). 'sockets' reemplaza los del bus:
+        {"percepcion", "ordenes", "acks", "telemetria"} con la misma interfaz send_json/recv_json.
+        """
+        self.db = db or DatabaseManager().get_client()
+        self.writer = writer or DatabaseManager().get_writer("CEREBRO")
+        self.reloj = reloj or RELOJ_REAL
+        # Umbrales recargables en caliente: una foto de la config por decisión
+        self.gestor_config = gestor_config or config.gestor()
+        self.last_accion = None
+        self.last_accion_ts = 0
+        # Estado por cámara: última secuencia y último riesgo calculado (la línea viaja en cada percepción)
+        self.last_seq_camara = {}
+        self.riesgo_camaras = {}  # camara -> (riesgo, ts, dist_rel, vel, ttc, track_id, personas, celular)
+        # Estado cinético por track: {(camara, track_id): FiltroKalman}
+        self.cinematica = {}
+        self.last_ui_update = 0
+
+        print("🧠 [CEREBRO] Inicializando Lógica Difusa V4.5 (16 Reglas)...")
         self.ensure_telemetry_row()
 
+        if sockets:
+            self.percepcion_socket = sockets.get("percepcion")
+            self.ordenes_socket = sockets["ordenes"]
+            self.acks_socket = sockets["acks"]
+            self.telemetria_socket = sockets["telemetria"]
+        else:
+            # Percepción por evento: suscripción directa al bus del detector (todas o las de CEREBRO_CAMARAS)
+            camaras = camaras or [c.strip() for c in os.getenv("CEREBRO_CAMARAS", "").split(",") if c.strip()]
+            self.context = zmq.Context()
+            self.percepcion_socket = crear_suscriptor(self.context, PUERTO_PERCEPCION, camaras=camaras)
+
+            # Canal de órdenes al ejecutor (push) y confirmaciones de vuelta
+            self.ordenes_socket = crear_push(self.context, PUERTO_ORDENES)
+            self.acks_socket = crear_pull(self.context, PUERTO_ACKS)
+
+            # Telemetría en vivo para las pantallas HMI (sin pasar por la BD)
+            self.telemetria_socket = crear_publicador(self.context, PUERTO_TELEMETRIA)
+
+        self.origen = uuid.uuid4().hex[:8]
+        self.cmd_seq = 0
+        self.pendientes = {}  # seq -> [Orden, t_envio, intentos] de órdenes sin ACK
+        self.ack_timeout = 0.25
+        self.max_reintentos = 5
+
+        # Histogramas de latencia: decisión, captura->decisión y despacho al ejecutor (ida y vuelta del ACK)
+        self.traza = Trazador("cerebro", None if sockets else self.context)
+        self.traza.agregar("bd_escritura", self.writer.histograma)
+
     def ensure_telemetry_row(self):
         try:
             res = self.db.table("telemetria_cerebro").select("id").eq("id", 1).execute()
@@ -123,87 +82,205 @@ class AgentBrain:
         except Exception as e:
             print(f"⚠️ Error DB Init: {e}")
 
-    def calcular_velocidad(self, dist_actual):
-        """Calcula px/s. Positivo = Se acerca a la línea"""
-        now = time.time()
-        vel = 0.0
-        if self.prev_dist_rel is not None and self.prev_time is not None:
-            dt = now - self.prev_time
-            if dt > 0.001:
-                # Si la distancia relativa disminuye, es que se acerca
-                # vel = (cambio de distancia) / tiempo
-                vel = (self.prev_dist_rel - dist_actual) / dt
-
-        self.prev_dist_rel = dist_actual
-        self.prev_time = now
-        return vel
+    def seguir_track(self, track_id, x, ts, line_x, modelo="cv"):
+        """
+        Filtro de Kalman del track con el timestamp de captura del frame.
+        Devuelve (x suavizada, px/s, segundos hasta la línea). Velocidad positiva = Se acerca a la línea.
+        """
+        filtro = self.cinematica.get(track_id)
+        if filtro is None:
+            filtro = self.cinematica[track_id] = FiltroKalman(x, ts, modelo=modelo)
+        x_suave, vel, _ = filtro.actualizar(x, ts)
+        return x_suave, vel, filtro.tiempo_a_linea(line_x)
+
+    def _registrar_accion(self, accion, msg, riesgo):
+        """Auditoría de la orden (write-behind, fuera del lazo de control)"""
+        self.writer.insert("acciones_sistema", {
+            "accion": accion, "motivo": msg, "riesgo": riesgo
+        })
+
+    # --- CANAL DE ÓRDENES AL EJECUTOR ---
+
+    def _enviar(self, orden):
+        """Envío sin bloqueo. Devuelve False si no hay ejecutor conectado o su cola está llena."""
+        orden.ts_envio = self.reloj.ahora()
+        orden.mono_envio = time.monotonic()
+        try:
+            self.ordenes_socket.send_json(orden.to_dict(), zmq.NOBLOCK)
+            return True
+        except zmq.Again:
+            return False
+
+    def despachar(self, tipo, riesgo, ts, accion=None, motivo="", trace="", mono_captura=0.0, config=""):
+        """Envía riesgo (y orden si la hay) al ejecutor. Las órdenes quedan pendientes hasta su ACK."""
+        self.cmd_seq += 1
+        orden = Orden(seq=self.cmd_seq, origen=self.origen, tipo=tipo, riesgo=float(riesgo), ts=ts,
+                      accion=accion, motivo=motivo, trace=trace, mono_captura=mono_captura, config=config)
+        enviado = self._enviar(orden)
+        if tipo == TIPO_ORDEN:
+            self.pendientes[orden.seq] = [orden, self.reloj.ahora(), 0]
+            if not enviado:
+                print(f"⚠️ [CEREBRO] Ejecutor no disponible: orden {accion} #{orden.seq} en espera")
+
+    def revisar_acks(self):
+        """Procesa confirmaciones recibidas y reenvía órdenes sin ACK vencidas"""
+        while True:
+            try:
+                ack = self.acks_socket.recv_json(zmq.NOBLOCK)
+            except zmq.Again:
+                break
+            if ack.get("origen") != self.origen:
+                # ACK de otra sesión del cerebro: su seq puede coincidir con una orden nuestra pendiente
+                continue
+            pendiente = self.pendientes.pop(ack.get("seq"), None)
+            if pendiente:
+                orden = pendiente[0]
+                if ack.get("mono_ack"):
+                    self.traza.registrar("despacho", ack["mono_ack"] - orden.mono_envio)
+                print(f"✅ [CEREBRO] ACK {orden.accion} #{orden.seq} [{orden.trace}] | "
+                      f"despacho {(ack['ts_ack'] - orden.ts_envio) * 1000:.1f}ms | "
+                      f"frame->ejecutor {(ack['ts_ack'] - orden.ts) * 1000:.0f}ms")
+
+        ahora = self.reloj.ahora()
+        for seq, pendiente in list(self.pendientes.items()):
+            orden, t_envio, intentos = pendiente
+            if ahora - t_envio < self.ack_timeout:
+                continue
+            if intentos >= self.max_reintentos:
+                print(f"❌ [CEREBRO] Orden {orden.accion} #{seq} sin ACK tras {intentos} reintentos")
+                del self.pendientes[seq]
+                continue
+            self._enviar(orden)
+            pendiente[1] = ahora
+            pendiente[2] = intentos + 1
+
+    def _registrar_telemetria(self, riesgo, msg):
+        # Coalescido: si la BD va lenta, solo viaja el último valor de la fila id=1
+        self.writer.update("telemetria_cerebro", {
+            "riesgo_actual": float(riesgo),
+            "estado_logico": msg,
+            "ultimo_calculo": datetime.now(timezone.utc).isoformat()
+        })
+
+    def procesar(self, p):
+        """Decide sobre una percepción (de cualquier cámara). Devuelve (riesgo, accion, msg)."""
+        t0 = time.monotonic()
+        cfg = self.gestor_config.actual()
+        umbrales = cfg.cerebro
+        if p.seq <= self.last_seq_camara.get(p.camara, 0):
+            # El detector se reinició: la secuencia y los IDs de track de esta cámara vuelven a empezar
+            for clave in [k for k in self.cinematica if k[0] == p.camara]:
+                del self.cinematica[clave]
+        self.last_seq_camara[p.camara] = p.seq
+
+        personas = p.personas
+        if p.hay_persona and not personas:
+            # Mensaje sin tracking: una sola persona anónima
+            personas = [{"id": 0, "x": p.punto_medio_x, "y": p.punto_medio_y, "celular": p.tiene_celular}]
+
+        # Olvidar la cinemática de tracks que llevan más de 1s fuera de escena
+        for clave in [k for k, filtro in self.cinematica.items() if p.ts - filtro.ts > 1.0]:
+            del self.cinematica[clave]
+
+        if not personas:
+            # Zona vacía: no hay a quién seguir
+            riesgo, dist_rel, vel_px_s, ttc, track_id = 0.0, None, 0.0, None, None
+        else:
+            celulares = [persona.get("celular", False) for persona in personas]
+
+            # 1-2. Punto medio suavizado, velocidad y tiempo hasta la línea de cada track (Kalman con el reloj
+            # del frame, no el de llegada)
+            cinetica = [self.seguir_track((p.camara, persona["id"]), persona["x"], p.ts, p.line_x,
+                                          umbrales.modelo_cinematico)
+                        for persona in personas]
+            xs, vels, ttcs = (list(c) for c in zip(*cinetica))
+
+            # 3. Inferencia Difusa Real: todas las personas en un solo lote, se actúa sobre el máximo
+            riesgos = logic_fuzzy_risk_batch(xs, p.line_x, vels, celulares, ttcs)
+            peor = int(riesgos.argmax())
+            riesgo = float(riesgos[peor])
+            dist_rel = p.line_x - xs[peor]
+            vel_px_s = vels[peor]
+            ttc = ttcs[peor]
+            track_id = personas[peor]["id"]
+
+        # La decisión se toma sobre la peor cámara con datos frescos
+        self.riesgo_camaras[p.camara] = (riesgo, p.ts, dist_rel, vel_px_s, ttc, track_id, len(personas),
+                                         p.tiene_celular)
+        vigentes = {c: r for c, r in self.riesgo_camaras.items() if p.ts - r[1] <= umbrales.ttl_camara_s}
+        camara = max(vigentes, key=lambda c: vigentes[c][0])
+        riesgo, _, dist_rel, vel_px_s, ttc, track_id, _, _ = vigentes[camara]
+        n_personas = sum(r[6] for r in vigentes.values())
+        hay_celular = any(r[7] for r in vigentes.values())
+        donde = f" [{camara}]" if len(vigentes) > 1 else ""
+
+        # 4. Motor de Decisiones STRIPS (simplificado)
+        accion = None
+        msg = "OPERACIÓN NOMINAL"
+
+        if riesgo > umbrales.umbral_parada:
+            accion = "PARADA_TOTAL"
+            msg = f"🚨 EMERGENCIA: Riesgo {riesgo:.1f}%{donde}"
+        elif riesgo > umbrales.umbral_advertencia:
+            accion = "ADVERTENCIA"
+            msg = f"⚠️ ALERTA: Riesgo {riesgo:.1f}%{donde}"
+        elif hay_celular:
+            msg = "📱 DISTRACCIÓN DETECTADA"
+
+        self.traza.desde("decision", t0)
+        self.traza.desde("captura_a_decision", p.mono_captura)
+
+        # 5. Despacho al ejecutor: la orden (al cambiar, o repetida como máximo cada repetir_orden_s) o solo el riesgo
+        if accion and (accion != self.last_accion or p.ts - self.last_accion_ts > umbrales.repetir_orden_s):
+            self.despachar(TIPO_ORDEN, riesgo, p.ts, accion=accion, motivo=msg, trace=p.trace,
+                           mono_captura=p.mono_captura, config=cfg.version)
+            self._registrar_accion(accion, msg, riesgo)
+            self.last_accion_ts = p.ts
+        else:
+            self.despachar(TIPO_RIESGO, riesgo, p.ts, trace=p.trace, mono_captura=p.mono_captura, config=cfg.version)
+        self.last_accion = accion
+
+        # 6. Telemetría: en vivo por el bus y write-behind coalescido a la BD
+        self.telemetria_socket.send_json({
+            "riesgo_actual": float(riesgo), "estado_logico": msg, "accion": accion,
+            "personas": n_personas, "seq": p.seq, "ts": p.ts, "camara": camara, "trace": p.trace,
+            "ttc": round(ttc, 2) if ttc is not None else None, "config": cfg.version,
+            "camaras": {c: round(r[0], 1) for c, r in vigentes.items()}
+        })
+        self._registrar_telemetria(riesgo, msg)
+
+        if self.reloj.ahora() - self.last_ui_update > 0.3:
+            color = "🔴" if riesgo > 70 else "🟡" if riesgo > 30 else "🟢"
+            dist_txt = f"{int(dist_rel)}px (#{track_id} {camara})" if dist_rel is not None else "---"
+            ttc_txt = f"{ttc:.1f}s" if ttc is not None else "---"
+            retardo_ms = (self.reloj.ahora() - p.ts) * 1000
+            print(
+                f"{color} [FUZZY] Riesgo: {riesgo:05.2f}% | Dist: {dist_txt} | Vel: {vel_px_s:+.1f}px/s | "
+                f"TTC: {ttc_txt} | Personas: {n_personas} | Cámaras: {len(vigentes)} | Lag: {retardo_ms:.0f}ms")
+            self.last_ui_update = self.reloj.ahora()
+
+        return riesgo, accion, msg
 
     def run(self):
         print("🐍 [S.E.R.P.I.E.N.T.E.] Brain ONLINE | Lógica Difusa Activada")
-        last_ui_update = 0
+        poller = zmq.Poller()
+        poller.register(self.percepcion_socket, zmq.POLLIN)
+        poller.register(self.acks_socket, zmq.POLLIN)
 
         while True:
             try:
-                # 1. Obtener Percepción (Último punto medio detectado)
-                sens_res = self.db.table("mundo_percepcion").select("*").order("id", desc=True).limit(1).execute()
-                ctx_res = self.db.table("estado_maquina").select("*").eq("id", 1).maybe_single().execute()
-
-                if sens_res.data and ctx_res.data:
-                    p = sens_res.data[0]
-                    c = ctx_res.data
-
-                    # Extraer punto medio (ahora usamos la nueva columna)
-                    punto_x = p.get('punto_medio_x', 0)
-                    dist_rel = self.line_x - punto_x
-
-                    # 2. Análisis Cinético
-                    vel_px_s = self.calcular_velocidad(dist_rel)
-
-                    # 3. Inferencia Difusa Real
-                    riesgo = logic_fuzzy_risk(punto_x, self.line_x, vel_px_s, p['tiene_celular'])
-
-                    # 4. Motor de Decisiones STRIPS (simplificado)
-                    accion = None
-                    msg = "OPERACIÓN NOMINAL"
-
-                    if riesgo > 85:
-                        accion = "PARADA_TOTAL"
-                        msg = f"🚨 EMERGENCIA: Riesgo {riesgo:.1f}%"
-                    elif riesgo > 40:
-                        accion = "ADVERTENCIA"
-                        msg = f"⚠️ ALERTA: Riesgo {riesgo:.1f}%"
-                    elif p['tiene_celular']:
-                        msg = "📱 DISTRACCIÓN DETECTADA"
-
-                    # 5. Ejecutar Acción si es crítica
-                    if accion and p['id'] > self.last_processed_id:
-                        self.db.table("acciones_sistema").insert({
-                            "accion": accion, "motivo": msg, "riesgo": riesgo
-                        }).execute()
-                        self.last_processed_id = p['id']
-
-                        if accion == "PARADA_TOTAL":
-                            self.db.table("estado_maquina").update({"estado_operativo": "STOP"}).eq("id", 1).execute()
-
-                    # 6. Telemetría Sync
-                    if time.time() - last_ui_update > 0.3:
-                        self.db.table("telemetria_cerebro").update({
-                            "riesgo_actual": float(riesgo),
-                            "estado_logico": msg,
-                            "ultimo_calculo": datetime.now(timezone.utc).isoformat()
-                        }).eq("id", 1).execute()
-
-                        color = "🔴" if riesgo > 70 else "🟡" if riesgo > 30 else "🟢"
-                        print(
-                            f"{color} [FUZZY] Riesgo: {riesgo:05.2f}% | Dist: {int(dist_rel)}px | Vel: {vel_px_s:+.1f}px/s")
-                        last_ui_update = time.time()
+                # Esperamos el siguiente frame o ACK (evento), sin consultar la BD
+                eventos = dict(poller.poll(100))
+                if self.percepcion_socket in eventos:
+                    _, datos = recibir_json(self.percepcion_socket)
+                    p = Percepcion.from_dict(datos)
+                    self.procesar(p)
+                self.revisar_acks()
 
             except Exception as e:
                 print(f"❌ Error en Loop Cerebral: {e}")
-                time.sleep(1)
-
-            time.sleep(0.05)  # 20Hz para que la respuesta sea instantánea
+                time.sleep(0.1)
 
 
 if __name__ == "__main__":
-    AgentBrain().run()
\ No newline at end of file
+    AgentBrain().run()
@@ -1,9 +1,17 @@
 import time
-import requests
 import os
 import threading
-import winsound
+from collections import deque
+
+import zmq
 from core.database import DatabaseManager
+from core.bus import (Orden, PUERTO_ORDENES, PUERTO_ACKS, PUERTO_MAQUINA, TIPO_ORDEN, crear_push, crear_pull,
+                      crear_publicador)
+from core.notifier import TelegramNotifier, RequestsTransport
+from core.clock import RELOJ_REAL
+from core.actuators import Actuadores, crear_salidas
+from core.tracing import Trazador
+from core import config
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -12,187 +20,257 @@ load_dotenv()
 
 
 class AgentExecutor:
-    def __init__(self):
-        self.db = DatabaseManager().get_client()
-        self.last_action_id = 0
+    def __init__(self, db=None, writer=None, notifier=None, sockets=None, reloj=None, efectos=True,
+                 gestor_config=None, actuadores=None):
+        """
+        db / writer / notifier / reloj / gestor_config / actuadores se pueden inyectar (replays, pruebas).
+        'sockets' reemplaza los del bus:
+        {"ordenes", "acks", "maquina"}. Con efectos=False no se crea ninguna salida física (SERPIENTE_ACTUADORES).
+        """
+        self.db = db or DatabaseManager().get_client()
+        self.writer = writer or DatabaseManager().get_writer("EJECUTOR")
+        self.reloj = reloj or RELOJ_REAL
+        self.efectos = efectos
+        # Umbrales y duraciones recargables en caliente: una foto de la config por orden
+        self.gestor_config = gestor_config or config.gestor()
+        self.cfg = self.gestor_config.actual()
         self.telegram_token = os.getenv("TELEGRAM_TOKEN")
         self.chat_id = os.getenv("TELEGRAM_CHAT_ID")
         self.manager_chat_id = os.getenv("TELEGRAM_CHAT_ID")
-        # Siren state
+        # Notificaciones en segundo plano (nunca bloquean el lazo de órdenes)
+        self.notifier = notifier
+        if self.notifier is None and self.telegram_token:
+            self.notifier = TelegramNotifier(RequestsTransport(self.telegram_token), self.chat_id)
         self._siren_on = False
-        self._siren_event = threading.Event()
-        self._siren_thread = None
-
-    def notificar_telegram(self, mensaje):
-        if not self.telegram_token: return
-        try:
-            url = f"https://api.telegram.org/bot{self.telegram_token}/sendMessage"
-            requests.post(url, json={"chat_id": self.chat_id, "text": mensaje})
-            print("✈️ Telegram Enviado.")
-        except Exception as e:
-            print(f"❌ Error Telegram: {e}")
-
-    def _read_riesgo(self):
-        try:
-            telem = self.db.table("telemetria_cerebro").select("riesgo_actual").eq("id", 1).maybe_single().execute().data
-            if telem and isinstance(telem, dict) and 'riesgo_actual' in telem:
-                return float(telem['riesgo_actual'])
-        except Exception as e:
-            print("⚠️ Error leyendo riesgo:", e)
-        return None
-
-    def _siren_worker(self, interval=1.0):
-        print("🔔 Siren worker started")
-        # Ruta al archivo de sonido
-        sound_path = os.path.join(os.path.dirname(__file__), 'sounds', 'SonidoAlarma.wav')
-        if not os.path.exists(sound_path):
-            print(f"⚠️ Sound file not found: {sound_path} — usando salida por consola")
-        try:
-            while not self._siren_event.is_set():
-                if os.path.exists(sound_path):
-                    # Reproducir de forma asíncrona; se repetirá cada intervalo
-                    winsound.PlaySound(sound_path, winsound.SND_FILENAME | winsound.SND_ASYNC)
-                else:
-                    print("🔊 SIRENA: ON")
-                time.sleep(interval)
-            # Al salir, detener cualquier sonido en reproducción
-            try:
-                winsound.PlaySound(None, winsound.SND_PURGE)
-            except Exception:
-                pass
-        except Exception as e:
-            print("⚠️ Error en siren worker:", e)
-        print("🔕 Siren worker stopped")
+
+        if sockets:
+            self.ordenes_socket = sockets.get("ordenes")
+            self.acks_socket = sockets["acks"]
+            self.maquina_socket = sockets["maquina"]
+        else:
+            # Canal de órdenes desde el Cerebro (push) + ACKs de vuelta
+            self.context = zmq.Context()
+            self.ordenes_socket = crear_pull(self.context, PUERTO_ORDENES, host="localhost")
+            self.acks_socket = crear_push(self.context, PUERTO_ACKS, host="localhost")
+            # Estado de máquina aplicado, publicado en vivo para las pantallas HMI
+            self.maquina_socket = crear_publicador(self.context, PUERTO_MAQUINA)
+        self.origen = None  # Sesión del cerebro que nos habla
+        self.last_seq = 0
+        self.ordenes_atendidas = deque(maxlen=256)  # Evita re-ejecutar órdenes reenviadas
+        # (origen, seq) ya confirmadas / cuyo interlock falló. Los canales de actuadores confirman desde sus hilos:
+        # el socket de ACKs y estas colecciones se comparten con _lock_acks
+        self.ordenes_confirmadas = deque(maxlen=256)
+        self.ordenes_fallidas = set()
+        self._lock_acks = threading.Lock()
+        self.riesgo_actual = None  # Último riesgo recibido (en memoria, sin leer la BD)
+        # Histogramas de latencia: llegada de órdenes, interlock y captura -> interlock (SLA de parada)
+        self.traza = Trazador("ejecutor", None if sockets else self.context)
+        self.traza.agregar("bd_escritura", self.writer.histograma)
+        # Relé de interlock, sirena y baliza: cada salida en su propio hilo (core/actuators.py)
+        self.actuadores = actuadores or Actuadores(crear_salidas() if efectos else (), traza=self.traza)
+
+    def notificar_telegram(self, mensaje, incidente=None):
+        """Encola la alerta; las de un mismo incidente se agrupan en un solo mensaje"""
+        if not self.notifier: return
+        self.notifier.notificar(mensaje, clave=incidente)
 
     def siren_on(self):
         if self._siren_on:
             return
-        self._siren_event.clear()
-        self._siren_thread = threading.Thread(target=self._siren_worker, daemon=True)
-        self._siren_thread.start()
+        self.actuadores.fijar("sirena", True)
         self._siren_on = True
-        print("✅ Sirena ACTIVADA")
+        if self.efectos:
+            print("✅ Sirena ACTIVADA")
 
     def siren_off(self):
         if not self._siren_on:
             return
-        self._siren_event.set()
-        if self._siren_thread:
-            self._siren_thread.join(timeout=2)
+        self.actuadores.fijar("sirena", False)
         self._siren_on = False
-        print("✅ Sirena DESACTIVADA")
+        if self.efectos:
+            print("✅ Sirena DESACTIVADA")
 
-    def ejecutar_interlock(self):
-        """Simula el corte de energía físico (Pantalla Roja)"""
-        os.system('color 4f')  # Rojo Windows
+    def ejecutar_interlock(self, on_activado=None, t0=None):
+        """
+        Corte de energía: pulso del relé de interlock y baliza roja. Solo encola: nada espera a las salidas.
+        on_activado(ok) llega desde el canal del relé cuando la salida quedó escrita (o falló), nunca antes.
+        """
+        duracion = self.cfg.ejecutor.interlock_s
         print("\n🛑🛑 INTERLOCK ACTIVADO: CORTE DE ENERGÍA 🛑🛑\n")
-        time.sleep(2)
-        os.system('color 07')  # Reset
+        # El relé primero; lo cosmético (consola, baliza) va después y en sus propios canales
+        self.actuadores.pulso("interlock", True, duracion, False, t0=t0, al_aplicar=on_activado)
+        self.actuadores.pulso("baliza", "rojo", duracion, "verde", t0=t0)
 
     def emitir_sonido(self):
-        """Simula sirena (Pantalla Amarilla)"""
-        os.system('color 60')  # Amarillo Windows
+        """Alerta de precaución: baliza amarilla durante advertencia_s (sin bloquear)"""
         print("\n⚠️  ALERTA SONORA: PRECAUCIÓN  ⚠️\n")
-        time.sleep(1)
-        os.system('color 07')
+        # Una advertencia no tapa la baliza roja de un interlock en curso
+        if not self.actuadores.activo("interlock"):
+            self.actuadores.pulso("baliza", "amarillo", self.cfg.ejecutor.advertencia_s, "verde")
 
-    def run(self):
-        print("🤖 [AGENTE 3] Ejecutor de Efectos Físicos Listo...")
+    # --- ATENCIÓN DE ÓRDENES ---
 
-        # Sincronización
-        try:
-            last = self.db.table("acciones_sistema").select("id").order("id", desc=True).limit(1).execute().data
-            if last: self.last_action_id = last[0]['id']
-        except:
-            pass
+    def atender(self, orden):
+        """Procesa un mensaje del canal: actualiza riesgo y ejecuta/confirma órdenes"""
+        self.traza.desde("canal_ordenes", orden.mono_envio)
+        self.cfg = self.gestor_config.actual()
+        if orden.origen != self.origen:
+            # Cerebro nuevo (o reiniciado): la secuencia empieza de cero
+            print(f"🔗 [AGENTE 3] Sesión de cerebro {orden.origen}")
+            self.origen = orden.origen
+            self.last_seq = 0
+            self.ordenes_atendidas.clear()
+            with self._lock_acks:
+                self.ordenes_fallidas.clear()
 
-        while True:
-            # 1) Procesar acciones en cola (si las hay)
+        if orden.seq > self.last_seq:
+            if self.last_seq and orden.seq > self.last_seq + 1:
+                print(f"⚠️ Hueco en el canal: {orden.seq - self.last_seq - 1} mensajes perdidos")
+            self.last_seq = orden.seq
+            self.riesgo_actual = orden.riesgo
+
+        if orden.tipo == TIPO_ORDEN:
+            clave = (orden.origen, orden.seq)
+            with self._lock_acks:
+                fallida = clave in self.ordenes_fallidas
+                self.ordenes_fallidas.discard(clave)
+                confirmada = clave in self.ordenes_confirmadas
+            if orden.seq not in self.ordenes_atendidas or fallida:
+                # Nueva, o reenvío de una cuyo interlock no se pudo aplicar: se vuelve a ejecutar
+                if not fallida:
+                    self.ordenes_atendidas.append(orden.seq)
+                self.ejecutar_orden(orden)
+            elif confirmada:
+                # Reenvío de una orden ya ejecutada: solo se vuelve a confirmar
+                self._ack(orden)
+            # Si no, el relé todavía no respondió: el ACK sale cuando lo haga
+
+        self.supervisar_sirena()
+
+    def _ack(self, orden):
+        with self._lock_acks:
+            if (orden.origen, orden.seq) not in self.ordenes_confirmadas:
+                self.ordenes_confirmadas.append((orden.origen, orden.seq))
             try:
-                accs = self.db.table("acciones_sistema").select("*").gt("id", self.last_action_id).execute().data
-            except Exception:
-                accs = []
-
-            for act in accs or []:
-                self.last_action_id = act['id']
-                cmd = act['accion']
-                print(f"⚙️ Procesando Orden: {cmd}")
-
-                if cmd == "PARADA_TOTAL":
-                    # Precondiciones según nivel de riesgo
-                    riesgo_actual = self._read_riesgo()
-                    # 1) Notificar SOLO si riesgo == 100
-                    if riesgo_actual is not None and int(riesgo_actual) == 100:
-                        try:
-                            self.notificar_telegram(f"🚨 URGENTE: Parada de Planta.\nMotivo: {act['motivo']}\nRiesgo Calc: {act['riesgo']}")
-                        except Exception:
-                            pass
-                    else:
-                        print("ℹ️ PARADA_TOTAL recibida pero no se notifica: riesgo_actual != 100", riesgo_actual)
-
-                    # 2) Activar sirena SOLO si riesgo > 90
-                    if riesgo_actual is not None and riesgo_actual > 90:
-                        try:
-                            self.siren_on()
-                            try:
-                                self.notificar_telegram(f"🔊 Sirena activada por riesgo {riesgo_actual:.1f}%")
-                            except Exception:
-                                pass
-                        except Exception as e:
-                            print("❌ Error activando sirena:", e)
-                    else:
-                        print("ℹ️ No se activa sirena: riesgo_actual <= 90", riesgo_actual)
-
-                    # 3) Ejecutar interlock siempre que llegue la orden (acción física)
-                    try:
-                        self.ejecutar_interlock()
-                    except Exception as e:
-                        print("❌ Error ejecutando interlock:", e)
+                self.acks_socket.send_json({"seq": orden.seq, "origen": orden.origen, "ts_ack": self.reloj.ahora(),
+                                            "mono_ack": time.monotonic(), "config": self.cfg.version},
+                                           zmq.NOBLOCK)
+            except zmq.Again:
+                pass
+
+    def ejecutar_orden(self, act):
+        cmd = act.accion
+        print(f"⚙️ Procesando Orden: {cmd} #{act.seq} [{act.trace}] config {act.config} "
+              f"(+{(self.reloj.ahora() - act.ts_envio) * 1000:.1f}ms)")
+        umbrales = self.cfg.ejecutor
+        t0 = time.monotonic()
+
+        if cmd == "PARADA_TOTAL":
+            # 1) Interlock primero, siempre que llegue la orden (acción física). Se confirma cuando el relé
+            #    quedó escrito; si falla no hay ACK y el cerebro reenvía la orden (que se vuelve a ejecutar).
+            def activado(ok):
+                if not ok:
+                    print(f"❌ Interlock #{act.seq} no aplicado: sin ACK, el cerebro reintentará")
+                    with self._lock_acks:
+                        self.ordenes_fallidas.add((act.origen, act.seq))
+                    return
+                self.traza.desde("interlock", t0)
+                self.traza.desde("captura_a_interlock", act.mono_captura)
+                self._ack(act)
+
+            try:
+                self.ejecutar_interlock(on_activado=activado, t0=t0)
+            except Exception as e:
+                print("❌ Error ejecutando interlock:", e)
+                with self._lock_acks:
+                    self.ordenes_fallidas.add((act.origen, act.seq))
+            self.maquina_socket.send_json({"estado_operativo": "STOP", "ts": self.reloj.ahora()})
+            self.writer.update("estado_maquina", {"estado_operativo": "STOP"})
+
+            # Precondiciones según nivel de riesgo (viaja en la misma orden)
+            riesgo_actual = act.riesgo
+            # 2) Notificar SOLO si riesgo llega a riesgo_notificar (100 por defecto)
+            if int(riesgo_actual) >= umbrales.riesgo_notificar:
+                try:
+                    self.notificar_telegram(f"🚨 URGENTE: Parada de Planta.\nMotivo: {act.motivo}\nRiesgo Calc: {act.riesgo}",
+                                            incidente="PARADA")
+                except Exception:
+                    pass
+            else:
+                print(f"ℹ️ PARADA_TOTAL recibida pero no se notifica: "
+                      f"riesgo_actual < {umbrales.riesgo_notificar:g}", riesgo_actual)
 
-                elif cmd == "ADVERTENCIA":
-                    # Mantener comportamiento (sonido breve) y notificar
-                    self.emitir_sonido()
+            # 3) Activar sirena SOLO si riesgo > riesgo_sirena
+            if riesgo_actual > umbrales.riesgo_sirena:
+                try:
+                    self.siren_on()
                     try:
-                        self.notificar_telegram(f"⚠️ ADVERTENCIA: {act.get('motivo','Usuario distraído')} | Riesgo: {act.get('riesgo',0):.1f}%")
+                        self.notificar_telegram(f"🔊 Sirena activada por riesgo {riesgo_actual:.1f}%", incidente="PARADA")
                     except Exception:
                         pass
+                except Exception as e:
+                    print("❌ Error activando sirena:", e)
+            else:
+                print(f"ℹ️ No se activa sirena: riesgo_actual <= {umbrales.riesgo_sirena:g}", riesgo_actual)
 
-                elif cmd == "LOG":
-                    print(f"✅ Auditoría Registrada: {act['motivo']}")
+        elif cmd == "ADVERTENCIA":
+            self._ack(act)
+            self.traza.desde("captura_a_advertencia", act.mono_captura)
+            # Mantener comportamiento (sonido breve) y notificar
+            self.emitir_sonido()
+            try:
+                self.notificar_telegram(f"⚠️ ADVERTENCIA: {act.motivo or 'Usuario distraído'} | Riesgo: {act.riesgo:.1f}%",
+                                        incidente="ADVERTENCIA")
+            except Exception:
+                pass
+
+        elif cmd == "LOG":
+            self._ack(act)
+            print(f"✅ Auditoría Registrada: {act.motivo}")
+
+        else:
+            self._ack(act)
+
+    def supervisar_sirena(self):
+        """Control automático de sirena con el riesgo recibido por el canal"""
+        riesgo = self.riesgo_actual
+        if riesgo is None:
+            return
+        umbrales = self.cfg.ejecutor
+        # Encender sirena si peligro total
+        if riesgo >= umbrales.riesgo_sirena_auto and not self._siren_on:
+            try:
+                self.notificar_telegram(f"🚨 Riesgo maximo detectado: {riesgo:.1f}% — activando sirena", incidente="PARADA")
+            except Exception:
+                pass
+            try:
+                self.siren_on()
+            except Exception as e:
+                print("❌ Error encendiendo sirena por telemetría:", e)
 
-            # 2) Supervisar telemetría para control automático de sirena
+        # Apagar sirena cuando riesgo baja a riesgo_apagar_sirena
+        if riesgo <= umbrales.riesgo_apagar_sirena and self._siren_on:
             try:
-                telem = self.db.table("telemetria_cerebro").select("riesgo_actual").eq("id", 1).maybe_single().execute().data
-                riesgo = None
-                if telem and isinstance(telem, dict) and 'riesgo_actual' in telem:
-                    riesgo = float(telem['riesgo_actual'])
-                if riesgo is not None:
-                    # Encender sirena si peligro total
-                    if riesgo >= 100 and not self._siren_on:
-                        try:
-                            self.notificar_telegram(f"🚨 Riesgo maximo detectado: {riesgo:.1f}% — activando sirena")
-                        except Exception:
-                            pass
-                        try:
-                            self.siren_on()
-                        except Exception as e:
-                            print("❌ Error encendiendo sirena por telemetría:", e)
-
-                    # Apagar sirena cuando riesgo baja a <= 80
-                    if riesgo <= 80 and self._siren_on:
-                        try:
-                            self.siren_off()
-                        except Exception as e:
-                            print("❌ Error apagando sirena por telemetría:", e)
-                        try:
-                            self.notificar_telegram(f"ℹ️ Riesgo reducido: {riesgo:.1f}% — sirena apagada")
-                        except Exception:
-                            pass
+                self.siren_off()
             except Exception as e:
-                print("⚠️ Error leyendo telemetría:", e)
+                print("❌ Error apagando sirena por telemetría:", e)
+            try:
+                self.notificar_telegram(f"ℹ️ Riesgo reducido: {riesgo:.1f}% — sirena apagada", incidente="FIN_PARADA")
+            except Exception:
+                pass
 
-            time.sleep(0.5)
+    def run(self):
+        print("🤖 [AGENTE 3] Ejecutor de Efectos Físicos Listo (canal de órdenes por evento)...")
+
+        while True:
+            try:
+                # Esperamos órdenes/riesgo empujados por el Cerebro (sin sondear la BD)
+                if not self.ordenes_socket.poll(1000):
+                    continue
+                self.atender(Orden.from_dict(self.ordenes_socket.recv_json()))
+            except Exception as e:
+                print("⚠️ Error en canal de órdenes:", e)
 
 
 if __name__ == "__main__":
-    AgentExecutor().run()
\ No newline at end of file
+    AgentExecutor().run()
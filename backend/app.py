@@ -1,6 +1,9 @@
 import os
 import sys
-from flask import Flask, send_from_directory, jsonify
+import json
+import threading
+import time
+from flask import Flask, send_from_directory, request, Response
 from flask_cors import CORS
 
 # Fix de rutas para encontrar core
@@ -9,36 +12,98 @@ project_root = os.path.abspath(os.path.join(base_dir, '..'))
 sys.path.append(project_root)
 
 from core.database import DatabaseManager
+from core.live_state import LiveState, alimentar_desde_bus, refrescar_desde_bd
+from core.history import Historial, instante
 
 app = Flask(__name__, static_folder=os.path.join(project_root, 'frontend'))
 CORS(app)
 
 db = DatabaseManager().get_client()
 
+# Snapshot en memoria: lo alimentan los eventos de los agentes y, de respaldo, un único refresco de BD
+estado = LiveState()
+historial = Historial()  # Rollups por minuto/hora/día alimentados por los mismos eventos del bus
+alimentar_desde_bus(estado, historial=historial)
+refrescar_desde_bd(estado, db)
+_cache = (-1, b"")  # (versión, cuerpo JSON) serializado una sola vez por versión
+_cache_lock = threading.Lock()
+
+LONG_POLL_MAX = 30.0
+
 
 @app.route('/')
 def index():
     return send_from_directory(app.static_folder, 'index.html')
 
 
+def _cuerpo(version, datos):
+    """Cuerpo JSON de la versión pedida (la tupla se lee una sola vez: versión y cuerpo siempre van juntos)"""
+    global _cache
+    cache = _cache
+    if cache[0] != version:
+        cache = (version, json.dumps({"success": True, "version": version, **datos}).encode())
+        with _cache_lock:
+            # Un hilo con un snapshot más viejo no pisa al más nuevo
+            if version > _cache[0]:
+                _cache = cache
+    return cache[1]
+
+
 @app.route('/api/live')
 def get_live_data():
-    """Ruta de emergencia para jalar datos si el Realtime falla"""
+    """
+    Último estado desde memoria en O(1), sin consultar la BD.
+    - ETag = versión del snapshot; con If-None-Match igual se responde 304 sin cuerpo.
+    - ?since=<version>: long-poll, espera (hasta ?timeout= s) a que haya una versión más nueva.
+    """
+    since = request.args.get("since", type=int)
+    if since is not None:
+        timeout = min(request.args.get("timeout", 25.0, type=float), LONG_POLL_MAX)
+        version, datos = estado.esperar(since, timeout)
+    else:
+        version, datos = estado.snapshot()
+
+    etag = f'"{version}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("If-None-Match") == etag or (since is not None and version == since):
+        return Response(status=304, headers=headers)
+    return Response(_cuerpo(version, datos), mimetype="application/json", headers=headers)
+
+
+def _rango():
+    hasta = instante(request.args.get("hasta"), time.time())
+    desde = instante(request.args.get("desde"), hasta - 86400)
+    return desde, hasta
+
+
+@app.route('/api/history')
+def get_history():
+    """
+    Serie de riesgo desde los rollups precalculados.
+    ?desde=&hasta= (epoch o ISO 8601; por defecto las últimas 24 h), ?paso= (s) o ?puntos= (downsampling
+    automático, 300 por defecto), ?camara=, ?desfase= (s, origen de los buckets; p. ej. turnos).
+    """
     try:
-        # Jalamos lo último de cada mesa
-        telemetry = db.table("telemetria_cerebro").select("*").eq("id", 1).maybe_single().execute().data
-        vision = db.table("mundo_percepcion").select("*").order("id", desc=True).limit(1).execute().data
-        machine = db.table("estado_maquina").select("*").eq("id", 1).maybe_single().execute().data
+        desde, hasta = _rango()
+        datos = historial.serie(desde, hasta, paso=request.args.get("paso", type=int),
+                                puntos=request.args.get("puntos", 300, type=int),
+                                camara=request.args.get("camara"), desfase=request.args.get("desfase", 0, type=int))
+    except ValueError as e:
+        return {"success": False, "error": str(e)}, 400
+    return {"success": True, **datos}
 
-        return jsonify({
-            "success": True,
-            "telemetry": telemetry,
-            "vision": vision[0] if vision else None,
-            "machine": machine
-        })
-    except Exception as e:
-        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/history/resumen')
+def get_history_resumen():
+    """Totales del rango por cámara: paradas, advertencias, tiempo en zonas y distracciones por celular"""
+    try:
+        desde, hasta = _rango()
+        datos = historial.resumen(desde, hasta, camara=request.args.get("camara"))
+    except ValueError as e:
+        return {"success": False, "error": str(e)}, 400
+    return {"success": True, **datos}
 
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', debug=True, port=5000)
\ No newline at end of file
+    # Sin reloader: el snapshot y sus hilos de alimentación viven en un solo proceso
+    app.run(host='0.0.0.0', debug=True, port=5000, threaded=True, use_reloader=False)
\ No newline at end of file
@@ -0,0 +1,298 @@
+import asyncio
+import json
+import os
+import sys
+import time
+
+import zmq
+import zmq.asyncio
+from aiohttp import web
+
+# Fix de rutas para encontrar core
+base_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(base_dir, '..'))
+sys.path.append(project_root)
+
+from core.bus import (PUERTO_VIDEO, PUERTO_PERCEPCION, PUERTO_TELEMETRIA, PUERTO_MAQUINA, PUERTO_VISORES,
+                      PUERTO_METRICAS, separar, topico_camara)
+from core.live_state import LiveState, VisionPorCamara, proyectar_telemetria, proyectar_maquina, maquina_desde_bd
+from core.tracing import prometheus
+
+MAX_CLIENTES = int(os.getenv("STREAM_MAX_CLIENTES", "256"))
+FPS_MAX = float(os.getenv("STREAM_FPS_MAX", "15"))
+EVENTOS_HZ = float(os.getenv("STREAM_EVENTOS_HZ", "10"))  # Tope de empujes de telemetría por pantalla
+SILENCIO_MAQUINA = 5.0  # Segundos sin estado de máquina por el bus antes de tomar estado_operativo de la BD
+CORS = {"Access-Control-Allow-Origin": "*"}
+
+
+class StreamServer:
+    """
+    Servidor asyncio de un solo proceso:
+    - /video_feed?cam=cam0: MJPEG desde un único receptor zmq.asyncio (las pantallas de una cámara comparten el frame).
+    - /events: Server-Sent Events con riesgo, percepción y estado de máquina cuando cambian.
+    Sin hilos por cliente y sin consultas a la BD por cliente. El video de una cámara se suscribe solo
+    mientras tenga visores: sin visores el detector ni siquiera codifica su JPEG.
+    El /api/live (ETag, 304 y long-poll ?since=) lo sirve solo backend/app.py en el puerto 5000.
+    """
+
+    def __init__(self):
+        self.ctx = zmq.asyncio.Context.instance()
+        self.estado = LiveState()
+        self.frames = {}  # camara -> (version, jpeg)
+        self.visores = {}  # camara -> visores conectados
+        self.consumo = {}  # camara -> {cliente: [fps pedido, frames enviados]}
+        self.metricas = {}  # agente -> última foto acumulada de sus histogramas de latencia
+        self.video_sock = None
+        self.frame_version = 0
+        self.frame_cond = None
+        self.estado_cond = None
+        self._payload = (-1, b"")  # Último evento SSE serializado (una vez para todos los clientes)
+        self.clientes_video = 0
+        self.clientes_eventos = 0
+        self._tareas = []
+
+    def _sub(self, puerto, topico=b""):
+        sock = self.ctx.socket(zmq.SUB)
+        sock.setsockopt(zmq.RCVHWM, 10)
+        sock.setsockopt(zmq.LINGER, 0)
+        sock.connect(f"tcp://localhost:{puerto}")
+        if topico is not None:
+            sock.setsockopt(zmq.SUBSCRIBE, topico)
+        return sock
+
+    # --- RECEPTORES (una tarea por fuente, no por cliente) ---
+
+    async def _recibir_video(self):
+        while True:
+            camara, frame = separar(await self.video_sock.recv_multipart())
+            async with self.frame_cond:
+                self.frame_version += 1
+                self.frames[camara] = (self.frame_version, frame)
+                self.frame_cond.notify_all()
+
+    async def _notificar_estado(self, cambio):
+        if cambio:
+            async with self.estado_cond:
+                self.estado_cond.notify_all()
+
+    async def _recibir_bus(self, puerto, seccion, proyeccion, fusionar=False):
+        sock = self._sub(puerto)
+        while True:
+            try:
+                datos = proyeccion(await sock.recv_json())
+            except ValueError:
+                continue
+            await self._notificar_estado(
+                self.estado.fusionar(seccion, datos) if fusionar else self.estado.actualizar(seccion, datos))
+
+    async def _recibir_percepcion(self):
+        """Percepción por tópico de cámara, resumida en la sección 'vision'"""
+        sock = self._sub(PUERTO_PERCEPCION)
+        vision = VisionPorCamara()
+        while True:
+            camara, payload = separar(await sock.recv_multipart())
+            try:
+                datos = json.loads(payload)
+            except ValueError:
+                continue
+            await self._notificar_estado(self.estado.actualizar("vision", vision.agregar(camara, datos)))
+
+    async def _sync_maquina(self):
+        """
+        Modo mantenimiento desde la BD: una sola consulta cada 2s para todo el servidor. El estado operativo
+        lo publica el Ejecutor por el bus y la fila solo lo impone con el bus en silencio (ver maquina_desde_bd).
+        """
+        try:
+            from core.database import DatabaseManager
+            db = DatabaseManager().get_client()
+        except Exception as e:
+            print(f"⚠️ [STREAM] Sin BD para estado de máquina: {e}")
+            return
+
+        def leer():
+            return db.table("estado_maquina").select("*").eq("id", 1).maybe_single().execute().data
+
+        while True:
+            try:
+                machine = await asyncio.to_thread(leer)
+                if machine:
+                    datos = maquina_desde_bd(self.estado, machine, SILENCIO_MAQUINA)
+                    await self._notificar_estado(self.estado.fusionar("machine", datos, del_bus=False))
+            except Exception as e:
+                print(f"⚠️ [STREAM] Error leyendo estado de máquina: {e}")
+            await asyncio.sleep(2)
+
+    async def _feedback_visores(self):
+        """Cada segundo, le cuenta al detector cuánto consume realmente el visor más rápido de cada cámara"""
+        sock = self.ctx.socket(zmq.PUSH)
+        sock.setsockopt(zmq.SNDHWM, 10)
+        sock.setsockopt(zmq.LINGER, 0)
+        sock.connect(f"tcp://localhost:{PUERTO_VISORES}")
+        previo, t_previo = {}, time.monotonic()
+        while True:
+            await asyncio.sleep(1.0)
+            ahora = time.monotonic()
+            dt, t_previo = ahora - t_previo, ahora
+            actual = {}
+            for camara, clientes in self.consumo.items():
+                if not clientes:
+                    continue
+                fps = max((enviados - previo.get(c, 0)) / dt for c, (_, enviados) in clientes.items())
+                actual.update({c: enviados for c, (_, enviados) in clientes.items()})
+                try:
+                    await sock.send_json({"camara": camara, "fps": round(fps, 2), "visores": len(clientes),
+                                          "fps_pedido": max(pedido for pedido, _ in clientes.values())},
+                                         zmq.NOBLOCK)
+                except zmq.Again:
+                    pass
+            previo = actual
+
+    async def _recibir_metricas(self):
+        """Fotos de histogramas de latencia que empuja cada agente (se sirven en /metrics)"""
+        sock = self.ctx.socket(zmq.PULL)
+        sock.setsockopt(zmq.RCVHWM, 16)
+        sock.setsockopt(zmq.LINGER, 0)
+        sock.bind(f"tcp://*:{PUERTO_METRICAS}")
+        while True:
+            try:
+                foto = await sock.recv_json()
+            except ValueError:
+                continue
+            self.metricas[foto["agente"]] = foto
+
+    async def iniciar(self, app):
+        self.frame_cond = asyncio.Condition()
+        self.estado_cond = asyncio.Condition()
+        # Sin suscripciones al inicio: cada cámara se suscribe con su primer visor
+        self.video_sock = self._sub(PUERTO_VIDEO, topico=None)
+        self.video_sock.setsockopt(zmq.RCVHWM, 2)
+        self._tareas = [
+            asyncio.create_task(self._recibir_video()),
+            asyncio.create_task(self._recibir_bus(PUERTO_TELEMETRIA, "telemetry", proyectar_telemetria)),
+            asyncio.create_task(self._recibir_percepcion()),
+            asyncio.create_task(self._recibir_bus(PUERTO_MAQUINA, "machine", proyectar_maquina, fusionar=True)),
+            asyncio.create_task(self._sync_maquina()),
+            asyncio.create_task(self._feedback_visores()),
+            asyncio.create_task(self._recibir_metricas()),
+        ]
+
+    async def detener(self, app):
+        for t in self._tareas:
+            t.cancel()
+        self.ctx.destroy(linger=0)
+
+    # --- RUTAS ---
+
+    async def video_feed(self, request):
+        if self.clientes_video >= MAX_CLIENTES:
+            return web.json_response({"error": "máximo de visores alcanzado", "max_clientes": MAX_CLIENTES},
+                                     status=503, headers=CORS)
+        fps = max(1.0, min(FPS_MAX, float(request.query.get("fps", FPS_MAX))))
+        camara = request.query.get("cam", "cam0")
+        intervalo = 1.0 / fps
+
+        resp = web.StreamResponse(headers={"Content-Type": "multipart/x-mixed-replace; boundary=frame",
+                                           "Cache-Control": "no-cache", **CORS})
+        await resp.prepare(request)
+        self.clientes_video += 1
+        self._alta_visor(camara)
+        registro = [fps, 0]  # Lo que pide este visor y lo que lleva recibido (feedback al detector)
+        self.consumo.setdefault(camara, {})[id(registro)] = registro
+        version = 0
+        ultimo_envio = 0.0
+        try:
+            while True:
+                # Tope de FPS por cliente; un cliente lento salta directo al frame más reciente
+                espera = intervalo - (time.monotonic() - ultimo_envio)
+                if espera > 0:
+                    await asyncio.sleep(espera)
+                async with self.frame_cond:
+                    await self.frame_cond.wait_for(lambda: self.frames.get(camara, (version,))[0] != version)
+                    version, frame = self.frames[camara]
+                ultimo_envio = time.monotonic()
+                await resp.write(b"--frame\r\nContent-Type: image/jpeg\r\n\r\n")
+                await resp.write(frame)
+                await resp.write(b"\r\n")
+                registro[1] += 1
+        except ConnectionResetError:
+            pass
+        finally:
+            self.clientes_video -= 1
+            self.consumo[camara].pop(id(registro), None)
+            self._baja_visor(camara)
+        return resp
+
+    def _alta_visor(self, camara):
+        self.visores[camara] = self.visores.get(camara, 0) + 1
+        if self.visores[camara] == 1:
+            self.video_sock.setsockopt(zmq.SUBSCRIBE, topico_camara(camara))
+
+    def _baja_visor(self, camara):
+        self.visores[camara] -= 1
+        if self.visores[camara] == 0:
+            del self.visores[camara]
+            self.video_sock.setsockopt(zmq.UNSUBSCRIBE, topico_camara(camara))
+            # El último frame queda viejo: el próximo visor espera uno nuevo
+            self.frames.pop(camara, None)
+
+    def _evento(self):
+        """Serializa el snapshot una sola vez por versión"""
+        version, datos = self.estado.snapshot()
+        if self._payload[0] != version:
+            payload = json.dumps({"success": True, "version": version, **datos})
+            self._payload = (version, f"id: {version}\ndata: {payload}\n\n".encode())
+        return self._payload
+
+    async def events(self, request):
+        resp = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache",
+                                           "X-Accel-Buffering": "no", **CORS})
+        await resp.prepare(request)
+        self.clientes_eventos += 1
+        version = -1
+        try:
+            while True:
+                try:
+                    async with self.estado_cond:
+                        await asyncio.wait_for(
+                            self.estado_cond.wait_for(lambda: self.estado.version != version), timeout=15)
+                except asyncio.TimeoutError:
+                    await resp.write(b": keepalive\n\n")
+                    continue
+                version, payload = self._evento()
+                await resp.write(payload)
+                # Cambios más rápidos que EVENTOS_HZ se agrupan en el siguiente envío
+                await asyncio.sleep(1.0 / EVENTOS_HZ)
+        except ConnectionResetError:
+            pass
+        finally:
+            self.clientes_eventos -= 1
+        return resp
+
+    async def status(self, request):
+        return web.json_response({"status": "online", "source": "ZMQ", "frames": self.frame_version,
+                                  "camaras": sorted(self.frames), "visores": self.visores,
+                                  "clientes_video": self.clientes_video, "clientes_eventos": self.clientes_eventos,
+                                  "version": self.estado.version}, headers=CORS)
+
+    async def metrics(self, request):
+        """Latencias por agente y etapa en formato de texto Prometheus"""
+        texto = await asyncio.to_thread(prometheus, list(self.metricas.values()))
+        return web.Response(text=texto, content_type="text/plain", charset="utf-8")
+
+
+def crear_app():
+    server = StreamServer()
+    app = web.Application()
+    app.on_startup.append(server.iniciar)
+    app.on_cleanup.append(server.detener)
+    app.router.add_get("/video_feed", server.video_feed)
+    app.router.add_get("/events", server.events)
+    app.router.add_get("/status", server.status)
+    app.router.add_get("/metrics", server.metrics)
+    return app
+
+
+if __name__ == '__main__':
+    print("🚀 [STREAM] Servidor asyncio en http://localhost:5001 (/video_feed?cam=cam0 MJPEG | /events SSE | "
+          "/metrics Prometheus)")
+    web.run_app(crear_app(), host="0.0.0.0", port=5001, print=None)
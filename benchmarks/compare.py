@@ -0,0 +1,94 @@
+"""
+Compara dos resultados de benchmarks/suite.py y marca las regresiones.
+
+Uso:
+    python benchmarks/compare.py base.json nuevo.json --umbral 10
+
+Sale con código 1 si alguna métrica empeora más que el umbral (%), para cortar un despliegue en CI.
+Sentido de cada métrica por su nombre: *_s / fps* = más es mejor; *_us / *_ms / bytes = menos es mejor.
+Las demás (n, descartadas, backend...) se muestran pero no cuentan como regresión.
+"""
+import argparse
+import json
+import sys
+
+MAS_ES_MEJOR = ("_s", "fps")
+MENOS_ES_MEJOR = ("_us", "_ms", "bytes", "cpu_ms_por_frame")
+IGNORADAS = ("n",)
+
+
+def sentido(metrica):
+    """+1 si más es mejor, -1 si menos es mejor, 0 si no se evalúa"""
+    if metrica in IGNORADAS:
+        return 0
+    if metrica.endswith(MENOS_ES_MEJOR):
+        return -1
+    if metrica.endswith(MAS_ES_MEJOR) or metrica.startswith(MAS_ES_MEJOR):
+        return 1
+    return 0
+
+
+def aplanar(resultados):
+    """{grupo: {caso: {metrica: valor}}} -> {"grupo/caso/metrica": valor} (solo numéricos)"""
+    plano = {}
+    for grupo, casos in resultados.items():
+        for caso, metricas in casos.items():
+            for metrica, valor in metricas.items():
+                if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+                    plano[f"{grupo}/{caso}/{metrica}"] = valor
+    return plano
+
+
+def comparar(base, nuevo, umbral):
+    """Filas (clave, base, nuevo, delta %, estado) para las métricas presentes en ambos"""
+    a, b = aplanar(base["resultados"]), aplanar(nuevo["resultados"])
+    # Grupos que no se corrieron en alguno de los dos no cuentan como métricas perdidas
+    comunes = base["resultados"].keys() & nuevo["resultados"].keys()
+    filas = []
+    for clave in sorted(a.keys() & b.keys()):
+        s = sentido(clave.rsplit("/", 1)[1])
+        delta = (b[clave] - a[clave]) / a[clave] * 100 if a[clave] else 0.0
+        mejora = delta * s if s else 0.0
+        estado = "REGRESIÓN" if mejora < -umbral else "mejora" if mejora > umbral else ""
+        filas.append((clave, a[clave], b[clave], delta, estado))
+    solo = lambda x, y: sorted(k for k in x.keys() - y.keys() if k.split("/", 1)[0] in comunes)
+    return filas, solo(a, b), solo(b, a)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("base")
+    parser.add_argument("nuevo")
+    parser.add_argument("--umbral", type=float, default=10.0, help="%% de empeoramiento tolerado (ruido)")
+    parser.add_argument("--todo", action="store_true", help="Muestra también las métricas sin cambios")
+    args = parser.parse_args()
+
+    with open(args.base, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.nuevo, encoding="utf-8") as f:
+        nuevo = json.load(f)
+
+    print(f"📊 Base  {base['meta'].get('commit')} ({base['meta'].get('fecha')})")
+    print(f"📊 Nuevo {nuevo['meta'].get('commit')} ({nuevo['meta'].get('fecha')})")
+    if base["meta"].get("plataforma") != nuevo["meta"].get("plataforma"):
+        print("⚠️ Plataformas distintas: las cifras absolutas no son comparables")
+
+    filas, solo_base, solo_nuevo = comparar(base, nuevo, args.umbral)
+    ancho = max((len(f[0]) for f in filas), default=20)
+    for clave, a, b, delta, estado in filas:
+        if estado or args.todo:
+            marca = "❌" if estado == "REGRESIÓN" else "✅" if estado else "  "
+            print(f"{marca} {clave:<{ancho}} {a:>12.2f} -> {b:>12.2f} ({delta:+6.1f}%) {estado}")
+    for clave in solo_base:
+        print(f"   {clave:<{ancho}} ya no se mide")
+    for clave in solo_nuevo:
+        print(f"   {clave:<{ancho}} nueva")
+
+    regresiones = [f for f in filas if f[4] == "REGRESIÓN"]
+    print(f"\n{'❌' if regresiones else '✅'} {len(regresiones)} regresiones sobre {len(filas)} métricas "
+          f"(umbral {args.umbral:.0f}%)")
+    sys.exit(1 if regresiones else 0)
+
+
+if __name__ == "__main__":
+    main()
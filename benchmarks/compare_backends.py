@@ -0,0 +1,122 @@
+"""
+Compara backends de inferencia del detector sobre un clip grabado: latencia por frame y
+concordancia de detecciones contra la referencia PyTorch FP32.
+
+Uso:
+    python benchmarks/compare_backends.py --clip grabacion.mp4 --frames 300 \
+        --variantes torch:fp32 onnx:fp32 onnx:fp16 onnx:int8 openvino:fp32 openvino:int8
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.detector_backends import crear_backend
+from core.tracking import iou
+
+
+def leer_clip(ruta, n):
+    """Frames del clip con el mismo preproceso que la captura del detector (640x480, espejo)"""
+    cap = cv2.VideoCapture(ruta)
+    frames = []
+    while len(frames) < n:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        frames.append(cv2.flip(cv2.resize(frame, (640, 480)), 1))
+    cap.release()
+    return frames
+
+
+def concordancia(referencia, detecciones, umbral=0.5):
+    """Emparejamiento greedy por clase con IoU >= umbral. Devuelve (aciertos, n_ref, n_det, suma_iou)."""
+    aciertos, suma_iou = 0, 0.0
+    usados = set()
+    for cls, *caja in referencia:
+        mejor, mejor_j = umbral, None
+        for j, (cls_d, *caja_d) in enumerate(detecciones):
+            if j in usados or cls_d != cls:
+                continue
+            v = iou(caja[:4], caja_d[:4])
+            if v >= mejor:
+                mejor, mejor_j = v, j
+        if mejor_j is not None:
+            usados.add(mejor_j)
+            aciertos += 1
+            suma_iou += mejor
+    return aciertos, len(referencia), len(detecciones), suma_iou
+
+
+def medir(backend, frames, calentamiento=10):
+    for frame in frames[:calentamiento]:
+        backend.detectar(frame)
+    latencias, salidas = [], []
+    for frame in frames:
+        t0 = time.perf_counter()
+        salidas.append(backend.detectar(frame))
+        latencias.append((time.perf_counter() - t0) * 1000)
+    return np.array(latencias), salidas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clip", required=True)
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--hilos", type=int, default=None)
+    parser.add_argument("--variantes", nargs="+", default=["torch:fp32", "onnx:fp32", "onnx:int8"])
+    parser.add_argument("--json", help="Ruta donde guardar los resultados")
+    args = parser.parse_args()
+
+    frames = leer_clip(args.clip, args.frames)
+    if not frames:
+        print(f"❌ No se pudieron leer frames de {args.clip}")
+        return
+    print(f"🎞️ {len(frames)} frames de {args.clip}")
+
+    resultados = []
+    referencia = None
+    for variante in args.variantes:
+        nombre, precision = variante.split(":")
+        backend = crear_backend(nombre, precision, hilos=args.hilos, clip_calibracion=args.clip)
+        if backend.nombre != nombre:
+            print(f"⚠️ {variante} no disponible, se omite")
+            continue
+        latencias, salidas = medir(backend, frames)
+        if referencia is None:
+            referencia = salidas
+
+        aciertos = n_ref = n_det = 0
+        suma_iou = 0.0
+        for ref, det in zip(referencia, salidas):
+            a, r, d, s = concordancia(ref, det)
+            aciertos, n_ref, n_det, suma_iou = aciertos + a, n_ref + r, n_det + d, suma_iou + s
+
+        fila = {
+            "variante": variante,
+            "p50_ms": round(float(np.percentile(latencias, 50)), 2),
+            "p95_ms": round(float(np.percentile(latencias, 95)), 2),
+            "media_ms": round(float(latencias.mean()), 2),
+            "fps": round(1000.0 / float(latencias.mean()), 1),
+            "recall": round(aciertos / n_ref, 3) if n_ref else 1.0,
+            "precision": round(aciertos / n_det, 3) if n_det else 1.0,
+            "iou_medio": round(suma_iou / aciertos, 3) if aciertos else 0.0,
+        }
+        resultados.append(fila)
+        print(f"📊 {variante:<14} p50 {fila['p50_ms']:>7.2f}ms | p95 {fila['p95_ms']:>7.2f}ms | "
+              f"{fila['fps']:>6.1f} FPS | recall {fila['recall']:.3f} | prec {fila['precision']:.3f} | "
+              f"IoU {fila['iou_medio']:.3f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"clip": args.clip, "frames": len(frames), "hilos": args.hilos,
+                       "referencia": args.variantes[0], "resultados": resultados}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
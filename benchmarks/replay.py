@@ -0,0 +1,296 @@
+"""
+Replay del pipeline completo Visión -> Cerebro -> Ejecutor desde un video (o un log de percepciones),
+con reloj virtual y sin infraestructura: Supabase y Telegram en memoria, sockets reemplazados por colas.
+Corre tan rápido como da la CPU y reporta latencias por etapa, timeline de riesgo y acciones tomadas.
+
+Uso:
+    python benchmarks/replay.py --video grabacion.mp4 --line-x 300 --json reporte.json
+    python benchmarks/replay.py --video grabacion.mp4 --guardar-percepcion percepciones.jsonl
+    python benchmarks/replay.py --percepciones percepciones.jsonl   # solo Cerebro + Ejecutor
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+import zmq
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.bus import Orden, Percepcion, TIPO_ORDEN
+from core.clock import RelojVirtual
+from core.db_writer import DatabaseWriter
+from core.memory_db import MemoryClient
+from core.notifier import TelegramNotifier, MemoryTransport
+
+
+class SocketMemoria:
+    """Sustituto de un socket ZMQ (send_json / recv_json): cola local o entrega directa a un destino"""
+
+    def __init__(self, destino=None):
+        self.destino = destino
+        self.cola = deque()
+        self.enviados = []
+
+    def send_json(self, datos, flags=0):
+        self.enviados.append(datos)
+        if self.destino:
+            self.destino(datos)
+        else:
+            self.cola.append(datos)
+
+    def recv_json(self, flags=0):
+        if not self.cola:
+            raise zmq.Again()
+        return self.cola.popleft()
+
+
+def leer_video(ruta, fps=None):
+    """Frames del video con el preproceso de la captura del detector: (seq, ts virtual, frame)"""
+    cap = cv2.VideoCapture(ruta)
+    if not cap.isOpened():
+        raise SystemExit(f"❌ No se pudo abrir {ruta}")
+    fps = fps or cap.get(cv2.CAP_PROP_FPS) or 30.0
+    seq = 0
+    try:
+        while True:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            seq += 1
+            yield seq, (seq - 1) / fps, cv2.flip(cv2.resize(frame, (640, 480)), 1)
+    finally:
+        cap.release()
+
+
+def leer_percepciones(ruta):
+    with open(ruta, encoding="utf-8") as f:
+        for linea in f:
+            if linea.strip():
+                yield Percepcion.from_dict(json.loads(linea))
+
+
+def percentiles(valores):
+    if not valores:
+        return {"p50": None, "p95": None, "max": None}
+    v = np.asarray(valores) * 1000
+    return {"p50": round(float(np.percentile(v, 50)), 2), "p95": round(float(np.percentile(v, 95)), 2),
+            "max": round(float(v.max()), 2)}
+
+
+def tramos(timeline):
+    """Agrupa el timeline frame a frame en tramos con la misma acción"""
+    salida = []
+    for punto in timeline:
+        if salida and salida[-1]["accion"] == punto["accion"]:
+            tramo = salida[-1]
+            tramo["hasta"] = punto["ts"]
+            tramo["riesgo_max"] = max(tramo["riesgo_max"], punto["riesgo"])
+        else:
+            salida.append({"desde": punto["ts"], "hasta": punto["ts"], "accion": punto["accion"],
+                           "riesgo_max": punto["riesgo"]})
+    return salida
+
+
+class Replay:
+    def __init__(self, line_x=300, backend=None, adaptativo=True, efectos=False):
+        self.line_x = line_x
+        self.reloj = RelojVirtual()
+        # El ejecutor corre en otro proceso: sus esperas no deben frenar el reloj del cerebro
+        self.reloj_ejecutor = RelojVirtual()
+        self.db = MemoryClient()
+        self._journal = tempfile.mkdtemp(prefix="serpiente_replay_")
+        self.telegram = MemoryTransport()
+        self.backend = backend
+        self.adaptativo = adaptativo
+        self.efectos = efectos
+
+        self.vision = None
+        self.camara = None
+        self.latencias = {"captura": [], "vision": [], "cerebro": [], "total": []}
+        self.modos = {}
+        self.timeline = []
+        self.grabacion = None
+
+    def _writer(self, nombre):
+        return DatabaseWriter(self.db, nombre=nombre, journal_path=os.path.join(self._journal, f"{nombre}.jsonl"))
+
+    def _armar_agentes(self):
+        # Import diferido: los agentes arrastran dependencias pesadas (YOLO) que el modo log no necesita
+        from agents.agent_2_brain import AgentBrain
+        from agents.agent_3_notifier import AgentExecutor
+
+        self.acks = SocketMemoria()
+        self.maquina = SocketMemoria()
+        # Sin límite de tasa: el replay corre más rápido que el tiempo real
+        self.notifier = TelegramNotifier(self.telegram, "replay", agrupacion=0.0, tasa_chat=1000.0,
+                                         rafaga_chat=1000, tasa_global=1000.0)
+        self.executor = AgentExecutor(db=self.db, writer=self._writer("EJECUTOR"), notifier=self.notifier,
+                                      sockets={"acks": self.acks, "maquina": self.maquina},
+                                      reloj=self.reloj_ejecutor, efectos=self.efectos)
+        # Las órdenes llegan al ejecutor en el mismo instante (sin red de por medio)
+        self.ordenes = SocketMemoria(destino=lambda datos: self.executor.atender(Orden.from_dict(datos)))
+        self.telemetria = SocketMemoria()
+        self.brain = AgentBrain(db=self.db, writer=self._writer("CEREBRO"), reloj=self.reloj,
+                                sockets={"ordenes": self.ordenes, "acks": self.acks, "telemetria": self.telemetria})
+
+    def _armar_vision(self):
+        from agents.agent_1_detector import VisionCore, Camara
+
+        self.vision = VisionCore(db=self.db, writer=self._writer("DETECTOR"), backend=self.backend, bus=False)
+        self.camara = Camara("cam0", None, self.line_x, self.vision.backend, self.adaptativo, anillo=False)
+
+    def _decidir(self, p):
+        self.reloj.fijar(p.ts)
+        self.reloj_ejecutor.fijar(p.ts)
+        riesgo, accion, _ = self.brain.procesar(p)
+        self.brain.revisar_acks()
+        self.timeline.append({"seq": p.seq, "ts": round(p.ts, 3), "camara": p.camara, "riesgo": round(riesgo, 2),
+                              "accion": accion, "personas": len(p.personas)})
+
+    def correr_video(self, ruta, fps=None, max_frames=None):
+        self._armar_vision()
+        self._armar_agentes()
+        frames = leer_video(ruta, fps)
+        while max_frames is None or len(self.latencias["total"]) < max_frames:
+            t0 = time.perf_counter()
+            siguiente = next(frames, None)
+            if siguiente is None:
+                break
+            seq, ts, frame = siguiente
+            t1 = time.perf_counter()
+            self.reloj.fijar(ts)
+            p, _, modo = self.vision.paso(self.camara, seq, ts, frame)
+            t2 = time.perf_counter()
+            if self.grabacion:
+                self.grabacion.write(json.dumps(p.to_dict()) + "\n")
+            self._decidir(p)
+            t3 = time.perf_counter()
+
+            self.modos[modo] = self.modos.get(modo, 0) + 1
+            self.latencias["captura"].append(t1 - t0)
+            self.latencias["vision"].append(t2 - t1)
+            self.latencias["cerebro"].append(t3 - t2)
+            self.latencias["total"].append(t3 - t0)
+
+    def correr_log(self, ruta, max_frames=None):
+        self._armar_agentes()
+        for p in leer_percepciones(ruta):
+            if max_frames is not None and len(self.latencias["total"]) >= max_frames:
+                break
+            t0 = time.perf_counter()
+            p.mono_captura = time.monotonic()  # El monotónico grabado es de otra ejecución
+            self._decidir(p)
+            dt = time.perf_counter() - t0
+            self.latencias["cerebro"].append(dt)
+            self.latencias["total"].append(dt)
+
+    def reporte(self, duracion):
+        # Vacía los escritores y el outbox de Telegram antes de contar filas y mensajes
+        for writer in (self.brain.writer, self.executor.writer) + ((self.vision.writer,) if self.vision else ()):
+            writer.flush()
+        limite = time.time() + 5.0
+        while self.notifier.metricas()["outbox"] and time.time() < limite:
+            time.sleep(0.05)
+
+        ordenes = {}
+        reenvios = 0
+        for datos in self.ordenes.enviados:
+            if datos["tipo"] != TIPO_ORDEN:
+                continue
+            if datos["seq"] in ordenes:
+                reenvios += 1
+            else:
+                ordenes[datos["seq"]] = {"ts": round(datos["ts"], 3), "accion": datos["accion"],
+                                         "riesgo": round(datos["riesgo"], 2), "motivo": datos["motivo"]}
+        trazadores = [self.brain.traza, self.executor.traza] + ([self.vision.traza] if self.vision else [])
+        n = len(self.latencias["total"])
+        return {
+            "frames": n,
+            "duracion_s": round(duracion, 3),
+            "fps": round(n / duracion, 1) if duracion else None,
+            "backend": self.vision.backend.nombre if self.vision else None,
+            "modos": self.modos,
+            "latencia_ms": {etapa: percentiles(v) for etapa, v in self.latencias.items() if v},
+            # Histogramas de los propios agentes (mismas etapas que expone /metrics en producción)
+            "trazas": {t.agente: {etapa: {"n": h.n, "p50": round(h.percentil(50) * 1000, 3),
+                                          "p99": round(h.percentil(99) * 1000, 3)}
+                                  for etapa, h in t.etapas.items() if h.n} for t in trazadores},
+            "riesgo_max": max((t["riesgo"] for t in self.timeline), default=0.0),
+            "tramos": tramos(self.timeline),
+            "acciones": list(ordenes.values()),
+            "reenvios": reenvios,
+            "ordenes_sin_ack": len(self.brain.pendientes),
+            "maquina": self.maquina.enviados,
+            "telegram": [texto for _, _, texto in self.telegram.enviados],
+            "tablas": {tabla: len(filas) for tabla, filas in self.db.tablas.items()},
+            "timeline": self.timeline,
+        }
+
+
+def imprimir(r):
+    print(f"\n🎬 REPLAY | {r['frames']} frames en {r['duracion_s']}s ({r['fps']} FPS) | backend {r['backend']}")
+    if r["modos"]:
+        print("   Modos del planificador: " + ", ".join(f"{m}={c}" for m, c in r["modos"].items()))
+    for etapa, lat in r["latencia_ms"].items():
+        print(f"   {etapa:<8} p50 {lat['p50']:7.2f}ms | p95 {lat['p95']:7.2f}ms | max {lat['max']:7.2f}ms")
+    for agente, etapas in r["trazas"].items():
+        for etapa, h in etapas.items():
+            print(f"   {agente}/{etapa:<22} p50 {h['p50']:7.2f}ms | p99 {h['p99']:7.2f}ms | n={h['n']}")
+    print(f"\n📈 Riesgo máximo {r['riesgo_max']:.1f}%")
+    for t in r["tramos"]:
+        print(f"   {t['desde']:8.2f}s - {t['hasta']:8.2f}s | {t['accion'] or 'NOMINAL':<13} | máx {t['riesgo_max']:5.1f}%")
+    print(f"\n⚙️ Acciones ({len(r['acciones'])}, reenvíos {r['reenvios']}, sin ACK {r['ordenes_sin_ack']})")
+    for a in r["acciones"]:
+        print(f"   {a['ts']:8.2f}s {a['accion']:<13} {a['riesgo']:5.1f}%")
+    print(f"\n📨 Telegram: {len(r['telegram'])} mensajes | Máquina: {len(r['maquina'])} cambios | "
+          f"Tablas: {r['tablas']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    fuente = parser.add_mutually_exclusive_group(required=True)
+    fuente.add_argument("--video", help="Video grabado (pasa por detector + cerebro + ejecutor)")
+    fuente.add_argument("--percepciones", help="Log JSON lines de percepciones (solo cerebro + ejecutor)")
+    parser.add_argument("--line-x", type=int, default=300)
+    parser.add_argument("--fps", type=float, help="FPS del reloj virtual (por defecto, el del video)")
+    parser.add_argument("--frames", type=int, help="Máximo de frames a procesar")
+    parser.add_argument("--sin-adaptativo", action="store_true", help="YOLO en todos los frames")
+    parser.add_argument("--guardar-percepcion", help="Graba las percepciones del video en JSON lines")
+    parser.add_argument("--json", help="Escribe el reporte completo en este archivo")
+    parser.add_argument("--verbose", action="store_true", help="Muestra la salida de los agentes")
+    args = parser.parse_args()
+
+    replay = Replay(line_x=args.line_x, adaptativo=not args.sin_adaptativo)
+    salida = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    grabacion = open(args.guardar_percepcion, "w", encoding="utf-8") if args.guardar_percepcion else None
+    replay.grabacion = grabacion
+    try:
+        with salida:
+            t0 = time.perf_counter()
+            if args.video:
+                replay.correr_video(args.video, args.fps, args.frames)
+            else:
+                replay.correr_log(args.percepciones, args.frames)
+            duracion = time.perf_counter() - t0
+            r = replay.reporte(duracion)
+    finally:
+        if grabacion:
+            grabacion.close()
+
+    imprimir(r)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(r, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Reporte completo en {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,394 @@
+"""
+Suite de benchmarks de los caminos calientes del lazo de seguridad. Escribe un JSON comparable entre
+commits (ver benchmarks/compare.py).
+
+Grupos:
+    fuzzy   logic_fuzzy_risk / inferencia_mamdani_riesgo (escalar, lotes y modo tabla)
+    vision  etapas por frame del detector sobre un clip sintético fijo (+ paso YOLO si hay modelo)
+    encode  JPEG a distintas calidades y escalas (OpenCV y TurboJPEG si está instalado)
+    stream  fan-out del servidor de stream con N clientes MJPEG simulados
+    db      DatabaseWriter contra la BD en memoria, SQLite local y con latencia simulada (+ lectura/escritura local)
+
+Uso:
+    python benchmarks/suite.py --salida bench_$(git rev-parse --short HEAD).json
+    python benchmarks/suite.py --grupos fuzzy encode --rapido
+    python benchmarks/compare.py base.json bench_nuevo.json
+
+El grupo stream usa los puertos reales del bus (5555...): correrlo con el sistema detenido.
+"""
+import argparse
+import asyncio
+import copy
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+SEMILLA = 1234
+LINE_X = 300
+
+
+# --- MEDICIÓN ---
+
+def medir(fn, minimo_s=0.5, max_iter=200000, calentamiento=3):
+    """
+    Llama fn() hasta sumar minimo_s. Devuelve ops/s y percentiles por llamada (us).
+    ops/s sale de la mediana (no de la media) para que un pico aislado del SO no parezca una regresión.
+    """
+    for _ in range(calentamiento):
+        fn()
+    tiempos = []
+    inicio = time.perf_counter()
+    while len(tiempos) < max_iter:
+        t0 = time.perf_counter()
+        fn()
+        tiempos.append(time.perf_counter() - t0)
+        if time.perf_counter() - inicio >= minimo_s:
+            break
+    v = np.asarray(tiempos) * 1e6
+    p50 = float(np.percentile(v, 50))
+    return {"ops_s": round(1e6 / p50, 1), "p50_us": round(p50, 2), "p95_us": round(float(np.percentile(v, 95)), 2),
+            "n": len(v)}
+
+
+def medir_frames(fn, frames, minimo_s=0.5):
+    """Como medir(), recorriendo el clip en bucle (fn recibe el índice y el frame)"""
+    estado = {"i": 0}
+
+    def paso():
+        i = estado["i"] % len(frames)
+        estado["i"] += 1
+        fn(i, frames[i])
+
+    return medir(paso, minimo_s)
+
+
+# --- CLIP SINTÉTICO ---
+
+def clip_sintetico(n=120, ancho=640, alto=480, semilla=SEMILLA):
+    """
+    Clip fijo y reproducible: fondo con textura + ruido de sensor y una 'persona' (rectángulo) que cruza
+    la línea de seguridad de izquierda a derecha. Devuelve (frames, detecciones por frame).
+    """
+    rng = np.random.default_rng(semilla)
+    fondo = cv2.GaussianBlur(rng.integers(0, 255, (alto, ancho, 3), dtype=np.uint8), (31, 31), 0)
+    frames, detecciones = [], []
+    for i in range(n):
+        frame = cv2.add(fondo, rng.integers(0, 6, (alto, ancho, 3), dtype=np.uint8))
+        x1 = int(40 + (ancho - 160) * i / max(1, n - 1))
+        y1 = 120 + int(10 * np.sin(i / 5))
+        caja = (x1, y1, x1 + 80, y1 + 260)
+        cv2.rectangle(frame, caja[:2], caja[2:], (40, 60, 90), -1)
+        frames.append(frame)
+        detecciones.append([(0, *caja, 0.9)])
+    return frames, detecciones
+
+
+# --- GRUPOS ---
+
+def bench_fuzzy(minimo_s):
+    from core.fuzzy_logic import (MOTOR_RIESGO_CEREBRO, logic_fuzzy_risk, logic_fuzzy_risk_batch,
+                                  inferencia_mamdani_riesgo, inferencia_mamdani_riesgo_lote)
+
+    rng = np.random.default_rng(SEMILLA)
+    r = {
+        "logic_fuzzy_risk": medir(lambda: logic_fuzzy_risk(280.0, LINE_X, 25.0, False), minimo_s),
+        "inferencia_mamdani_riesgo": medir(lambda: inferencia_mamdani_riesgo(60.0, True), minimo_s),
+    }
+    for lote in (8, 64, 1024):
+        xs = rng.uniform(0, 640, lote)
+        vels = rng.uniform(-100, 150, lote)
+        cels = rng.random(lote) < 0.2
+        res = medir(lambda: logic_fuzzy_risk_batch(xs, LINE_X, vels, cels), minimo_s)
+        res["evals_s"] = round(res["ops_s"] * lote, 1)
+        r[f"logic_fuzzy_risk_batch_{lote}"] = res
+        res = medir(lambda: inferencia_mamdani_riesgo_lote(LINE_X - xs, cels), minimo_s)
+        res["evals_s"] = round(res["ops_s"] * lote, 1)
+        r[f"inferencia_mamdani_riesgo_lote_{lote}"] = res
+
+    # Modo tabla precalculada sobre una copia (no se toca el motor global)
+    tabla = copy.deepcopy(MOTOR_RIESGO_CEREBRO).tabular([(-500, 1000), (-1000, 1000), (0, 10)], [151, 201, 41])
+    dist = rng.uniform(-200, 600, 1024)
+    vels = rng.uniform(-100, 150, 1024)
+    ttcs = rng.uniform(0, 10, 1024)
+    r["motor_cerebro_tabla_1"] = medir(lambda: tabla.evaluar(120.0, 25.0, 4.8), minimo_s)
+    res = medir(lambda: tabla.evaluar_lote(dist, vels, ttcs), minimo_s)
+    res["evals_s"] = round(res["ops_s"] * 1024, 1)
+    r["motor_cerebro_tabla_1024"] = res
+    return r
+
+
+def bench_vision(minimo_s, frames, detecciones, modelo=True):
+    from core.adaptive_inference import MotionGate, FlowPropagator, AdaptiveScheduler
+    from core.detector_backends import letterbox
+    from core.tracking import CentroidTracker
+    from agents.agent_1_detector import VisionCore
+
+    r = {}
+    crudo = cv2.resize(frames[0], (1280, 720))
+    r["preproceso_720p"] = medir(lambda: cv2.flip(cv2.resize(crudo, (640, 480)), 1), minimo_s)
+    r["letterbox_640"] = medir(lambda: letterbox(frames[0], 640), minimo_s)
+
+    gate = MotionGate()
+    r["motion_gate"] = medir_frames(lambda i, f: gate.actualizar(cv2.cvtColor(f, cv2.COLOR_BGR2GRAY)),
+                                    frames, minimo_s)
+
+    flujo = FlowPropagator()
+    r["propagacion_lk"] = medir_frames(lambda i, f: flujo.propagar(flujo.gris(f), detecciones[i - 1]),
+                                       frames, minimo_s)
+
+    # El planificador completo sin modelo: el costo fijo por frame de decidir si hace falta YOLO
+    planificador = AdaptiveScheduler(None, LINE_X)
+    reloj = {"ts": 0.0}
+
+    def planificar(i, f):
+        reloj["ts"] += 1 / 30.0  # El clip se repite en bucle: el tiempo sigue avanzando
+        plan = planificador.planificar(f, reloj["ts"])
+        planificador.completar(plan, detecciones[i] if plan[2] == "FULL" else [])
+
+    r["planificador"] = medir_frames(planificar, frames, minimo_s)
+
+    tracker = CentroidTracker()
+
+    def seguir(i, f):
+        reloj["ts"] += 1 / 30.0
+        tracker.actualizar(detecciones[i], reloj["ts"])
+
+    r["tracker"] = medir_frames(seguir, frames, minimo_s)
+
+    # Dibujo del overlay (copia incluida: el detector dibuja sobre el frame que ya no usa)
+    lienzo = SimpleNamespace(maintenance_mode=False)
+    personas = [{"id": 1, "x": (d[1] + d[3]) // 2, "y": (d[2] + d[4]) // 2, "caja": list(d[1:5])}
+                for d in (dets[0] for dets in detecciones)]
+    r["dibujo"] = medir_frames(lambda i, f: VisionCore.dibujar(lienzo, f.copy(), LINE_X, detecciones[i],
+                                                               [personas[i]]), frames, minimo_s)
+
+    if modelo:
+        try:
+            from core.detector_backends import crear_backend
+            backend = crear_backend()
+        except Exception as e:
+            r["yolo"] = {"omitido": f"{type(e).__name__}: {e}"}
+        else:
+            res = medir_frames(lambda i, f: backend.detectar(f), frames, max(minimo_s, 2.0))
+            res["backend"] = backend.nombre
+            r["yolo"] = res
+    return r
+
+
+def bench_encode(minimo_s, frames):
+    from core.stream_quality import Codificador
+
+    r = {}
+    codificadores = [Codificador(usar_turbo=False)]
+    turbo = Codificador(usar_turbo=True)
+    if turbo.turbo:
+        codificadores.append(turbo)
+    for cod in codificadores:
+        for escala in (1.0, 0.5):
+            reducidos = frames if escala == 1.0 else [cv2.resize(f, None, fx=escala, fy=escala,
+                                                                 interpolation=cv2.INTER_AREA) for f in frames]
+            for calidad in (35, 60, 80):
+                tam = []
+                res = medir_frames(lambda i, f: tam.append(len(cod.codificar(f, calidad))), reducidos, minimo_s)
+                res["bytes"] = int(np.mean(tam))
+                r[f"{cod.nombre}_q{calidad}_x{escala}"] = res
+    return r
+
+
+def _puerto_libre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def bench_stream(duracion, frames, clientes=(1, 8, 32), fps_fuente=30.0):
+    """Publica JPEGs en el puerto de video y mide lo que reciben N clientes MJPEG a la vez"""
+    import zmq
+    from aiohttp import web, ClientSession, ClientTimeout
+    from core.bus import PUERTO_VIDEO, publicar
+    from backend.stream_server import crear_app, FPS_MAX
+
+    jpegs = [cv2.imencode('.jpg', f, [int(cv2.IMWRITE_JPEG_QUALITY), 60])[1].tobytes() for f in frames[:30]]
+    ctx = zmq.Context()
+    pub = ctx.socket(zmq.PUB)
+    pub.setsockopt(zmq.LINGER, 0)
+    pub.bind(f"tcp://*:{PUERTO_VIDEO}")
+    activo = threading.Event()
+    activo.set()
+
+    def publicador():
+        i = 0
+        while activo.is_set():
+            publicar(pub, "cam0", jpegs[i % len(jpegs)])
+            i += 1
+            time.sleep(1.0 / fps_fuente)
+
+    hilo = threading.Thread(target=publicador, daemon=True)
+    hilo.start()
+
+    async def cliente(sesion, url, fin, cuenta):
+        async with sesion.get(url) as resp:
+            while time.monotonic() < fin:
+                try:
+                    linea = await asyncio.wait_for(resp.content.readline(), timeout=fin - time.monotonic())
+                except asyncio.TimeoutError:
+                    break
+                if linea.startswith(b"--frame"):
+                    cuenta[0] += 1
+
+    async def correr():
+        r = {}
+        runner = web.AppRunner(crear_app())
+        await runner.setup()
+        puerto = _puerto_libre()
+        await web.TCPSite(runner, "127.0.0.1", puerto).start()
+        url = f"http://127.0.0.1:{puerto}/video_feed?cam=cam0&fps={FPS_MAX}"
+        try:
+            async with ClientSession(timeout=ClientTimeout(total=None)) as sesion:
+                for n in clientes:
+                    cuentas = [[0] for _ in range(n)]
+                    cpu0 = time.process_time()
+                    fin = time.monotonic() + duracion
+                    await asyncio.gather(*(cliente(sesion, url, fin, c) for c in cuentas))
+                    por_cliente = [c[0] / duracion for c in cuentas]
+                    r[f"clientes_{n}"] = {"frames_s": round(sum(por_cliente), 1),
+                                          "fps_cliente_min": round(min(por_cliente), 1),
+                                          "fps_cliente_media": round(float(np.mean(por_cliente)), 1),
+                                          "cpu_ms_por_frame": round((time.process_time() - cpu0) * 1000 /
+                                                                    max(1, sum(c[0] for c in cuentas)), 3)}
+                    await asyncio.sleep(0.2)
+        finally:
+            await runner.cleanup()
+        return r
+
+    try:
+        return asyncio.run(correr())
+    finally:
+        activo.clear()
+        hilo.join(timeout=1)
+        ctx.destroy(linger=0)
+
+
+class ClienteLento:
+    """BD en memoria con una latencia fija por operación (simula la ida y vuelta a Supabase)"""
+
+    def __init__(self, latencia):
+        from core.memory_db import MemoryClient
+        self.base = MemoryClient()
+        self.latencia = latencia
+
+    def table(self, nombre):
+        consulta = self.base.table(nombre)
+        ejecutar = consulta.execute
+
+        def execute():
+            time.sleep(self.latencia)
+            return ejecutar()
+
+        consulta.execute = execute
+        return consulta
+
+
+def bench_db(minimo_s, filas=20000):
+    import tempfile
+    from core.db_writer import DatabaseWriter
+    from core.memory_db import MemoryClient
+    from core.local_db import LocalClient
+
+    r = {}
+    directorio = tempfile.mkdtemp(prefix="serpiente_bench_")
+    local = LocalClient(os.path.join(directorio, "local.db"))
+    for nombre, cliente in (("memoria", MemoryClient()), ("sqlite_local", local), ("latencia_20ms", ClienteLento(0.02))):
+        writer = DatabaseWriter(cliente, nombre=f"BENCH_{nombre}", maxsize=filas,
+                                journal_path=os.path.join(directorio, f"{nombre}.jsonl"))
+        fila = {"accion": "LOG", "motivo": "benchmark", "riesgo": 12.5}
+
+        # Costo para el lazo de control: encolar nunca debe bloquear
+        encolar = medir(lambda: writer.update("telemetria_cerebro", {"riesgo_actual": 1.0}), minimo_s)
+        t0 = time.perf_counter()
+        for _ in range(filas):
+            writer.insert("acciones_sistema", fila)
+        t_encolado = time.perf_counter() - t0
+        writer.flush(timeout=60)
+        total = time.perf_counter() - t0
+        m = writer.metricas()
+        r[nombre] = {"update_encolar_p50_us": encolar["p50_us"], "update_encolar_p95_us": encolar["p95_us"],
+                     "insert_encolar_us": round(t_encolado / filas * 1e6, 2),
+                     "filas_s": round(m["filas_escritas"] / total, 1), "descartadas": m["descartadas"]}
+
+    # Lectura y escritura directas contra la BD local (sin write-behind)
+    leer = medir(lambda: local.table("telemetria_cerebro").select("*").eq("id", 1).maybe_single().execute(), minimo_s)
+    escribir = medir(lambda: local.table("acciones_sistema").insert(fila).execute(), minimo_s)
+    r["sqlite_local"].update({"lectura_p50_us": leer["p50_us"], "lectura_p95_us": leer["p95_us"],
+                              "escritura_p50_us": escribir["p50_us"], "escritura_p95_us": escribir["p95_us"]})
+    return r
+
+
+# --- EJECUCIÓN ---
+
+def metadatos():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = None
+    return {"commit": commit, "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+            "numpy": np.__version__, "opencv": cv2.__version__, "plataforma": platform.platform(),
+            "cpus": os.cpu_count(), "procesador": platform.processor()}
+
+
+GRUPOS = ("fuzzy", "vision", "encode", "stream", "db")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--grupos", nargs="+", choices=GRUPOS, default=list(GRUPOS))
+    parser.add_argument("--salida", default="benchmarks/resultados.json")
+    parser.add_argument("--rapido", action="store_true", help="Menos tiempo por caso (más ruido)")
+    parser.add_argument("--sin-modelo", action="store_true", help="Omite el paso YOLO del grupo vision")
+    parser.add_argument("--clientes", type=int, nargs="+", default=[1, 8, 32])
+    args = parser.parse_args()
+
+    minimo_s = 0.2 if args.rapido else 1.0
+    cv2.setNumThreads(1)  # Resultados comparables entre máquinas con distinto número de núcleos
+    frames, detecciones = clip_sintetico()
+
+    resultados = {"meta": metadatos(), "resultados": {}}
+    for grupo in args.grupos:
+        print(f"⏱️ [BENCH] {grupo}...")
+        t0 = time.perf_counter()
+        if grupo == "fuzzy":
+            res = bench_fuzzy(minimo_s)
+        elif grupo == "vision":
+            res = bench_vision(minimo_s, frames, detecciones, modelo=not args.sin_modelo)
+        elif grupo == "encode":
+            res = bench_encode(minimo_s, frames)
+        elif grupo == "stream":
+            res = bench_stream(2.0 if args.rapido else 5.0, frames, args.clientes)
+        else:
+            res = bench_db(minimo_s)
+        resultados["resultados"][grupo] = res
+        for caso, valores in res.items():
+            resumen = " | ".join(f"{k} {v}" for k, v in valores.items())
+            print(f"   {grupo}/{caso}: {resumen}")
+        print(f"   ({time.perf_counter() - t0:.1f}s)")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.salida)), exist_ok=True)
+    with open(args.salida, "w", encoding="utf-8") as f:
+        json.dump(resultados, f, indent=2, ensure_ascii=False)
+    print(f"💾 [BENCH] Resultados en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,417 @@
+"""
+Capa de actuadores del ejecutor: salidas físicas concurrentes y no bloqueantes.
+
+- Señales: "interlock" (relé de corte, bool), "sirena" (bool) y "baliza" (torre de luces: "rojo", "amarillo",
+  "verde").
+- Cada salida tiene su propio hilo y cola: el lazo de órdenes solo encola y sigue leyendo, y una salida lenta o
+  caída no frena a las demás. En cada salida el interlock va por un canal aparte (hilo, cola y, en Modbus,
+  conexión propios): nunca espera a una escritura cosmética en curso o en timeout.
+- Los pulsos (interlock N s, advertencia N s) vuelven al reposo con un temporizador, no con esperas en el lazo.
+
+Salidas (SERPIENTE_ACTUADORES, separadas por coma; por defecto "consola,sirena"):
+  consola                         color de la consola (Windows) según interlock / baliza
+  sirena                          WAV en bucle: winsound (Windows), paplay / aplay (Linux) o aviso por consola
+  modbus://host:502?unidad=1&interlock=0&sirena=1&rojo=2&amarillo=3&verde=4
+                                  bobinas de un PLC o módulo de E/S por Modbus-TCP (sin dependencias)
+
+Prueba sin hardware: python core/actuators.py --simular 5020
+y SERPIENTE_ACTUADORES="consola,modbus://127.0.0.1:5020" en el ejecutor.
+"""
+import os
+import queue
+import shutil
+import socket
+import struct
+import subprocess
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+
+try:
+    import winsound  # Solo existe en Windows
+except ImportError:
+    winsound = None
+
+RUTA_SONIDO = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "agents", "sounds",
+                           "SonidoAlarma.wav")
+
+COLORES_BALIZA = ("rojo", "amarillo", "verde")
+
+
+class Salida:
+    """Un dispositivo de salida. aplicar() puede tardar (red, proceso externo): corre en el hilo de su canal."""
+    nombre = "salida"
+    senales = ("interlock", "sirena", "baliza")  # Las que maneja; el resto ni se le encola
+
+    def aplicar(self, senal, valor):
+        raise NotImplementedError
+
+    def dedicada(self):
+        """Instancia para el canal exclusivo del interlock (sin estado compartido: la misma)"""
+        return self
+
+    def cerrar(self):
+        pass
+
+
+# --- SALIDAS ---
+
+class Consola(Salida):
+    """Pantalla del puesto: rojo con interlock, amarillo en advertencia (color de consola, solo Windows)"""
+    nombre = "consola"
+    senales = ("interlock", "baliza")
+    COLORES = {"rojo": "4f", "amarillo": "60", "verde": "07"}
+
+    def aplicar(self, senal, valor):
+        codigo = ("4f" if valor else "07") if senal == "interlock" else self.COLORES.get(valor, "07")
+        if os.name == "nt":
+            os.system(f"color {codigo}")
+
+
+class Sirena(Salida):
+    """Sirena local: el WAV se repite cada 'intervalo' s en un hilo propio hasta que se apaga"""
+    nombre = "sirena"
+    senales = ("sirena",)
+
+    def __init__(self, ruta=RUTA_SONIDO, intervalo=1.0):
+        self.ruta = ruta
+        self.intervalo = intervalo
+        self.reproductor = None if winsound else (shutil.which("paplay") or shutil.which("aplay"))
+        self._parar = threading.Event()
+        self._hilo = None
+
+    def aplicar(self, senal, valor):
+        if valor:
+            self._parar.clear()
+            if not (self._hilo and self._hilo.is_alive()):
+                self._hilo = threading.Thread(target=self._bucle, daemon=True, name="sirena")
+                self._hilo.start()
+        else:
+            # Sin join: el bucle termina en su próxima vuelta y el canal queda libre
+            self._parar.set()
+
+    def _bucle(self):
+        print("🔔 Siren worker started")
+        hay_wav = os.path.exists(self.ruta)
+        if not hay_wav:
+            print(f"⚠️ Sound file not found: {self.ruta} — usando salida por consola")
+        proceso = None
+        try:
+            while not self._parar.is_set():
+                if hay_wav and winsound:
+                    winsound.PlaySound(self.ruta, winsound.SND_FILENAME | winsound.SND_ASYNC)
+                elif hay_wav and self.reproductor:
+                    if proceso is None or proceso.poll() is not None:
+                        proceso = subprocess.Popen([self.reproductor, self.ruta], stdout=subprocess.DEVNULL,
+                                                   stderr=subprocess.DEVNULL)
+                else:
+                    print("🔊 SIRENA: ON")
+                self._parar.wait(self.intervalo)
+        except Exception as e:
+            print("⚠️ Error en siren worker:", e)
+        finally:
+            # Al salir, detener cualquier sonido en reproducción
+            try:
+                if winsound:
+                    winsound.PlaySound(None, winsound.SND_PURGE)
+                if proceso and proceso.poll() is None:
+                    proceso.terminate()
+            except Exception:
+                pass
+        print("🔕 Siren worker stopped")
+
+    def cerrar(self):
+        self._parar.set()
+
+
+class ModbusTCP(Salida):
+    """
+    Bobinas por Modbus-TCP (función 05, Write Single Coil). interlock y sirena son una bobina cada una;
+    la baliza enciende la bobina de su color y apaga las otras dos.
+    """
+    nombre = "modbus"
+    BOBINAS = {"interlock": 0, "sirena": 1, "rojo": 2, "amarillo": 3, "verde": 4}
+
+    def __init__(self, host, puerto=502, unidad=1, bobinas=None, timeout=0.5):
+        self.host = host
+        self.puerto = puerto
+        self.unidad = unidad
+        self.bobinas = {**self.BOBINAS, **(bobinas or {})}
+        self.timeout = timeout
+        self.nombre = f"modbus {host}:{puerto}"
+        self._sock = None
+        self._tid = 0
+
+    @classmethod
+    def desde_url(cls, url):
+        u = urlparse(url)
+        params = {k: int(v[-1]) for k, v in parse_qs(u.query).items()}
+        unidad = params.pop("unidad", 1)
+        desconocidas = set(params) - set(cls.BOBINAS)
+        if desconocidas:
+            raise ValueError(f"Bobinas desconocidas en {url}: {', '.join(sorted(desconocidas))}")
+        return cls(u.hostname, u.port or 502, unidad, params)
+
+    def dedicada(self):
+        # Conexión TCP propia: una escritura de la baliza colgada no retiene el socket del relé
+        return ModbusTCP(self.host, self.puerto, self.unidad, self.bobinas, self.timeout)
+
+    def aplicar(self, senal, valor):
+        if senal == "baliza":
+            for color in COLORES_BALIZA:
+                self.escribir_bobina(self.bobinas[color], color == valor)
+        else:
+            self.escribir_bobina(self.bobinas[senal], bool(valor))
+
+    def escribir_bobina(self, direccion, valor):
+        self._tid = (self._tid + 1) & 0xFFFF
+        trama = struct.pack(">HHHBBHH", self._tid, 0, 6, self.unidad, 0x05, direccion, 0xFF00 if valor else 0)
+        # Un reintento con conexión nueva: el equipo pudo cerrar la conexión ociosa
+        for intento in (0, 1):
+            try:
+                if self._sock is None:
+                    self._sock = socket.create_connection((self.host, self.puerto), timeout=self.timeout)
+                    self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                self._sock.sendall(trama)
+                tid, pdu = self._respuesta()
+                break
+            except OSError:
+                self.cerrar()
+                if intento:
+                    raise
+        if tid != self._tid:
+            self.cerrar()
+            raise IOError(f"Respuesta Modbus fuera de secuencia ({tid} != {self._tid})")
+        if pdu[0] & 0x80:
+            raise IOError(f"Excepción Modbus {pdu[1]} escribiendo la bobina {direccion}")
+
+    def _respuesta(self):
+        tid, _, largo, _ = struct.unpack(">HHHB", _recibir(self._sock, 7))
+        return tid, _recibir(self._sock, largo - 1)
+
+    def cerrar(self):
+        if self._sock:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+        self._sock = None
+
+
+def _recibir(sock, n):
+    datos = b""
+    while len(datos) < n:
+        parte = sock.recv(n - len(datos))
+        if not parte:
+            raise ConnectionError("Conexión cerrada por el equipo")
+        datos += parte
+    return datos
+
+
+def crear_salidas(spec=None):
+    """Salidas desde SERPIENTE_ACTUADORES (ver cabecera del módulo)"""
+    spec = spec if spec is not None else os.getenv("SERPIENTE_ACTUADORES", "consola,sirena")
+    salidas = []
+    for item in (s.strip() for s in spec.split(",") if s.strip()):
+        if item == "consola":
+            salidas.append(Consola())
+        elif item == "sirena":
+            salidas.append(Sirena())
+        elif item.startswith("modbus://"):
+            salidas.append(ModbusTCP.desde_url(item))
+        else:
+            raise ValueError(f"Actuador desconocido: {item}")
+    return salidas
+
+
+# --- CANALES Y PULSOS ---
+
+class Canal:
+    """Hilo y cola (FIFO) de una salida para un subconjunto de sus señales"""
+
+    def __init__(self, salida, senales, traza=None):
+        self.salida = salida
+        self.senales = senales
+        self.traza = traza
+        self.nombre = f"{salida.nombre} ({','.join(senales)})"
+        self.cola = queue.Queue()
+        self.aplicados = 0
+        self.fallos = 0
+        threading.Thread(target=self._loop, daemon=True, name=f"actuador-{self.nombre}").start()
+
+    def enviar(self, senal, valor, t0, confirmacion=None):
+        self.cola.put((senal, valor, t0, confirmacion))
+
+    def _loop(self):
+        while True:
+            senal, valor, t0, confirmacion = self.cola.get()
+            ok = False
+            try:
+                self.salida.aplicar(senal, valor)
+                self.aplicados += 1
+                ok = True
+                if self.traza and senal == "interlock" and valor:
+                    # Orden recibida -> salida física confirmada (por dispositivo)
+                    self.traza.desde(f"interlock_{self.salida.nombre}", t0)
+            except Exception as e:
+                self.fallos += 1
+                print(f"⚠️ [ACTUADOR] {self.salida.nombre}: {senal}={valor} falló ({e})")
+            if confirmacion:
+                confirmacion.listo(ok)
+
+
+class _Confirmacion:
+    """Resultado de una señal en todos sus canales: llama al_aplicar(ok) una sola vez, cuando terminaron todos"""
+
+    def __init__(self, canales, al_aplicar):
+        self.faltan = canales
+        self.ok = True
+        self.al_aplicar = al_aplicar
+        self._lock = threading.Lock()
+
+    def listo(self, ok):
+        with self._lock:
+            self.ok = self.ok and ok
+            self.faltan -= 1
+            if self.faltan:
+                return
+        try:
+            self.al_aplicar(self.ok)
+        except Exception as e:
+            print(f"⚠️ [ACTUADOR] Error en la confirmación: {e}")
+
+
+class Actuadores:
+    """Reparte cada señal a todas las salidas (cada una en su canal) y vuelve los pulsos al reposo"""
+
+    def __init__(self, salidas=(), traza=None):
+        self.canales = []
+        for salida in salidas:
+            if "interlock" in salida.senales:
+                self.canales.append(Canal(salida.dedicada(), ("interlock",), traza))
+            cosmeticas = tuple(s for s in salida.senales if s != "interlock")
+            if cosmeticas:
+                self.canales.append(Canal(salida, cosmeticas, traza))
+        self._lock = threading.Lock()
+        self._pulsos = {}  # señal -> (vence_mono, valor, reposo)
+        self._cambio = threading.Event()
+        if self.canales:
+            threading.Thread(target=self._temporizador, daemon=True, name="actuador-pulsos").start()
+
+    def _enviar(self, senal, valor, t0=None, al_aplicar=None):
+        t0 = t0 or time.monotonic()
+        canales = [c for c in self.canales if senal in c.senales]
+        confirmacion = _Confirmacion(len(canales), al_aplicar) if al_aplicar and canales else None
+        for canal in canales:
+            canal.enviar(senal, valor, t0, confirmacion)
+        if al_aplicar and not canales:
+            # Ninguna salida maneja la señal (p. ej. efectos=False): no hay nada que esperar
+            al_aplicar(True)
+
+    def fijar(self, senal, valor, t0=None, al_aplicar=None):
+        """
+        Estado fijo (cancela un pulso en curso de la misma señal). al_aplicar(ok) se llama desde el hilo del
+        último canal cuando todas las salidas de la señal terminaron; ok=False si alguna falló.
+        """
+        with self._lock:
+            self._pulsos.pop(senal, None)
+        self._enviar(senal, valor, t0, al_aplicar)
+
+    def pulso(self, senal, valor, duracion, reposo, t0=None, al_aplicar=None):
+        """
+        'valor' durante 'duracion' s y luego 'reposo'. Un pulso nuevo de la misma señal reemplaza al anterior.
+        al_aplicar: como en fijar(), solo para el flanco inicial.
+        """
+        self._enviar(senal, valor, t0, al_aplicar)
+        with self._lock:
+            self._pulsos[senal] = (time.monotonic() + duracion, valor, reposo)
+        self._cambio.set()
+
+    def activo(self, senal):
+        """Valor del pulso en curso de la señal, o None"""
+        with self._lock:
+            pulso = self._pulsos.get(senal)
+        return pulso[1] if pulso and pulso[0] > time.monotonic() else None
+
+    def _temporizador(self):
+        while True:
+            with self._lock:
+                proximo = min((p[0] for p in self._pulsos.values()), default=None)
+            espera = None if proximo is None else max(0.0, proximo - time.monotonic())
+            if self._cambio.wait(espera):
+                self._cambio.clear()
+                continue
+            ahora = time.monotonic()
+            with self._lock:
+                vencidos = [(s, p[2]) for s, p in self._pulsos.items() if p[0] <= ahora]
+                for senal, _ in vencidos:
+                    del self._pulsos[senal]
+            for senal, reposo in vencidos:
+                self._enviar(senal, reposo)
+
+    def resumen(self):
+        return " | ".join(f"{c.nombre} {c.aplicados} ok {c.fallos} fallos {c.cola.qsize()} en cola"
+                          for c in self.canales)
+
+
+# --- SIMULADOR (pruebas sin hardware) ---
+
+class SimuladorModbus:
+    """
+    Equipo Modbus-TCP mínimo en localhost: acepta Write Single Coil e imprime los cambios de bobinas.
+    Para pruebas: 'demoras' {bobina: s} simula un equipo lento y 'fallas' {bobina} responde con excepción 04.
+    """
+
+    def __init__(self, puerto=5020, host="127.0.0.1", demoras=None, fallas=None):
+        self.bobinas = {}
+        self.demoras = demoras or {}
+        self.fallas = fallas or set()
+        self.servidor = socket.create_server((host, puerto))
+        self.puerto = self.servidor.getsockname()[1]
+        threading.Thread(target=self._aceptar, daemon=True, name="simulador-modbus").start()
+
+    def _aceptar(self):
+        while True:
+            con, _ = self.servidor.accept()
+            threading.Thread(target=self._atender, args=(con,), daemon=True).start()
+
+    def _atender(self, con):
+        nombres = {v: k for k, v in ModbusTCP.BOBINAS.items()}
+        with con:
+            try:
+                while True:
+                    tid, proto, largo, unidad = struct.unpack(">HHHB", _recibir(con, 7))
+                    pdu = _recibir(con, largo - 1)
+                    direccion = struct.unpack(">H", pdu[1:3])[0] if len(pdu) >= 3 else None
+                    time.sleep(self.demoras.get(direccion, 0.0))
+                    if pdu[0] == 0x05 and direccion in self.fallas:
+                        resp = bytes([0x85, 0x04])  # Falla del equipo
+                    elif pdu[0] == 0x05:
+                        valor = struct.unpack(">H", pdu[3:5])[0]
+                        if self.bobinas.get(direccion) != (valor == 0xFF00):
+                            print(f"🔌 [SIM MODBUS] bobina {direccion} ({nombres.get(direccion, '?')}) -> "
+                                  f"{'ON' if valor == 0xFF00 else 'OFF'}")
+                        self.bobinas[direccion] = valor == 0xFF00
+                        resp = pdu[:5]  # Eco de la petición
+                    else:
+                        resp = bytes([pdu[0] | 0x80, 0x01])  # Función no soportada
+                    con.sendall(struct.pack(">HHHB", tid, proto, len(resp) + 1, unidad) + resp)
+            except (ConnectionError, OSError):
+                pass
+
+
+if __name__ == "__main__":
+    import sys
+
+    if "--simular" in sys.argv:
+        i = sys.argv.index("--simular")
+        puerto = int(sys.argv[i + 1]) if len(sys.argv) > i + 1 else 5020
+        sim = SimuladorModbus(puerto)
+        print(f"🧪 Simulador Modbus-TCP en 127.0.0.1:{sim.puerto} (Ctrl+C para salir)")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+    else:
+        print(__doc__)
@@ -0,0 +1,179 @@
+"""
+Planificador adaptativo de inferencia: decide por frame si correr YOLO completo, solo en la franja
+de la línea de seguridad (ROI), o propagar las cajas anteriores con flujo óptico.
+"""
+import time
+
+import cv2
+import numpy as np
+
+from core.tracking import CLASE_PERSONA
+
+
+class MotionGate:
+    """Diferencia contra un fondo promedio sobre una imagen reducida (muy barato comparado con YOLO)"""
+
+    def __init__(self, reduccion=0.5, umbral_pixel=25, alpha=0.05):
+        self.reduccion = reduccion
+        self.umbral_pixel = umbral_pixel
+        self.alpha = alpha
+        self.fondo = None
+
+    def actualizar(self, gris, banda=None):
+        """
+        gris: frame en escala de grises; banda: columnas (x0, x1) en coordenadas de 'gris'.
+        Devuelve (fracción de píxeles en movimiento en todo el frame, fracción dentro de la banda).
+        """
+        chico = cv2.resize(gris, None, fx=self.reduccion, fy=self.reduccion, interpolation=cv2.INTER_AREA)
+        chico = cv2.GaussianBlur(chico, (5, 5), 0).astype(np.float32)
+        if self.fondo is None:
+            self.fondo = chico
+            return 1.0, 1.0
+        mascara = cv2.absdiff(chico, self.fondo) > self.umbral_pixel
+        cv2.accumulateWeighted(chico, self.fondo, self.alpha)
+        total = float(mascara.mean())
+        if banda is None:
+            return total, total
+        x0, x1 = int(banda[0] * self.reduccion), int(banda[1] * self.reduccion)
+        zona = mascara[:, x0:max(x0 + 1, x1)]
+        return total, float(zona.mean()) if zona.size else 0.0
+
+
+class FlowPropagator:
+    """Desplaza las cajas de la última detección con la mediana del flujo Lucas-Kanade de sus esquinas"""
+
+    def __init__(self, escala=0.5):
+        self.escala = escala
+        self.prev = None
+        self.lk = dict(winSize=(15, 15), maxLevel=2,
+                       criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03))
+
+    def gris(self, frame):
+        chico = cv2.resize(frame, None, fx=self.escala, fy=self.escala, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(chico, cv2.COLOR_BGR2GRAY)
+
+    def propagar(self, gris, detecciones):
+        """Devuelve las detecciones desplazadas de self.prev a 'gris' y guarda 'gris' como referencia"""
+        prev, self.prev = self.prev, gris
+        if prev is None or not detecciones:
+            return detecciones
+        s = self.escala
+        movidas = []
+        for cls, x1, y1, x2, y2, *resto in detecciones:
+            mascara = np.zeros_like(prev)
+            mascara[int(y1 * s):int(y2 * s), int(x1 * s):int(x2 * s)] = 255
+            puntos = cv2.goodFeaturesToTrack(prev, maxCorners=20, qualityLevel=0.01, minDistance=3, mask=mascara)
+            if puntos is None:
+                movidas.append((cls, x1, y1, x2, y2, *resto))
+                continue
+            nuevos, ok, _ = cv2.calcOpticalFlowPyrLK(prev, gris, puntos, None, **self.lk)
+            ok = ok.reshape(-1).astype(bool)
+            if not ok.any():
+                movidas.append((cls, x1, y1, x2, y2, *resto))
+                continue
+            dx, dy = np.median((nuevos - puntos).reshape(-1, 2)[ok], axis=0) / s
+            dx, dy = int(round(dx)), int(round(dy))
+            movidas.append((cls, x1 + dx, y1 + dy, x2 + dx, y2 + dy, *resto))
+        return movidas
+
+
+class AdaptiveScheduler:
+    """
+    Política por frame (del más caro al más barato):
+    - FULL: frame completo cada 'periodo_completo' s si hay movimiento (o 'periodo_reposo' si la escena está quieta).
+    - ROI: franja de +-'margen' px alrededor de line_x, a mayor resolución efectiva (el backend la escala a su
+      entrada), cada 'max_gap' s mientras haya personas cerca de la línea o movimiento en la franja.
+      Esa es la cota de latencia de detección en la zona de peligro.
+    - PROPAGADO: cajas anteriores desplazadas con flujo óptico.
+    - ESTATICO: sin movimiento, se reusan las cajas tal cual.
+    """
+
+    MODOS = ("FULL", "ROI", "PROPAGADO", "ESTATICO")
+
+    def __init__(self, backend, line_x, activo=True, margen=160, zona=120, periodo_completo=1.0,
+                 periodo_reposo=5.0, max_gap=0.2, umbral_movimiento=0.002):
+        self.backend = backend
+        self.line_x = line_x
+        self.activo = activo
+        self.margen = margen
+        self.zona = zona
+        self.periodo_completo = periodo_completo
+        self.periodo_reposo = periodo_reposo
+        self.max_gap = max_gap
+        self.umbral_movimiento = umbral_movimiento
+
+        self.gate = MotionGate()
+        self.flujo = FlowPropagator()
+        self.detecciones = []
+        self.ultimo_full = 0.0
+        self.ultima_inferencia = 0.0
+        self.conteo = {m: 0 for m in self.MODOS}
+
+    def _banda(self, ancho):
+        return max(0, self.line_x - self.margen), min(ancho, self.line_x + self.margen)
+
+    def _cerca(self):
+        """¿Alguna persona conocida toca la zona de aproximación a la línea?"""
+        return any(d[0] == CLASE_PERSONA and d[3] > self.line_x - self.zona for d in self.detecciones)
+
+    def _fusionar_roi(self, crudas, banda):
+        x0, x1 = banda
+        en_roi = [(cls, a + x0, b, c + x0, d, *r) for cls, a, b, c, d, *r in crudas]
+        # Fuera de la franja se conservan las cajas propagadas
+        fuera = [d for d in self.detecciones if (d[1] + d[3]) / 2 < x0 or (d[1] + d[3]) / 2 > x1]
+        return fuera + en_roi
+
+    def planificar(self, frame, ts=None):
+        """
+        Decide qué necesita este frame sin llamar al modelo (así varias cámaras comparten un lote).
+        Devuelve el plan (imagen a inferir o None, banda ROI o None, modo).
+        """
+        ts = time.time() if ts is None else ts
+        if not self.activo:
+            return frame, None, "FULL"
+
+        banda = self._banda(frame.shape[1])
+        gris = self.flujo.gris(frame)
+        e = self.flujo.escala
+        mov_total, mov_banda = self.gate.actualizar(gris, (banda[0] * e, banda[1] * e))
+        hay_movimiento = mov_total > self.umbral_movimiento
+
+        # Entre inferencias las cajas siguen al movimiento (también sirve de base para el ROI)
+        if hay_movimiento:
+            self.detecciones = self.flujo.propagar(gris, self.detecciones)
+            modo = "PROPAGADO"
+        else:
+            self.flujo.prev = gris
+            modo = "ESTATICO"
+
+        periodo = self.periodo_completo if hay_movimiento else self.periodo_reposo
+        if ts - self.ultimo_full >= periodo:
+            self.ultimo_full = self.ultima_inferencia = ts
+            return frame, None, "FULL"
+        if (self._cerca() or mov_banda > self.umbral_movimiento) and \
+                ts - self.ultima_inferencia >= self.max_gap:
+            self.ultima_inferencia = ts
+            return np.ascontiguousarray(frame[:, banda[0]:banda[1]]), banda, "ROI"
+        return None, None, modo
+
+    def completar(self, plan, crudas=None):
+        """Integra la salida del modelo (si el plan la pidió). Devuelve (detecciones, modo)."""
+        _, banda, modo = plan
+        if modo == "FULL":
+            self.detecciones = crudas
+        elif modo == "ROI":
+            self.detecciones = self._fusionar_roi(crudas, banda)
+        self.conteo[modo] += 1
+        return self.detecciones, modo
+
+    def detectar(self, frame, ts=None):
+        """Planifica, infiere (si hace falta) y devuelve (detecciones, modo) para este frame"""
+        plan = self.planificar(frame, ts)
+        crudas = self.backend.detectar(plan[0]) if plan[0] is not None else None
+        return self.completar(plan, crudas)
+
+    def resumen(self):
+        total = sum(self.conteo.values()) or 1
+        full = self.conteo["FULL"] / total
+        partes = " ".join(f"{m}:{100 * n / total:.0f}%" for m, n in self.conteo.items())
+        return f"[PLANIFICADOR] {partes} | inferencia completa en {100 * full:.0f}% de frames"
@@ -0,0 +1,149 @@
+"""Canales ZMQ entre agentes (percepción, órdenes al ejecutor y stream JPEG)."""
+import json
+from dataclasses import dataclass, asdict, field, fields
+
+import zmq
+
+# --- PUERTOS DEL BUS ---
+PUERTO_VIDEO = 5555  # JPEG para el streamer (XPUB, multipart [tópico de cámara, jpeg]; solo cámaras con visores)
+PUERTO_PERCEPCION = 5556  # Percepción tipada Detector -> Cerebro (PUB/SUB, multipart [tópico de cámara, json])
+PUERTO_ORDENES = 5557  # Órdenes + riesgo Cerebro -> Ejecutor (PUSH/PULL)
+PUERTO_ACKS = 5558  # Confirmaciones Ejecutor -> Cerebro (PUSH/PULL)
+PUERTO_TELEMETRIA = 5559  # Riesgo y estado lógico del Cerebro -> HMI (PUB/SUB)
+PUERTO_MAQUINA = 5560  # Estado de la máquina aplicado por el Ejecutor -> HMI (PUB/SUB)
+PUERTO_FRAMES = 5561  # Aviso de frame crudo en memoria compartida (PUB, multipart [tópico, {anillo, slot, seq, ts}])
+PUERTO_VISORES = 5562  # Consumo real de los visores por cámara Stream -> Detector (PUSH/PULL)
+PUERTO_METRICAS = 5563  # Histogramas de latencia de cada agente -> servidor de métricas (PUSH/PULL)
+
+# Tipos de mensaje en el canal de órdenes
+TIPO_RIESGO = "RIESGO"  # Actualización de riesgo (sin confirmación)
+TIPO_ORDEN = "ORDEN"  # Orden física: requiere ACK y se reenvía si no llega
+
+
+@dataclass
+class Percepcion:
+    """Mensaje de percepción publicado por el detector en cada frame"""
+    seq: int  # Número de secuencia del frame (por cámara)
+    ts: float  # Timestamp de captura del frame (epoch, s)
+    camara: str = "cam0"
+    line_x: int = 300  # Línea de seguridad de esta cámara
+    hay_persona: bool = False
+    punto_medio_x: int = 0
+    punto_medio_y: int = 0
+    tiene_celular: bool = False
+    # Todas las personas seguidas en el frame: [{"id", "x", "y", "caja", "celular"}, ...]
+    personas: list = field(default_factory=list)
+    # Traza de latencia: ID del frame y time.monotonic() de captura (reloj común a los procesos del equipo)
+    trace: str = ""
+    mono_captura: float = 0.0
+    config: str = ""  # Versión de la config del detector (línea) con que se generó
+
+    def to_dict(self):
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data):
+        nombres = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in data.items() if k in nombres})
+
+
+@dataclass
+class Orden:
+    """Mensaje Cerebro -> Ejecutor. El riesgo viaja siempre, haya orden o no."""
+    seq: int  # Secuencia del canal (por sesión del cerebro)
+    origen: str  # ID de sesión del cerebro (detecta reinicios)
+    tipo: str  # TIPO_RIESGO | TIPO_ORDEN
+    riesgo: float
+    ts: float  # Timestamp de captura del frame que originó la decisión
+    ts_envio: float = 0.0
+    accion: str = None
+    motivo: str = ""
+    # Traza del frame que originó la decisión y monotónicos de captura y envío
+    trace: str = ""
+    mono_captura: float = 0.0
+    mono_envio: float = 0.0
+    config: str = ""  # Versión de la config del cerebro (umbrales) con que se decidió
+
+    def to_dict(self):
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data):
+        nombres = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in data.items() if k in nombres})
+
+
+# --- TÓPICOS POR CÁMARA ---
+# El separador final evita que la suscripción a "cam1" reciba también "cam10" (ZMQ filtra por prefijo)
+
+def topico_camara(camara):
+    return f"{camara}:".encode()
+
+
+def publicar(sock, camara, payload, flags=0):
+    """Envía [tópico de cámara, payload bytes]"""
+    sock.send_multipart([topico_camara(camara), payload], flags)
+
+
+def publicar_json(sock, camara, datos, flags=0):
+    publicar(sock, camara, json.dumps(datos).encode(), flags)
+
+
+def separar(partes):
+    """[tópico, payload] -> (camara, payload)"""
+    topico, payload = partes[0], partes[-1]
+    return topico.decode().rstrip(":"), payload
+
+
+def recibir(sock, flags=0):
+    """Recibe un mensaje por cámara. Devuelve (camara, payload bytes)."""
+    return separar(sock.recv_multipart(flags))
+
+
+def recibir_json(sock, flags=0):
+    camara, payload = recibir(sock, flags)
+    return camara, json.loads(payload)
+
+
+def crear_publicador(context, puerto, hwm=10):
+    """Socket PUB enlazado en todas las interfaces. HWM bajo: si nadie lee, se descarta."""
+    sock = context.socket(zmq.PUB)
+    sock.setsockopt(zmq.SNDHWM, hwm)
+    sock.setsockopt(zmq.LINGER, 0)
+    sock.bind(f"tcp://*:{puerto}")
+    return sock
+
+
+def crear_suscriptor(context, puerto, host="localhost", topico=b"", hwm=10, camaras=None):
+    """Socket SUB conectado a un publicador del bus. Con 'camaras' se suscribe solo a esos tópicos."""
+    sock = context.socket(zmq.SUB)
+    sock.setsockopt(zmq.RCVHWM, hwm)
+    sock.setsockopt(zmq.LINGER, 0)
+    sock.connect(f"tcp://{host}:{puerto}")
+    for t in ([topico_camara(c) for c in camaras] if camaras else [topico]):
+        sock.setsockopt(zmq.SUBSCRIBE, t)
+    return sock
+
+
+def crear_push(context, puerto, host=None, hwm=100):
+    """Socket PUSH. Con host=None se enlaza (bind); si no, se conecta a host:puerto."""
+    sock = context.socket(zmq.PUSH)
+    sock.setsockopt(zmq.SNDHWM, hwm)
+    sock.setsockopt(zmq.LINGER, 0)
+    if host is None:
+        sock.bind(f"tcp://*:{puerto}")
+    else:
+        sock.connect(f"tcp://{host}:{puerto}")
+    return sock
+
+
+def crear_pull(context, puerto, host=None, hwm=100):
+    """Socket PULL. Con host=None se enlaza (bind); si no, se conecta a host:puerto."""
+    sock = context.socket(zmq.PULL)
+    sock.setsockopt(zmq.RCVHWM, hwm)
+    sock.setsockopt(zmq.LINGER, 0)
+    if host is None:
+        sock.bind(f"tcp://*:{puerto}")
+    else:
+        sock.connect(f"tcp://{host}:{puerto}")
+    return sock
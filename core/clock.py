@@ -0,0 +1,30 @@
+"""Relojes inyectables: el real para producción y uno virtual para reproducir grabaciones sin esperar."""
+import time
+
+
+class RelojReal:
+    def ahora(self):
+        return time.time()
+
+    def dormir(self, segundos):
+        time.sleep(segundos)
+
+
+class RelojVirtual:
+    """El tiempo solo avanza cuando se lo pide el arnés (o cuando un agente 'duerme')"""
+
+    def __init__(self, inicio=0.0):
+        self.t = inicio
+
+    def ahora(self):
+        return self.t
+
+    def dormir(self, segundos):
+        self.t += segundos
+
+    def fijar(self, t):
+        # Nunca hacia atrás: un agente pudo haber 'dormido' más allá del próximo frame
+        self.t = max(self.t, t)
+
+
+RELOJ_REAL = RelojReal()
@@ -0,0 +1,211 @@
+"""
+Configuración de ejecución centralizada, tipada y recargable en caliente.
+
+- Fuente: JSON en SERPIENTE_CONFIG (por defecto serpiente_config.json). Lo que falta toma el valor por
+  defecto; una clave desconocida o un valor inválido rechaza el archivo entero y sigue la config anterior.
+- Recarga: un hilo vigila el archivo y publica una Config nueva e inmutable. Cada agente toma UNA foto
+  (config.actual()) por frame / decisión / orden, así que un cambio se aplica atómicamente entre frames.
+- Versión: hash del contenido efectivo, igual en todos los agentes; viaja en percepciones, órdenes y
+  telemetría para saber con qué config se tomó cada decisión.
+
+Uso: python core/config.py            (muestra la config efectiva y su versión)
+     python core/config.py --escribir (crea el archivo con los valores actuales, para editarlo)
+"""
+import dataclasses
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+
+RUTA_CONFIG = os.getenv("SERPIENTE_CONFIG", "serpiente_config.json")
+
+
+def _lineas_entorno():
+    """Compatibilidad: SERPIENTE_LINEAS="300,320" -> {"cam0": 300, "cam1": 320}"""
+    lineas = [int(l) for l in os.getenv("SERPIENTE_LINEAS", "").split(",") if l.strip()]
+    return {f"cam{i}": l for i, l in enumerate(lineas)}
+
+
+@dataclass(frozen=True)
+class ConfigDetector:
+    line_x: int = 300  # Línea de seguridad de las cámaras sin entrada en 'lineas'
+    lineas: dict = field(default_factory=_lineas_entorno)  # {"cam0": 300, ...}
+    zona_advertencia_px: int = 80  # Franja antes de la línea que cuenta como zona de advertencia
+    intervalo_bd_s: float = 0.8  # Auditoría en mundo_percepcion: máx. una fila por cámara cada tanto
+    intervalo_mantenimiento_s: float = 2.0  # Lectura del modo mantenimiento
+
+    def linea(self, camara):
+        return int(self.lineas.get(camara, self.line_x))
+
+
+@dataclass(frozen=True)
+class ConfigCerebro:
+    umbral_parada: float = 85.0  # Riesgo > umbral -> PARADA_TOTAL
+    umbral_advertencia: float = 40.0  # Riesgo > umbral -> ADVERTENCIA
+    repetir_orden_s: float = 0.8  # Una misma orden se reenvía como máximo cada tanto
+    ttl_camara_s: float = 1.0  # Una cámara sin percepciones por más de esto no cuenta para la decisión
+    modelo_cinematico: str = os.getenv("SERPIENTE_CINEMATICA", "cv")  # "cv" o "ca" (tracks nuevos)
+
+
+@dataclass(frozen=True)
+class ConfigEjecutor:
+    riesgo_notificar: float = 100.0  # PARADA_TOTAL: Telegram solo con riesgo >= esto
+    riesgo_sirena: float = 90.0  # PARADA_TOTAL: sirena con riesgo > esto
+    riesgo_sirena_auto: float = 100.0  # Riesgo del canal >= esto enciende la sirena sin orden
+    riesgo_apagar_sirena: float = 80.0  # Riesgo del canal <= esto apaga la sirena
+    interlock_s: float = 2.0  # Duración de la señal de interlock (pantalla roja)
+    advertencia_s: float = 1.0  # Duración de la señal de advertencia (pantalla amarilla)
+
+
+SECCIONES = {"detector": ConfigDetector, "cerebro": ConfigCerebro, "ejecutor": ConfigEjecutor}
+
+
+@dataclass(frozen=True)
+class Config:
+    detector: ConfigDetector = field(default_factory=ConfigDetector)
+    cerebro: ConfigCerebro = field(default_factory=ConfigCerebro)
+    ejecutor: ConfigEjecutor = field(default_factory=ConfigEjecutor)
+    version: str = ""
+    origen: str = "defecto"
+
+    def to_dict(self):
+        return {s: dataclasses.asdict(getattr(self, s)) for s in SECCIONES}
+
+
+def _seccion(clase, datos, nombre):
+    if not isinstance(datos, dict):
+        raise ValueError(f"'{nombre}' debe ser un objeto")
+    base = clase()
+    tipos = {f.name: type(getattr(base, f.name)) for f in dataclasses.fields(clase)}
+    valores = {}
+    for clave, valor in datos.items():
+        if clave not in tipos:
+            raise ValueError(f"Clave desconocida: {nombre}.{clave}")
+        tipo = tipos[clave]
+        if tipo is float and isinstance(valor, int) and not isinstance(valor, bool):
+            valor = float(valor)
+        if not isinstance(valor, tipo) or isinstance(valor, bool) != (tipo is bool):
+            raise ValueError(f"{nombre}.{clave} debe ser {tipo.__name__}, no {type(valor).__name__}")
+        valores[clave] = valor
+    return dataclasses.replace(base, **valores)
+
+
+def validar(c):
+    """Reglas entre valores; ValueError con el primer problema"""
+    d, b, e = c.detector, c.cerebro, c.ejecutor
+    if any(not isinstance(v, int) or isinstance(v, bool) or v < 0 for v in [d.line_x, *d.lineas.values()]):
+        raise ValueError("Las líneas deben ser enteros >= 0 (px)")
+    if not 0 <= b.umbral_advertencia < b.umbral_parada <= 100:
+        raise ValueError("Se requiere 0 <= umbral_advertencia < umbral_parada <= 100")
+    if not e.riesgo_apagar_sirena < min(e.riesgo_sirena, e.riesgo_sirena_auto):
+        raise ValueError("riesgo_apagar_sirena debe ser menor que los umbrales de encendido de la sirena")
+    if b.modelo_cinematico not in ("cv", "ca"):
+        raise ValueError("modelo_cinematico debe ser 'cv' o 'ca'")
+    tiempos = [d.intervalo_bd_s, d.intervalo_mantenimiento_s, b.repetir_orden_s, b.ttl_camara_s,
+               e.interlock_s, e.advertencia_s]
+    if any(t <= 0 for t in tiempos) or d.zona_advertencia_px < 0:
+        raise ValueError("Intervalos y duraciones deben ser > 0 y la zona de advertencia >= 0")
+
+
+def desde_dict(datos, origen="defecto"):
+    """Config validada y versionada desde un dict parcial {"detector": {...}, "cerebro": {...}, ...}"""
+    if not isinstance(datos, dict):
+        raise ValueError("La config debe ser un objeto JSON")
+    desconocidas = set(datos) - set(SECCIONES)
+    if desconocidas:
+        raise ValueError(f"Secciones desconocidas: {', '.join(sorted(desconocidas))}")
+    c = Config(**{s: _seccion(clase, datos.get(s, {}), s) for s, clase in SECCIONES.items()}, origen=origen)
+    validar(c)
+    canonico = json.dumps(c.to_dict(), sort_keys=True).encode()
+    return dataclasses.replace(c, version=hashlib.sha1(canonico).hexdigest()[:8])
+
+
+class GestorConfig:
+    """
+    Config vigente de un proceso. Con 'ruta', un hilo revisa el archivo cada 'periodo' s y publica la
+    nueva versión; sin ruta (replays, pruebas) la config es fija.
+    """
+
+    def __init__(self, ruta=None, periodo=0.5, datos=None):
+        self.ruta = ruta
+        self.periodo = periodo
+        self._actual = desde_dict(datos or {})
+        self._firma = None  # (mtime, tamaño) del archivo ya leído
+        self._candidata = None  # Firma vista en la revisión anterior (el archivo puede estar a medio escribir)
+        if ruta:
+            self.recargar()
+            threading.Thread(target=self._vigilar, daemon=True, name="config").start()
+
+    def actual(self):
+        """Foto inmutable de la config vigente (leer una vez por frame / decisión)"""
+        return self._actual
+
+    def recargar(self, estable=False):
+        """
+        Relee el archivo si cambió. Devuelve True si se aplicó una versión nueva.
+        Con estable=True solo lo lee si no cambió desde la revisión anterior (evita leer un guardado a medias).
+        """
+        try:
+            st = os.stat(self.ruta)
+        except FileNotFoundError:
+            return False
+        firma = (st.st_mtime_ns, st.st_size)
+        if firma == self._firma:
+            return False
+        if estable and firma != self._candidata:
+            self._candidata = firma
+            return False
+        self._firma = firma
+        try:
+            with open(self.ruta, encoding="utf-8") as f:
+                nueva = desde_dict(json.load(f), origen=self.ruta)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ [CONFIG] {self.ruta} rechazada, sigue la versión {self._actual.version}: {e}")
+            return False
+        if nueva.version == self._actual.version:
+            return False
+        anterior, self._actual = self._actual, nueva
+        cambios = [f"{s}.{k}={v}" for s in SECCIONES for k, v in nueva.to_dict()[s].items()
+                   if anterior.to_dict()[s][k] != v]
+        print(f"🔧 [CONFIG] Versión {anterior.version} -> {nueva.version} ({', '.join(cambios)})")
+        return True
+
+    def _vigilar(self):
+        while True:
+            time.sleep(self.periodo)
+            self.recargar(estable=True)
+
+
+_gestor = None
+_lock = threading.Lock()
+
+
+def gestor():
+    """Gestor compartido por todo el proceso (se crea al primer uso)"""
+    global _gestor
+    with _lock:
+        if _gestor is None:
+            _gestor = GestorConfig(RUTA_CONFIG)
+        return _gestor
+
+
+def actual():
+    return gestor().actual()
+
+
+if __name__ == "__main__":
+    import sys
+
+    c = GestorConfig(RUTA_CONFIG).actual()
+    texto = json.dumps(c.to_dict(), indent=2, ensure_ascii=False)
+    if "--escribir" in sys.argv:
+        if os.path.exists(RUTA_CONFIG):
+            sys.exit(f"❌ {RUTA_CONFIG} ya existe")
+        with open(RUTA_CONFIG, "w", encoding="utf-8") as f:
+            f.write(texto + "\n")
+        print(f"💾 Config escrita en {RUTA_CONFIG} (versión {c.version})")
+    else:
+        print(f"# {c.origen} | versión {c.version}")
+        print(texto)
@@ -1,11 +1,18 @@
 import os
-from supabase import create_client, Client
 from dotenv import load_dotenv
 
+from core.db_writer import DatabaseWriter
+from core.local_db import LocalClient, RUTA_LOCAL
+
 # Cargar variables desde .env (pip install python-dotenv)
 load_dotenv()
 
 class DatabaseManager:
+    """
+    SERPIENTE_BD=supabase (por defecto): todo va directo a Supabase.
+    SERPIENTE_BD=local: SQLite local (core/local_db.py) con replicación por lotes a Supabase si hay
+    credenciales; sin ellas, la BD local es la única.
+    """
     _instance = None
 
     def __new__(cls):
@@ -14,13 +21,31 @@ class DatabaseManager:
             cls._instance = super(DatabaseManager, cls).__new__(cls)
             url = os.getenv("SUPABASE_URL")
             key = os.getenv("SUPABASE_KEY")
+            # Import perezoso: el cliente Supabase pesa en el arranque y en modo local sin credenciales sobra
+            if os.getenv("SERPIENTE_BD", "supabase").lower() == "local":
+                upstream = None
+                if url and key:
+                    from supabase import create_client
+                    upstream = create_client(url, key)
+                cls._instance.client = LocalClient(RUTA_LOCAL, upstream=upstream)
+                destino = "replicando a Supabase" if upstream else "sin replicación"
+                print(f"✅ Base de Datos local: {RUTA_LOCAL} ({destino})")
+                return cls._instance
             if not url or not key:
                 raise ValueError("❌ Faltan credenciales de Supabase en .env")
-            cls._instance.client: Client = create_client(url, key)
+            from supabase import create_client
+            cls._instance.client = create_client(url, key)
             print("✅ Conexión a Base de Datos: EXITOSA")
         return cls._instance
 
     def get_client(self):
         return self.client
 
-# Uso rápido: db = DatabaseManager().get_client()
\ No newline at end of file
+    def get_writer(self, nombre="DB"):
+        """Escritor write-behind compartido por todo el proceso (ver core/db_writer.py)"""
+        if getattr(self, "writer", None) is None:
+            self.writer = DatabaseWriter(self.client, nombre=nombre)
+        return self.writer
+
+
+# Uso rápido: db = DatabaseManager().get_client() | writer = DatabaseManager().get_writer("AGENTE")
\ No newline at end of file
@@ -0,0 +1,212 @@
+"""Escritor write-behind para Supabase: cola acotada, lotes, coalescencia, reintentos y journal en disco."""
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+
+from core.tracing import Histograma
+
+JOURNAL_DIR = os.getenv("SERPIENTE_JOURNAL_DIR", ".serpiente_journal")
+
+
+class DatabaseWriter:
+    """
+    Escrituras fuera del lazo de control:
+    - insert(): filas a una cola acotada (si se llena se descarta la más vieja) y se envían en bloque.
+    - update(): se coalesce por (tabla, clave); solo viaja el último valor de cada campo.
+    - Reintentos con backoff exponencial + jitter; si la BD no responde, el lote va a un journal
+      local (JSON lines) que se reenvía cuando la conexión vuelve.
+    """
+
+    def __init__(self, client, nombre="DB", maxsize=2000, lote=200, intervalo=0.25,
+                 max_reintentos=3, backoff_base=0.2, backoff_max=5.0, journal_path=None):
+        self.client = client
+        self.nombre = nombre
+        self.maxsize = maxsize
+        self.lote = lote
+        self.intervalo = intervalo
+        self.max_reintentos = max_reintentos
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.journal_path = journal_path or os.path.join(JOURNAL_DIR, f"{nombre.lower()}.jsonl")
+
+        self._inserts = deque()
+        self._updates = {}  # (tabla, campo, valor) -> {columna: valor}
+        self._cond = threading.Condition()
+        self._en_vuelo = 0
+        self._caida_hasta = 0.0  # Mientras la BD está caída, los lotes van directo al journal
+
+        # Métricas
+        self.filas_escritas = 0
+        self.updates_escritos = 0
+        self.descartadas = 0
+        self.reintentos = 0
+        self.en_journal = 0
+        self.latencia_flush = 0.0
+        self.latencia_flush_max = 0.0
+        self.histograma = Histograma()  # Latencia de cada lote contra la BD (la adopta el trazador del agente)
+
+        if os.path.exists(self.journal_path):
+            # Journal pendiente de una ejecución anterior
+            with open(self.journal_path, encoding="utf-8") as f:
+                self.en_journal = sum(1 for linea in f if linea.strip())
+
+        self._thread = threading.Thread(target=self._flusher, daemon=True, name=f"writer-{nombre}")
+        self._thread.start()
+
+    # --- API PÚBLICA (nunca bloquea) ---
+
+    def insert(self, tabla, fila):
+        """Encola una fila. Devuelve False si hubo que descartar una fila vieja por falta de espacio."""
+        with self._cond:
+            descartada = len(self._inserts) >= self.maxsize
+            if descartada:
+                self._inserts.popleft()
+                self.descartadas += 1
+            self._inserts.append((tabla, fila))
+            if len(self._inserts) >= self.lote:
+                self._cond.notify()
+        return not descartada
+
+    def update(self, tabla, valores, clave=("id", 1)):
+        """Update coalescido: updates sucesivos a la misma fila se fusionan y viaja solo el último"""
+        with self._cond:
+            pendiente = self._updates.setdefault((tabla,) + tuple(clave), {})
+            pendiente.update(valores)
+
+    def flush(self, timeout=5.0):
+        """Espera a que se vacíe la cola (útil al apagar). Devuelve True si quedó vacía."""
+        with self._cond:
+            self._cond.notify()
+            return self._cond.wait_for(
+                lambda: not self._inserts and not self._updates and not self._en_vuelo, timeout=timeout)
+
+    def metricas(self):
+        with self._cond:
+            return {
+                "cola": len(self._inserts),
+                "updates_pendientes": len(self._updates),
+                "filas_escritas": self.filas_escritas,
+                "updates_escritos": self.updates_escritos,
+                "descartadas": self.descartadas,
+                "reintentos": self.reintentos,
+                "en_journal": self.en_journal,
+                "flush_ms": round(self.latencia_flush * 1000, 1),
+                "flush_max_ms": round(self.latencia_flush_max * 1000, 1),
+                "bd_caida": time.monotonic() < self._caida_hasta,
+            }
+
+    def resumen(self):
+        m = self.metricas()
+        return (f"BD cola {m['cola']} | flush {m['flush_ms']}ms | descartes {m['descartadas']} | "
+                f"journal {m['en_journal']}")
+
+    # --- HILO DE VACIADO ---
+
+    def _flusher(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: len(self._inserts) >= self.lote, timeout=self.intervalo)
+                inserts = [self._inserts.popleft() for _ in range(min(self.lote, len(self._inserts)))]
+                updates, self._updates = self._updates, {}
+                self._en_vuelo = len(inserts) + len(updates)
+
+            # Con la BD de vuelta, primero se reenvía lo acumulado en el journal (orden cronológico)
+            if time.monotonic() >= self._caida_hasta and self.en_journal:
+                self._reenviar_journal()
+
+            if inserts or updates:
+                t0 = time.monotonic()
+                self._escribir(self._operaciones(inserts, updates))
+                dt = time.monotonic() - t0
+                self.latencia_flush = dt
+                self.latencia_flush_max = max(self.latencia_flush_max, dt)
+                self.histograma.registrar(dt)
+
+            with self._cond:
+                self._en_vuelo = 0
+                self._cond.notify_all()
+
+    @staticmethod
+    def _operaciones(inserts, updates):
+        """Agrupa inserts por tabla (en orden de llegada) y convierte updates en operaciones"""
+        por_tabla = {}
+        for tabla, fila in inserts:
+            por_tabla.setdefault(tabla, []).append(fila)
+        ops = [{"op": "insert", "tabla": t, "filas": filas} for t, filas in por_tabla.items()]
+        ops += [{"op": "update", "tabla": t, "campo": c, "valor": v, "valores": vals}
+                for (t, c, v), vals in updates.items()]
+        return ops
+
+    def _ejecutar(self, op):
+        tabla = self.client.table(op["tabla"])
+        if op["op"] == "insert":
+            tabla.insert(op["filas"]).execute()
+            self.filas_escritas += len(op["filas"])
+        else:
+            tabla.update(op["valores"]).eq(op["campo"], op["valor"]).execute()
+            self.updates_escritos += 1
+
+    def _escribir(self, ops):
+        pendientes = list(ops)
+        if time.monotonic() < self._caida_hasta:
+            self._al_journal(pendientes)
+            return
+
+        for intento in range(self.max_reintentos + 1):
+            fallidas = []
+            for op in pendientes:
+                try:
+                    self._ejecutar(op)
+                except Exception as e:
+                    fallidas.append(op)
+                    error = e
+            if not fallidas:
+                return
+            pendientes = fallidas
+            if intento < self.max_reintentos:
+                self.reintentos += 1
+                # Backoff exponencial con jitter completo
+                time.sleep(random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** intento)))
+
+        print(f"⚠️ [{self.nombre}] BD inalcanzable ({error}). {len(pendientes)} operaciones al journal.")
+        self._caida_hasta = time.monotonic() + self.backoff_max
+        self._al_journal(pendientes)
+
+    def _al_journal(self, ops):
+        try:
+            os.makedirs(os.path.dirname(self.journal_path) or ".", exist_ok=True)
+            with open(self.journal_path, "a", encoding="utf-8") as f:
+                for op in ops:
+                    f.write(json.dumps(op, default=str) + "\n")
+            self.en_journal += len(ops)
+        except OSError as e:
+            self.descartadas += sum(len(op.get("filas", [None])) for op in ops)
+            print(f"❌ [{self.nombre}] No se pudo escribir el journal: {e}")
+
+    def _reenviar_journal(self):
+        try:
+            with open(self.journal_path, encoding="utf-8") as f:
+                ops = [json.loads(linea) for linea in f if linea.strip()]
+        except FileNotFoundError:
+            self.en_journal = 0
+            return
+
+        for i, op in enumerate(ops):
+            try:
+                self._ejecutar(op)
+            except Exception:
+                # Sigue caída: se conserva el resto del journal para el próximo intento
+                self._caida_hasta = time.monotonic() + self.backoff_max
+                restantes = ops[i:]
+                with open(self.journal_path, "w", encoding="utf-8") as f:
+                    for r in restantes:
+                        f.write(json.dumps(r, default=str) + "\n")
+                self.en_journal = len(restantes)
+                return
+
+        os.remove(self.journal_path)
+        self.en_journal = 0
+        print(f"✅ [{self.nombre}] Journal reenviado a la BD ({len(ops)} operaciones).")
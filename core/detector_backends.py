@@ -0,0 +1,316 @@
+"""
+Backends de inferencia intercambiables para el detector (PyTorch/Ultralytics, ONNX Runtime, OpenVINO).
+Dependencias opcionales: onnx + onnxruntime (y onnxconverter-common para FP16), openvino.
+Todos devuelven detecciones como tuplas (cls, x1, y1, x2, y2, conf) en píxeles del frame original.
+"""
+import importlib.util
+import os
+import threading
+
+import cv2
+import numpy as np
+
+# Solo pedimos personas (0) y celulares (67)
+CLASES = (0, 67)
+MODELOS_DIR = os.getenv("SERPIENTE_MODELOS_DIR", "modelos")
+
+
+# --- PRE/POST-PROCESO COMPARTIDO (ONNX / OpenVINO) ---
+
+def letterbox(frame, tam=640):
+    """Redimensiona manteniendo aspecto y rellena a tam x tam. Devuelve (blob NCHW float32, escala, (pad_x, pad_y))."""
+    h, w = frame.shape[:2]
+    escala = min(tam / w, tam / h)
+    nw, nh = int(round(w * escala)), int(round(h * escala))
+    pad_x, pad_y = (tam - nw) // 2, (tam - nh) // 2
+    lienzo = np.full((tam, tam, 3), 114, dtype=np.uint8)
+    lienzo[pad_y:pad_y + nh, pad_x:pad_x + nw] = cv2.resize(frame, (nw, nh), interpolation=cv2.INTER_LINEAR)
+    blob = cv2.dnn.blobFromImage(lienzo, 1 / 255.0, swapRB=True)
+    return blob, escala, (pad_x, pad_y)
+
+
+def postprocesar_yolov8(pred, escala, pad, conf=0.25, iou=0.45, clases=CLASES):
+    """
+    Salida cruda YOLOv8 (4 + 80, N) -> detecciones. Especializado al subconjunto de clases:
+    solo se leen las filas de score de 'clases' (no argmax sobre 80) y la NMS corre sobre lo que sobrevive.
+    """
+    clases = np.asarray(clases)
+    scores = pred[4 + clases]  # (C, N)
+    mejor = scores.argmax(axis=0)
+    confianza = scores[mejor, np.arange(scores.shape[1])]
+    keep = confianza >= conf
+    if not keep.any():
+        return []
+
+    cx, cy, w, h = pred[:4, keep]
+    confianza = confianza[keep]
+    cls = clases[mejor[keep]]
+    x1 = (cx - w / 2 - pad[0]) / escala
+    y1 = (cy - h / 2 - pad[1]) / escala
+    ancho, alto = w / escala, h / escala
+
+    # NMS por clase en una sola llamada: desplazamos cada clase a una región distinta del plano
+    offset = cls.astype(np.float32) * 4096.0
+    cajas = np.stack([x1 + offset, y1, ancho, alto], axis=1)
+    idx = cv2.dnn.NMSBoxes(cajas.tolist(), confianza.tolist(), conf, iou)
+    detecciones = []
+    for i in np.asarray(idx).reshape(-1):
+        detecciones.append((int(cls[i]), int(x1[i]), int(y1[i]), int(x1[i] + ancho[i]), int(y1[i] + alto[i]),
+                            float(confianza[i])))
+    return detecciones
+
+
+# --- BACKENDS ---
+
+class UltralyticsBackend:
+    """Camino original: PyTorch vía Ultralytics"""
+    nombre = "torch"
+
+    def __init__(self, modelo="yolov8n.pt", conf=0.25, imgsz=640, hilos=None):
+        import torch
+        from ultralytics import YOLO
+        if hilos:
+            torch.set_num_threads(hilos)
+        self.model = YOLO(modelo)
+        self.conf = conf
+        self.imgsz = imgsz
+
+    def detectar(self, frame):
+        return self.detectar_lote([frame])[0]
+
+    def detectar_lote(self, frames):
+        """Un solo forward para varias imágenes (p. ej. una por cámara)"""
+        results = self.model(list(frames), verbose=False, classes=list(CLASES), conf=self.conf, imgsz=self.imgsz)
+        lote = []
+        for r in results:
+            detecciones = []
+            for box in r.boxes:
+                x1, y1, x2, y2 = map(int, box.xyxy[0])
+                detecciones.append((int(box.cls[0]), x1, y1, x2, y2, float(box.conf[0])))
+            lote.append(detecciones)
+        return lote
+
+
+class _BackendExportado:
+    """Base ONNX/OpenVINO: letterbox + forward por lotes del tamaño exportado + post-proceso compartido"""
+    lote = 1
+
+    def _inferir(self, blob):
+        raise NotImplementedError
+
+    def detectar(self, frame):
+        return self.detectar_lote([frame])[0]
+
+    def detectar_lote(self, frames):
+        preparados = [letterbox(f, self.imgsz) for f in frames]
+        salida = []
+        for i in range(0, len(preparados), self.lote):
+            grupo = preparados[i:i + self.lote]
+            blob = np.concatenate([b for b, _, _ in grupo])
+            if len(grupo) < self.lote:
+                # Forma estática: se rellena con imágenes vacías y se ignoran sus salidas
+                relleno = np.zeros((self.lote - len(grupo),) + blob.shape[1:], dtype=blob.dtype)
+                blob = np.concatenate([blob, relleno])
+            preds = self._inferir(blob)
+            for pred, (_, escala, pad) in zip(preds, grupo):
+                salida.append(postprocesar_yolov8(pred, escala, pad, self.conf, self.iou))
+        return salida
+
+
+class OnnxBackend(_BackendExportado):
+    """ONNX Runtime en CPU, forma estática, con hilos intra-op ajustables"""
+    nombre = "onnx"
+
+    def __init__(self, ruta, conf=0.25, iou=0.45, imgsz=640, hilos=None):
+        import onnxruntime as ort
+        so = ort.SessionOptions()
+        so.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        so.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        so.intra_op_num_threads = hilos or os.cpu_count()
+        so.inter_op_num_threads = 1
+        self.sess = ort.InferenceSession(ruta, so, providers=["CPUExecutionProvider"])
+        entrada = self.sess.get_inputs()[0]
+        self.entrada = entrada.name
+        self.fp16 = entrada.type == "tensor(float16)"
+        self.lote = entrada.shape[0] if isinstance(entrada.shape[0], int) else 1
+        self.conf, self.iou, self.imgsz = conf, iou, imgsz
+
+    def _inferir(self, blob):
+        if self.fp16:
+            blob = blob.astype(np.float16)
+        return self.sess.run(None, {self.entrada: blob})[0].astype(np.float32)
+
+
+class OpenVinoBackend(_BackendExportado):
+    """OpenVINO en CPU con hint de latencia"""
+    nombre = "openvino"
+
+    def __init__(self, ruta, conf=0.25, iou=0.45, imgsz=640, hilos=None):
+        import openvino as ov
+        core = ov.Core()
+        config = {"PERFORMANCE_HINT": "LATENCY"}
+        if hilos:
+            config["INFERENCE_NUM_THREADS"] = hilos
+        xml = ruta if ruta.endswith(".xml") else os.path.join(ruta, next(
+            f for f in os.listdir(ruta) if f.endswith(".xml")))
+        self.compilado = core.compile_model(core.read_model(xml), "CPU", config)
+        self.salida = self.compilado.output(0)
+        self.lote = self.compilado.input(0).get_partial_shape()[0].get_length()
+        self.conf, self.iou, self.imgsz = conf, iou, imgsz
+
+    def _inferir(self, blob):
+        return self.compilado([blob])[self.salida]
+
+
+# --- EXPORTACIÓN / CUANTIZACIÓN (con caché en disco) ---
+
+def ruta_exportada(modelo, formato, precision, imgsz=640, lote=1):
+    base = os.path.splitext(os.path.basename(modelo))[0]
+    if lote > 1:
+        base += f"_b{lote}"
+    if formato == "onnx":
+        return os.path.join(MODELOS_DIR, f"{base}_{imgsz}_{precision}.onnx")
+    return os.path.join(MODELOS_DIR, f"{base}_{imgsz}_{precision}_openvino_model")
+
+
+def frames_calibracion(clip, n=64, imgsz=640):
+    """Frames letterboxed de un clip grabado para calibrar la cuantización INT8"""
+    cap = cv2.VideoCapture(clip)
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or n
+    paso = max(1, total // n)
+    blobs = []
+    for i in range(0, total, paso):
+        cap.set(cv2.CAP_PROP_POS_FRAMES, i)
+        ok, frame = cap.read()
+        if not ok:
+            break
+        blobs.append(letterbox(frame, imgsz)[0])
+        if len(blobs) >= n:
+            break
+    cap.release()
+    return blobs
+
+
+def exportar(modelo="yolov8n.pt", formato="onnx", precision="fp32", imgsz=640, clip_calibracion=None, lote=1):
+    """Exporta (una sola vez) el modelo a ONNX/OpenVINO con forma estática (lote x 3 x imgsz x imgsz)"""
+    destino = ruta_exportada(modelo, formato, precision, imgsz, lote)
+    if os.path.exists(destino):
+        return destino
+    os.makedirs(MODELOS_DIR, exist_ok=True)
+    from ultralytics import YOLO
+
+    if formato == "openvino":
+        # OpenVINO: FP16 nativo; INT8 con NNCF (calibra sobre el dataset de ultralytics)
+        ruta = YOLO(modelo).export(format="openvino", imgsz=imgsz, dynamic=False, batch=lote,
+                                   half=precision == "fp16", int8=precision == "int8")
+        os.replace(ruta, destino)
+        return destino
+
+    fp32 = ruta_exportada(modelo, "onnx", "fp32", imgsz, lote)
+    if not os.path.exists(fp32):
+        ruta = YOLO(modelo).export(format="onnx", imgsz=imgsz, dynamic=False, simplify=True, opset=17, batch=lote)
+        os.replace(ruta, fp32)
+    if precision == "fp32":
+        return fp32
+
+    if precision == "fp16":
+        import onnx
+        from onnxconverter_common import float16
+        onnx.save(float16.convert_float_to_float16(onnx.load(fp32)), destino)
+        return destino
+
+    # INT8: estática (QDQ, por canal) si hay clip de calibración; si no, dinámica solo de pesos
+    from onnxruntime import quantization as q
+    if clip_calibracion:
+        blobs = frames_calibracion(clip_calibracion, imgsz=imgsz)
+        blobs = [np.concatenate(blobs[i:i + lote]) for i in range(0, len(blobs) - lote + 1, lote)]
+
+        class Lector(q.CalibrationDataReader):
+            def __init__(self):
+                import onnxruntime as ort
+                self.nombre = ort.InferenceSession(fp32, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+                self.it = iter(blobs)
+
+            def get_next(self):
+                blob = next(self.it, None)
+                return None if blob is None else {self.nombre: blob}
+
+        q.quantize_static(fp32, destino, Lector(), quant_format=q.QuantFormat.QDQ, per_channel=True,
+                          activation_type=q.QuantType.QUInt8, weight_type=q.QuantType.QInt8)
+    else:
+        q.quantize_dynamic(fp32, destino, weight_type=q.QuantType.QUInt8)
+    return destino
+
+
+def crear_backend(nombre=None, precision=None, modelo=None, hilos=None, imgsz=640, clip_calibracion=None, lote=1):
+    """
+    Fábrica de backends. Por defecto se configura con variables de entorno:
+    SERPIENTE_BACKEND (auto|torch|onnx|openvino), SERPIENTE_PRECISION (fp32|fp16|int8), SERPIENTE_HILOS.
+    'lote' fija el tamaño de lote estático de los modelos exportados (p. ej. el número de cámaras).
+    auto: el ONNX ya exportado en disco si existe (carga en una fracción del tiempo de PyTorch, sin importar
+    torch); si no, PyTorch, marcado para generar esa caché en segundo plano (ver exportar_en_fondo).
+    Si la dependencia opcional no está instalada, se vuelve al camino PyTorch.
+    """
+    nombre = nombre or os.getenv("SERPIENTE_BACKEND", "auto")
+    precision = precision or os.getenv("SERPIENTE_PRECISION", "fp32")
+    modelo = modelo or os.getenv("SERPIENTE_MODELO", "yolov8n.pt")
+    hilos = hilos or (int(os.getenv("SERPIENTE_HILOS")) if os.getenv("SERPIENTE_HILOS") else None)
+
+    if nombre == "auto":
+        ruta = ruta_exportada(modelo, "onnx", precision, imgsz, lote)
+        if os.path.exists(ruta):
+            try:
+                return OnnxBackend(ruta, imgsz=imgsz, hilos=hilos)
+            except ImportError as e:
+                print(f"⚠️ [DETECTOR] Caché ONNX {ruta} sin onnxruntime ({e}). Usando PyTorch.")
+        backend = UltralyticsBackend(modelo, imgsz=imgsz, hilos=hilos)
+        backend.cache_pendiente = (modelo, precision, imgsz, lote)
+        return backend
+
+    try:
+        if nombre == "onnx":
+            ruta = exportar(modelo, "onnx", precision, imgsz, clip_calibracion, lote)
+            return OnnxBackend(ruta, imgsz=imgsz, hilos=hilos)
+        if nombre == "openvino":
+            ruta = exportar(modelo, "openvino", precision, imgsz, clip_calibracion, lote)
+            return OpenVinoBackend(ruta, imgsz=imgsz, hilos=hilos)
+    except ImportError as e:
+        print(f"⚠️ [DETECTOR] Backend {nombre} no disponible ({e}). Usando PyTorch.")
+    return UltralyticsBackend(modelo, imgsz=imgsz, hilos=hilos)
+
+
+# --- ARRANQUE EN FRÍO ---
+
+def calentar(backend, lote=1, n=2, forma=(480, 640, 3)):
+    """
+    Inferencias en vacío antes de declararse listo: la primera paga la inicialización perezosa
+    (fusión de capas, reserva de memoria, selección de kernels) que si no caería sobre el primer frame real.
+    """
+    frames = [np.zeros(forma, dtype=np.uint8)] * lote
+    for _ in range(n):
+        backend.detectar_lote(frames)
+
+
+def exportar_en_fondo(backend):
+    """
+    Si el backend 'auto' arrancó en PyTorch por falta de caché, exporta el ONNX en un hilo (una sola vez)
+    para que el próximo arranque, p. ej. tras una caída, no pague la carga de torch.
+    """
+    pendiente = getattr(backend, "cache_pendiente", None)
+    if not pendiente:
+        return None
+    if not (importlib.util.find_spec("onnx") and importlib.util.find_spec("onnxruntime")):
+        print("ℹ️ [DETECTOR] Sin onnx/onnxruntime: no se genera la caché de arranque rápido.")
+        return None
+    modelo, precision, imgsz, lote = pendiente
+
+    def trabajo():
+        try:
+            ruta = exportar(modelo, "onnx", precision, imgsz, lote=lote)
+            print(f"💾 [DETECTOR] Caché de arranque rápido lista: {ruta}")
+        except Exception as e:
+            print(f"⚠️ [DETECTOR] No se pudo exportar la caché ONNX: {e}")
+
+    t = threading.Thread(target=trabajo, daemon=True, name="exportar-cache")
+    t.start()
+    return t
@@ -0,0 +1,182 @@
+"""
+Anillo de frames crudos en memoria compartida (multiprocessing.shared_memory) con seqlock por slot.
+El detector escribe cada frame capturado y avisa por ZMQ (slot + secuencia); los consumidores locales
+(grabación, otro modelo, analítica) leen los píxeles sin decodificar JPEG y sin copias.
+"""
+import struct
+import sys
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+import zmq
+
+from core.bus import PUERTO_FRAMES, crear_suscriptor, recibir_json
+
+MAGIA = b"SRPRING1"
+# Cabecera global: magia, n_slots, alto, ancho, canales
+CABECERA = struct.Struct("<8sIIII")
+# Cabecera de slot: contador seqlock (impar = escritura en curso), secuencia del frame, timestamp de captura
+CABECERA_SLOT = struct.Struct("<QQd")
+
+
+def nombre_anillo(camara):
+    return f"serpiente_{camara}"
+
+
+class FrameRing:
+    """
+    N slots de tamaño fijo. Un solo escritor; cualquier número de lectores en otros procesos.
+    Un lector valida con el contador del slot que el frame no fue pisado mientras lo usaba.
+    """
+
+    def __init__(self, shm, creador):
+        self.shm = shm
+        self.creador = creador
+        magia, self.n_slots, alto, ancho, canales = CABECERA.unpack_from(shm.buf, 0)
+        if magia != MAGIA:
+            raise ValueError(f"{shm.name} no es un anillo de frames")
+        self.forma = (alto, ancho, canales)
+        self.tam_frame = alto * ancho * canales
+        self.tam_slot = CABECERA_SLOT.size + self.tam_frame
+        self.escrituras = 0
+        self.desvinculado = False
+
+    @classmethod
+    def crear(cls, nombre, forma=(480, 640, 3), n_slots=8):
+        alto, ancho, canales = forma
+        tam = CABECERA.size + n_slots * (CABECERA_SLOT.size + alto * ancho * canales)
+        try:
+            shm = shared_memory.SharedMemory(name=nombre, create=True, size=tam)
+        except FileExistsError:
+            # Resto de una ejecución anterior que no cerró limpio
+            viejo = shared_memory.SharedMemory(name=nombre)
+            viejo.close()
+            viejo.unlink()
+            shm = shared_memory.SharedMemory(name=nombre, create=True, size=tam)
+        CABECERA.pack_into(shm.buf, 0, MAGIA, n_slots, alto, ancho, canales)
+        for i in range(n_slots):
+            CABECERA_SLOT.pack_into(shm.buf, CABECERA.size + i * (CABECERA_SLOT.size + alto * ancho * canales),
+                                    0, 0, 0.0)
+        return cls(shm, creador=True)
+
+    @classmethod
+    def abrir(cls, nombre):
+        shm = shared_memory.SharedMemory(name=nombre)
+        if sys.version_info < (3, 13):
+            # El resource_tracker borraría el segmento al salir un lector (solo debe hacerlo el creador)
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, "shared_memory")
+        return cls(shm, creador=False)
+
+    def _offset(self, slot):
+        return CABECERA.size + slot * self.tam_slot
+
+    def _vista(self, slot):
+        inicio = self._offset(slot) + CABECERA_SLOT.size
+        # frombuffer deja exportado el buffer del segmento mientras viva la vista (o una rebanada suya):
+        # así shm.close() lanza BufferError en vez de desmapear memoria que alguien todavía lee
+        return np.frombuffer(self.shm.buf, dtype=np.uint8, count=self.tam_frame, offset=inicio).reshape(self.forma)
+
+    def _contador(self, slot):
+        return struct.unpack_from("<Q", self.shm.buf, self._offset(slot))[0]
+
+    # --- ESCRITOR ---
+
+    def escribir(self, frame, seq, ts):
+        """Copia el frame al siguiente slot. Devuelve el índice del slot."""
+        slot = self.escrituras % self.n_slots
+        off = self._offset(slot)
+        contador = self._contador(slot)
+        struct.pack_into("<Q", self.shm.buf, off, contador + 1)  # Impar: escritura en curso
+        self._vista(slot)[...] = frame
+        CABECERA_SLOT.pack_into(self.shm.buf, off, contador + 2, seq, ts)  # Par: listo
+        self.escrituras += 1
+        return slot
+
+    # --- LECTORES ---
+
+    def vista(self, slot):
+        """
+        Lectura sin copia: devuelve (frame, seq, ts, token) o None si el slot se está escribiendo.
+        El frame apunta a la memoria compartida: tras usarlo, confirmar con sigue_valido(slot, token).
+        """
+        token = self._contador(slot)
+        if token % 2:
+            return None
+        _, seq, ts = CABECERA_SLOT.unpack_from(self.shm.buf, self._offset(slot))
+        return self._vista(slot), seq, ts, token
+
+    def sigue_valido(self, slot, token):
+        return self._contador(slot) == token
+
+    def leer(self, slot, seq=None):
+        """Copia consistente del slot (o None si fue pisado o no es la secuencia esperada)"""
+        v = self.vista(slot)
+        if v is None:
+            return None
+        frame, seq_slot, ts, token = v
+        if seq is not None and seq_slot != seq:
+            return None
+        copia = frame.copy()
+        return (copia, seq_slot, ts) if self.sigue_valido(slot, token) else None
+
+    def cerrar(self):
+        """
+        El creador borra el nombre primero (vale aunque queden vistas vivas). Si todavía hay un frame de vista()
+        en uso, close() lanza BufferError: el mapeo sigue abierto en este anillo y el próximo cerrar() lo
+        reintenta. Devuelve True si el mapeo quedó cerrado.
+        """
+        if self.creador and not self.desvinculado:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+            self.desvinculado = True
+        try:
+            self.shm.close()
+            return True
+        except BufferError:
+            return False
+
+
+class LectorFrames:
+    """Consumidor local: escucha los avisos del detector y entrega frames crudos desde el anillo"""
+
+    def __init__(self, context=None, camaras=None, host="localhost"):
+        self.context = context or zmq.Context.instance()
+        self.socket = crear_suscriptor(self.context, PUERTO_FRAMES, host, camaras=camaras)
+        self.anillos = {}
+        self.perdidos = 0  # Avisos cuyo slot ya había sido pisado al leerlo
+
+    def _anillo(self, nombre):
+        if nombre not in self.anillos:
+            self.anillos[nombre] = FrameRing.abrir(nombre)
+        return self.anillos[nombre]
+
+    def siguiente(self, timeout=1.0, copiar=True):
+        """
+        Próximo frame: (camara, seq, ts, frame) o None si vence el timeout.
+        Con copiar=False el frame es una vista de la memoria compartida (válida por unos n_slots frames).
+        """
+        limite = time.monotonic() + timeout
+        while True:
+            restante = limite - time.monotonic()
+            if restante <= 0 or not self.socket.poll(int(restante * 1000)):
+                return None
+            camara, aviso = recibir_json(self.socket)
+            anillo = self._anillo(aviso["anillo"])
+            if copiar:
+                leido = anillo.leer(aviso["slot"], aviso["seq"])
+                if leido is not None:
+                    return camara, leido[1], leido[2], leido[0]
+            else:
+                v = anillo.vista(aviso["slot"])
+                if v is not None and v[1] == aviso["seq"]:
+                    return camara, v[1], v[2], v[0]
+            self.perdidos += 1
+
+    def cerrar(self):
+        for anillo in self.anillos.values():
+            anillo.cerrar()
+        self.socket.close()
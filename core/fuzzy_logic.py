@@ -1,3 +1,8 @@
+import numpy as np
+
+from core.kinematics import tiempo_a_linea, TTC_MAX
+
+
 def trapecio(x, a, b, c, d):
     """Función de pertenencia Trapezoidal"""
     return max(min((x - a) / (b - a), 1, (d - x) / (d - c)), 0)
@@ -8,49 +13,238 @@ def triangulo(x, a, b, c):
     return max(min((x - a) / (b - a), (c - x) / (c - b)), 0)
 
 
-def inferencia_mamdani_riesgo(distancia_px, tiene_celular):
+# --- MOTOR DIFUSO DECLARATIVO (VECTORIZADO) ---
+
+class MotorDifuso:
     """
-    Calcula el % de Riesgo (0-100) usando lógica difusa avanzada.
-    Input:
-        - Distancia: Pixeles hacia la línea (Negativo = Cruzó).
-        - Celular: Booleano.
+    Motor de inferencia difusa con base de reglas declarativa.
+    Las funciones de pertenencia y las reglas se compilan una sola vez a arreglos NumPy,
+    y un lote completo de entradas se evalúa en una sola llamada vectorizada.
+
+    variables: {"entrada": {"conjunto": (a, b, c, d) trapecio | (a, b, c) triángulo}}
+    reglas: [({"entrada": "conjunto", ...}, riesgo_salida), ...]  (entradas omitidas = "no importa")
+    Defuzzificación: promedio ponderado de los consecuentes (singletons).
     """
-    # 1. FUZZIFICACIÓN (Entradas)
 
-    # Conjuntos de Distancia
-    # Peligro: x < 0 (Cruzó) hasta 50px
-    mu_peligro = trapecio(distancia_px, -999, -100, 0, 50)
-    # Advertencia: Entre 20px y 150px
-    mu_advertencia = triangulo(distancia_px, 20, 100, 200)
-    # Seguro: Más de 150px
-    mu_seguro = trapecio(distancia_px, 150, 250, 999, 9999)
+    def __init__(self, variables, reglas):
+        self.entradas = list(variables)
+
+        # 1. Compilar conjuntos: una fila (a, b, c, d) por conjunto
+        indice = {}
+        params, var_de_conjunto = [], []
+        for vi, var in enumerate(self.entradas):
+            for nombre, p in variables[var].items():
+                if len(p) == 3:  # Triángulo = trapecio con meseta de ancho cero
+                    p = (p[0], p[1], p[1], p[2])
+                indice[(var, nombre)] = len(params)
+                params.append(p)
+                var_de_conjunto.append(vi)
+        self._params = np.array(params, dtype=float)
+        self._var_de_conjunto = np.array(var_de_conjunto, dtype=np.intp)
+
+        a, b, c, d = self._params.T
+        self._sube = b > a
+        self._baja = d > c
+        self._ancho_sube = np.where(self._sube, b - a, 1.0)
+        self._ancho_baja = np.where(self._baja, d - c, 1.0)
+
+        # 2. Compilar reglas: matriz (R, V) de índices de conjunto.
+        # La columna extra (índice = nº de conjuntos) vale siempre 1 y representa "no importa".
+        neutro = len(params)
+        self._antecedentes = np.full((len(reglas), len(self.entradas)), neutro, dtype=np.intp)
+        self._consecuentes = np.empty(len(reglas), dtype=float)
+        for ri, (antecedente, salida) in enumerate(reglas):
+            for var, nombre in antecedente.items():
+                self._antecedentes[ri, self.entradas.index(var)] = indice[(var, nombre)]
+            self._consecuentes[ri] = salida
+
+        # Modo tabla (opcional): ver tabular()
+        self._tabla = None
+        self._ejes = None
+
+    def pertenencias(self, X):
+        """Grados de pertenencia (N, conjuntos + 1) para entradas X de forma (N, V)"""
+        x = X[:, self._var_de_conjunto]
+        a, b, c, d = self._params.T
+        sube = np.where(self._sube, (x - a) / self._ancho_sube, 1.0)
+        baja = np.where(self._baja, (d - x) / self._ancho_baja, 1.0)
+        mu = np.clip(np.minimum(sube, baja), 0.0, 1.0)
+        return np.concatenate([mu, np.ones((len(X), 1))], axis=1)
+
+    def _inferir(self, X):
+        mu = self.pertenencias(X)
+        # Fuerza de cada regla: AND = mínimo sobre sus antecedentes
+        fuerza = mu[:, self._antecedentes].min(axis=2)
+        numerador = fuerza @ self._consecuentes
+        denominador = fuerza.sum(axis=1)
+        return np.divide(numerador, denominador, out=np.zeros_like(numerador), where=denominador > 0)
+
+    def _matriz(self, entradas):
+        if len(entradas) != len(self.entradas):
+            raise ValueError(f"Se esperaban {len(self.entradas)} entradas: {self.entradas}")
+        columnas = np.broadcast_arrays(*[np.asarray(e, dtype=float) for e in entradas])
+        return np.column_stack([col.ravel() for col in columnas])
+
+    def evaluar_lote(self, *entradas):
+        """Evalúa N casos a la vez. Cada entrada es un escalar o un arreglo (se hace broadcasting)."""
+        X = self._matriz(entradas)
+        if self._tabla is not None:
+            return self._interpolar(X)
+        return self._inferir(X)
 
-    # Conjuntos de Distracción
-    mu_distraccion = 1.0 if tiene_celular else 0.0
-    mu_atento = 1.0 - mu_distraccion
+    def evaluar(self, *entradas):
+        return float(self.evaluar_lote(*entradas)[0])
 
-    # 2. EVALUACIÓN DE REGLAS (Inferencia)
+    # --- MODO TABLA PRECALCULADA ---
 
-    # R1: SI (Peligro) Y (Distracción) -> RIESGO CRITICO (100)
-    activacion_r1 = min(mu_peligro, mu_distraccion)
+    def tabular(self, rangos, puntos):
+        """
+        Precalcula el motor sobre una grilla regular y desde entonces evalúa por interpolación
+        multilineal. rangos: [(min, max)] por entrada; puntos: nº de nodos por entrada.
+        Fuera de rango la entrada se satura al borde de la grilla. En los saltos de la base de
+        reglas (p. ej. vel = 60 px/s, donde ningún conjunto de velocidad se activa) la tabla
+        suaviza la discontinuidad dentro de una celda.
+        """
+        self._ejes = [np.linspace(lo, hi, n) for (lo, hi), n in zip(rangos, puntos)]
+        malla = np.meshgrid(*self._ejes, indexing="ij")
+        X = np.column_stack([m.ravel() for m in malla])
+        self._tabla = self._inferir(X).reshape([len(e) for e in self._ejes])
+        return self
 
-    # R2: SI (Peligro) Y (Atento) -> RIESGO ALTO (80)
-    activacion_r2 = min(mu_peligro, mu_atento)
+    def sin_tabla(self):
+        self._tabla = None
+        self._ejes = None
+        return self
 
-    # R3: SI (Advertencia) Y (Distracción) -> RIESGO MEDIO (60)
-    activacion_r3 = min(mu_advertencia, mu_distraccion)
+    def _interpolar(self, X):
+        indices, fracciones = [], []
+        for vi, eje in enumerate(self._ejes):
+            n = len(eje)
+            paso = (eje[-1] - eje[0]) / (n - 1)
+            pos = np.clip((X[:, vi] - eje[0]) / paso, 0.0, n - 1)
+            i0 = np.minimum(pos.astype(np.intp), n - 2)
+            indices.append(i0)
+            fracciones.append(pos - i0)
 
-    # R4: SI (Advertencia) Y (Atento) -> RIESGO BAJO (30)
-    activacion_r4 = min(mu_advertencia, mu_atento)
+        # Suma sobre las 2^V esquinas de la celda
+        resultado = np.zeros(len(X))
+        for esquina in range(1 << len(self._ejes)):
+            peso = np.ones(len(X))
+            idx = []
+            for vi in range(len(self._ejes)):
+                if esquina >> vi & 1:
+                    peso = peso * fracciones[vi]
+                    idx.append(indices[vi] + 1)
+                else:
+                    peso = peso * (1.0 - fracciones[vi])
+                    idx.append(indices[vi])
+            resultado += peso * self._tabla[tuple(idx)]
+        return resultado
 
-    # R5: SI (Seguro) -> RIESGO NULO (0)
-    activacion_r5 = mu_seguro
 
-    # 3. DESFUSIFICACIÓN (Centroide Simplificado)
-    numerador = (activacion_r1 * 100) + (activacion_r2 * 80) + \
-                (activacion_r3 * 60) + (activacion_r4 * 30) + (activacion_r5 * 0)
+# --- BASES DE REGLAS DEL SISTEMA ---
 
-    denominador = sum([activacion_r1, activacion_r2, activacion_r3, activacion_r4, activacion_r5])
+# Motor básico (5 reglas): distancia a la línea + distracción
+MOTOR_RIESGO_BASICO = MotorDifuso(
+    variables={
+        "distancia": {
+            "peligro": (-999, -100, 0, 50),  # x < 0 (Cruzó) hasta 50px
+            "advertencia": (20, 100, 200),  # Entre 20px y 150px
+            "seguro": (150, 250, 999, 9999),  # Más de 150px
+        },
+        "celular": {
+            "distraccion": (0, 1, 2, 2),  # mu = celular
+            "atento": (-1, -1, 0, 1),  # mu = 1 - celular
+        },
+    },
+    reglas=[
+        ({"distancia": "peligro", "celular": "distraccion"}, 100),  # R1: RIESGO CRITICO
+        ({"distancia": "peligro", "celular": "atento"}, 80),  # R2: RIESGO ALTO
+        ({"distancia": "advertencia", "celular": "distraccion"}, 60),  # R3: RIESGO MEDIO
+        ({"distancia": "advertencia", "celular": "atento"}, 30),  # R4: RIESGO BAJO
+        ({"distancia": "seguro"}, 0),  # R5: RIESGO NULO
+    ],
+)
 
-    if denominador == 0: return 0.0
-    return numerador / denominador
\ No newline at end of file
+# Motor del Cerebro (16 reglas): distancia relativa (px) + velocidad de aproximación (px/s)
+# + tiempo estimado hasta cruzar la línea (s). Las reglas de distancia peligro/segura solo valen si el cruce
+# no es inminente; si lo es, mandan las reglas 13-16 (se para ANTES de que la persona llegue).
+MOTOR_RIESGO_CEREBRO = MotorDifuso(
+    variables={
+        "dist_rel": {
+            "critica": (-500, -500, 0, 30),  # Ya cruzó o está a nada
+            "peligro": (20, 50, 80, 120),  # En la zona naranja
+            "segura": (100, 200, 1000, 1000),  # Lejos
+        },
+        "vel": {  # Positivo es que se acerca a la línea
+            "asustado": (60, 100, 1000, 1000),  # Viene volando
+            "normal": (5, 20, 40, 60),  # Caminando normal
+            "quieto": (-15, -5, 5, 15),  # Parado o micro-movimientos
+            "se_va": (-1000, -1000, -30, -10),  # Se está alejando
+        },
+        "ttc": {  # Segundos hasta cruzar la línea (TTC_MAX = no llega)
+            "inminente": (-1, -1, 0.7, 1.2),
+            "pronto": (0.7, 1.2, 2.0, 3.0),
+            "lejano": (2.0, 3.0, 1000, 1000),
+        },
+    },
+    reglas=[
+        # Bloque: Distancia Crítica
+        ({"dist_rel": "critica", "vel": "asustado"}, 100),  # Regla 1: Encima y rápido -> CATÁSTROFE
+        ({"dist_rel": "critica", "vel": "normal"}, 98),  # Regla 2: Encima y normal -> PARADA YA
+        ({"dist_rel": "critica", "vel": "quieto"}, 95),  # Regla 3: Encima y quieto -> RIESGO EXTREMO
+        ({"dist_rel": "critica", "vel": "se_va"}, 80),  # Regla 4: Encima pero saliendo -> ALERTA MÁXIMA
+        # Bloque: Distancia Peligro
+        ({"dist_rel": "peligro", "vel": "asustado"}, 90),  # Regla 5: Cerca y volando -> PRE-PARADA
+        ({"dist_rel": "peligro", "vel": "normal", "ttc": "lejano"}, 65),  # Regla 6: Cerca y normal -> ADVERTENCIA FUERTE
+        ({"dist_rel": "peligro", "vel": "quieto", "ttc": "lejano"}, 40),  # Regla 7: Cerca y quieto -> MONITOREO
+        ({"dist_rel": "peligro", "vel": "se_va", "ttc": "lejano"}, 20),  # Regla 8: Cerca pero saliendo -> BAJA ALERTA
+        # Bloque: Distancia Segura
+        ({"dist_rel": "segura", "vel": "asustado", "ttc": "lejano"}, 45),  # Regla 9: Lejos pero viene rápido -> OJO AHÍ
+        ({"dist_rel": "segura", "vel": "normal", "ttc": "lejano"}, 15),  # Regla 10: Lejos y normal -> NOMINAL
+        ({"dist_rel": "segura", "vel": "quieto", "ttc": "lejano"}, 5),  # Regla 11: Lejos y quieto -> TODO FINO
+        ({"dist_rel": "segura", "vel": "se_va", "ttc": "lejano"}, 0),  # Regla 12: Lejos y se va -> RELAX TOTAL
+        # Bloque: Cruce Predicho (tiempo hasta la línea)
+        ({"dist_rel": "peligro", "ttc": "inminente"}, 98),  # Regla 13: Cerca y cruza en < 1s -> PARADA YA
+        ({"dist_rel": "peligro", "ttc": "pronto"}, 90),  # Regla 14: Cerca y cruza en 1-3s -> PRE-PARADA
+        ({"dist_rel": "segura", "ttc": "inminente"}, 95),  # Regla 15: Lejos pero llega en < 1s -> PARADA
+        ({"dist_rel": "segura", "ttc": "pronto"}, 75),  # Regla 16: Lejos y llega en 1-3s -> ADVERTENCIA FUERTE
+    ],
+)
+
+
+def inferencia_mamdani_riesgo_lote(distancia_px, tiene_celular):
+    """Versión por lotes de inferencia_mamdani_riesgo (arreglos de distancias y celulares)"""
+    return MOTOR_RIESGO_BASICO.evaluar_lote(distancia_px, tiene_celular)
+
+
+def logic_fuzzy_risk_batch(punto_x, line_x, vel, cel, ttc=None):
+    """
+    Motor de Inferencia Difusa del Cerebro (16 Reglas), por lotes.
+    Acepta escalares o arreglos; devuelve un arreglo de riesgos (%).
+    ttc: tiempo hasta la línea (s); si no se da, se estima con velocidad constante.
+    """
+    dist_rel = np.asarray(line_x, dtype=float) - np.asarray(punto_x, dtype=float)
+    if ttc is None:
+        ttc = tiempo_a_linea(dist_rel, vel)
+    riesgo_base = MOTOR_RIESGO_CEREBRO.evaluar_lote(dist_rel, vel, np.minimum(ttc, TTC_MAX))
+
+    # Modificador por Celular (Multiplicador Heurístico de Peligro)
+    # Si tiene celular, el riesgo percibido sube un 40% porque no está atento
+    cel = np.broadcast_to(np.asarray(cel, dtype=bool), riesgo_base.shape)
+    return np.where(cel, np.minimum(99.9, riesgo_base * 1.4), riesgo_base)
+
+
+def logic_fuzzy_risk(punto_x, line_x, vel, cel, ttc=None):
+    """Riesgo (%) de una sola persona. Ver logic_fuzzy_risk_batch."""
+    return float(logic_fuzzy_risk_batch(punto_x, line_x, vel, cel, ttc)[0])
+
+
+def inferencia_mamdani_riesgo(distancia_px, tiene_celular):
+    """
+    Calcula el % de Riesgo (0-100) usando lógica difusa avanzada.
+    Input:
+        - Distancia: Pixeles hacia la línea (Negativo = Cruzó).
+        - Celular: Booleano.
+    """
+    return float(inferencia_mamdani_riesgo_lote(distancia_px, tiene_celular)[0])
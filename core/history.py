@@ -0,0 +1,234 @@
+"""
+Historial de riesgo con agregados precalculados (rollups) por minuto, hora y día y por cámara.
+
+Se alimenta incrementalmente con los eventos del bus (telemetría del cerebro y percepción del detector) y
+guarda en SQLite solo los buckets: un gráfico de 30 días lee ~720 filas por cámara en lugar de millones
+de filas crudas de mundo_percepcion / acciones_sistema.
+"""
+import math
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from core import config
+
+RUTA_HISTORIA = os.getenv("SERPIENTE_HISTORIA_RUTA", "serpiente_historia.db")
+
+RESOLUCIONES = (60, 3600, 86400)  # s
+RETENCION = {60: 7 * 86400, 3600: 400 * 86400, 86400: None}  # Los buckets por día no se borran
+# Pasos "redondos" para el downsampling automático (s)
+PASOS = (60, 300, 900, 3600, 4 * 3600, 8 * 3600, 86400, 7 * 86400)
+
+MAX_DT = 1.0  # s. Una cámara que calla más que esto no suma tiempo en zona
+
+# Métricas de cada bucket (todas se combinan sumando, salvo riesgo_max)
+CAMPOS = ("n", "suma_riesgo", "riesgo_max", "s_peligro", "s_advertencia", "celulares", "paradas", "advertencias")
+
+
+def instante(valor, defecto):
+    """Epoch (s) desde un número o una fecha ISO 8601; None -> defecto"""
+    if valor in (None, ""):
+        return defecto
+    try:
+        return float(valor)
+    except (TypeError, ValueError):
+        return datetime.fromisoformat(str(valor).replace("Z", "+00:00")).timestamp()
+
+
+class Historial:
+    def __init__(self, ruta=RUTA_HISTORIA, periodo=5.0):
+        self.ruta = ruta
+        self.periodo = periodo
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._deltas = {}  # (resolucion, inicio, camara) -> [valores de CAMPOS]
+
+        # Estado para convertir eventos en duraciones y transiciones
+        self._vision = {}  # camara -> (ts, zona, celular)
+        self._ultima_accion = None
+
+        con = self._con()
+        con.execute("CREATE TABLE IF NOT EXISTS rollup (resolucion INTEGER NOT NULL, inicio INTEGER NOT NULL, "
+                    "camara TEXT NOT NULL, n INTEGER NOT NULL DEFAULT 0, suma_riesgo REAL NOT NULL DEFAULT 0, "
+                    "riesgo_max REAL NOT NULL DEFAULT 0, s_peligro REAL NOT NULL DEFAULT 0, "
+                    "s_advertencia REAL NOT NULL DEFAULT 0, celulares INTEGER NOT NULL DEFAULT 0, "
+                    "paradas INTEGER NOT NULL DEFAULT 0, advertencias INTEGER NOT NULL DEFAULT 0, "
+                    "PRIMARY KEY (resolucion, inicio, camara))")
+        threading.Thread(target=self._vaciar_loop, daemon=True, name="historial").start()
+
+    def _con(self):
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = sqlite3.connect(self.ruta, timeout=5.0, isolation_level=None, check_same_thread=False)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            self._local.con = con
+        return con
+
+    # --- ALIMENTACIÓN (hilo del bus) ---
+
+    def _sumar(self, ts, camara, **valores):
+        with self._lock:
+            for r in RESOLUCIONES:
+                self._combinar((r, int(ts // r) * r, camara), valores)
+
+    def _combinar(self, clave, valores):
+        """Suma valores {campo: v} al delta del bucket (llamar con _lock tomado)"""
+        d = self._deltas.get(clave)
+        if d is None:
+            d = self._deltas[clave] = [0] * len(CAMPOS)
+        for campo, v in valores.items():
+            i = CAMPOS.index(campo)
+            d[i] = max(d[i], v) if campo == "riesgo_max" else d[i] + v
+
+    def telemetria(self, datos):
+        """Riesgo por cámara de cada decisión del cerebro y transiciones a ADVERTENCIA / PARADA_TOTAL"""
+        ts = datos.get("ts") or time.time()
+        for camara, riesgo in (datos.get("camaras") or {}).items():
+            self._sumar(ts, camara, n=1, suma_riesgo=riesgo, riesgo_max=riesgo)
+        accion = datos.get("accion")
+        if accion != self._ultima_accion and accion in ("ADVERTENCIA", "PARADA_TOTAL"):
+            campo = "paradas" if accion == "PARADA_TOTAL" else "advertencias"
+            self._sumar(ts, datos.get("camara") or "", **{campo: 1})
+        self._ultima_accion = accion
+
+    def percepcion(self, camara, datos):
+        """Tiempo en zona de peligro / advertencia y episodios de celular, por cámara"""
+        ts = datos.get("ts") or time.time()
+        line_x = datos.get("line_x", 0)
+        xs = [p["x"] for p in datos.get("personas") or []]
+        if not xs and datos.get("hay_persona"):
+            xs = [datos.get("punto_medio_x", 0)]
+        if any(x > line_x for x in xs):
+            zona = "peligro"
+        elif any(0 < line_x - x < config.actual().detector.zona_advertencia_px for x in xs):
+            zona = "advertencia"
+        else:
+            zona = None
+        celular = bool(datos.get("tiene_celular"))
+
+        previo = self._vision.get(camara)
+        self._vision[camara] = (ts, zona, celular)
+        if previo is None:
+            return
+        ts_previo, zona_previa, celular_previo = previo
+        # El estado del frame anterior vale hasta este frame
+        dt = ts - ts_previo
+        if zona_previa and 0 < dt <= MAX_DT:
+            self._sumar(ts_previo, camara, **{f"s_{zona_previa}": dt})
+        if celular and not celular_previo:
+            self._sumar(ts, camara, celulares=1)
+
+    # --- PERSISTENCIA ---
+
+    def vaciar(self):
+        """Suma los deltas acumulados a los buckets de la BD (una transacción)"""
+        with self._lock:
+            deltas, self._deltas = self._deltas, {}
+        if not deltas:
+            return
+        con = self._con()
+        columnas = ", ".join(CAMPOS)
+        combinar = ", ".join(f"{c} = MAX({c}, excluded.{c})" if c == "riesgo_max" else f"{c} = {c} + excluded.{c}"
+                             for c in CAMPOS)
+        try:
+            con.execute("BEGIN IMMEDIATE")
+            con.executemany(f"INSERT INTO rollup (resolucion, inicio, camara, {columnas}) "
+                            f"VALUES (?, ?, ?, {', '.join('?' * len(CAMPOS))}) "
+                            f"ON CONFLICT (resolucion, inicio, camara) DO UPDATE SET {combinar}",
+                            [clave + tuple(valores) for clave, valores in deltas.items()])
+            con.execute("COMMIT")
+        except sqlite3.Error:
+            # La conexión no queda dentro de la transacción y los deltas vuelven para el próximo intento
+            # (sumados a los que llegaron mientras tanto)
+            if con.in_transaction:
+                con.execute("ROLLBACK")
+            with self._lock:
+                for clave, valores in deltas.items():
+                    self._combinar(clave, dict(zip(CAMPOS, valores)))
+            raise
+
+    def _podar(self):
+        ahora = time.time()
+        for r, retencion in RETENCION.items():
+            if retencion:
+                self._con().execute("DELETE FROM rollup WHERE resolucion = ? AND inicio < ?", (r, ahora - retencion))
+
+    def _vaciar_loop(self):
+        ciclos = 0
+        while True:
+            time.sleep(self.periodo)
+            try:
+                self.vaciar()
+                ciclos += 1
+                if ciclos % 720 == 0:  # ~1 vez por hora
+                    self._podar()
+            except sqlite3.Error as e:
+                print(f"⚠️ [HISTORIAL] Error guardando rollups: {e}")
+
+    # --- CONSULTAS ---
+
+    @staticmethod
+    def elegir_paso(desde, hasta, paso=None, puntos=300):
+        """Paso pedido o, si no, el paso redondo más chico que deja <= 'puntos' buckets"""
+        if paso:
+            return max(60, int(paso) // 60 * 60)
+        ideal = (hasta - desde) / max(1, puntos)
+        return next((p for p in PASOS if p >= ideal), math.ceil(ideal / PASOS[-1]) * PASOS[-1])
+
+    @staticmethod
+    def resolucion_para(paso, desfase=0):
+        """La resolución guardada más gruesa que encaja exacta en el paso (y en el desfase)"""
+        return max(r for r in RESOLUCIONES if paso % r == 0 and desfase % r == 0)
+
+    def serie(self, desde, hasta, paso=None, puntos=300, camara=None, desfase=0):
+        """
+        Serie temporal [desde, hasta) agregada cada 'paso' s. 'desfase' corre el origen de los buckets
+        (p. ej. paso=28800 y desfase=21600 -> turnos de 8 h que empiezan a las 06:00 UTC).
+        """
+        if hasta <= desde:
+            raise ValueError("'hasta' debe ser mayor que 'desde'")
+        if int(desfase) % 60:
+            raise ValueError("'desfase' debe ser múltiplo de 60 s")  # La resolución más fina guardada es el minuto
+        paso = self.elegir_paso(desde, hasta, paso, puntos)
+        desfase = int(desfase) % paso
+        resolucion = self.resolucion_para(paso, desfase)
+        self.vaciar()  # El bucket en curso también cuenta
+
+        filtro_camara = " AND camara = ?" if camara else ""
+        params = [desfase, paso, paso, desfase, resolucion, int(desde // resolucion) * resolucion, hasta]
+        filas = self._con().execute(
+            "SELECT ((inicio - ?) / ?) * ? + ? AS t, SUM(n), SUM(suma_riesgo), MAX(riesgo_max), SUM(s_peligro), "
+            "SUM(s_advertencia), SUM(celulares), SUM(paradas), SUM(advertencias) FROM rollup "
+            f"WHERE resolucion = ? AND inicio >= ? AND inicio < ?{filtro_camara} GROUP BY t ORDER BY t",
+            params + ([camara] if camara else [])).fetchall()
+        return {"paso": paso, "resolucion": resolucion, "desde": desde, "hasta": hasta,
+                "serie": [self._punto(f[1:], t=f[0]) for f in filas]}
+
+    def resumen(self, desde, hasta, camara=None):
+        """Totales del rango por cámara (p. ej. cuasi-accidentes y paradas de un turno)"""
+        if hasta <= desde:
+            raise ValueError("'hasta' debe ser mayor que 'desde'")
+        # Los bordes del rango se redondean al bucket: por minuto para rangos cortos, por hora si no
+        resolucion = 60 if hasta - desde <= 2 * 86400 else 3600
+        self.vaciar()
+        filtro_camara = " AND camara = ?" if camara else ""
+        filas = self._con().execute(
+            "SELECT camara, SUM(n), SUM(suma_riesgo), MAX(riesgo_max), SUM(s_peligro), SUM(s_advertencia), "
+            "SUM(celulares), SUM(paradas), SUM(advertencias) FROM rollup "
+            f"WHERE resolucion = ? AND inicio >= ? AND inicio < ?{filtro_camara} GROUP BY camara ORDER BY camara",
+            [resolucion, int(desde // resolucion) * resolucion, hasta] + ([camara] if camara else [])).fetchall()
+        camaras = {f[0] or "sin_camara": self._punto(f[1:]) for f in filas}
+        total = [sum(f[i] or 0 for f in filas) for i in range(1, 9)]
+        total[2] = max((f[3] or 0 for f in filas), default=0)
+        return {"desde": desde, "hasta": hasta, "resolucion": resolucion, "camaras": camaras,
+                "total": self._punto(total)}
+
+    @staticmethod
+    def _punto(valores, **extra):
+        n, suma, maximo, s_peligro, s_advertencia, celulares, paradas, advertencias = (v or 0 for v in valores)
+        return {**extra, "riesgo_max": round(maximo, 1), "riesgo_medio": round(suma / n, 1) if n else 0.0,
+                "s_peligro": round(s_peligro, 1), "s_advertencia": round(s_advertencia, 1),
+                "celulares": celulares, "paradas": paradas, "advertencias": advertencias}
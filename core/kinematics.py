@@ -0,0 +1,113 @@
+"""
+Cinemática por track con filtro de Kalman sobre la posición horizontal (x) de cada persona,
+alimentado con el timestamp de captura de cada frame (no con el reloj de llegada).
+
+- Modelo "cv": velocidad constante, estado [x, v].
+- Modelo "ca": aceleración constante, estado [x, v, a].
+Convención del sistema: el peligro está a la derecha de la línea, así que v > 0 = se acerca.
+"""
+import numpy as np
+
+TTC_MAX = 10.0  # s. "No llega": tope para personas quietas o que se alejan
+
+
+def tiempo_a_linea(dist_rel, vel, acel=0.0, tope=TTC_MAX):
+    """
+    Tiempo (s) hasta cruzar la línea a partir de la distancia relativa (line_x - x) y la velocidad
+    de aproximación. Escalares o arreglos. 0 si ya cruzó; 'tope' si no llega.
+    """
+    d = np.asarray(dist_rel, dtype=float)
+    v = np.asarray(vel, dtype=float)
+    a = np.asarray(acel, dtype=float)
+    d, v, a = np.broadcast_arrays(d, v, a)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Movimiento uniforme: d = v t
+        t = np.where(v > 1e-6, d / v, np.inf)
+        # Con aceleración: d = v t + a t^2 / 2 (raíz positiva más chica, si existe)
+        disc = v * v + 2 * a * d
+        con_a = np.abs(a) > 1e-6
+        raiz = np.sqrt(np.where(disc >= 0, disc, 0.0))
+        t_a = np.where(disc >= 0, (-v + raiz) / np.where(con_a, a, 1.0), np.inf)
+        t_a = np.where(t_a > 0, t_a, np.inf)
+        t = np.where(con_a, t_a, t)
+    t = np.where(d <= 0, 0.0, t)
+    return np.minimum(t, tope)
+
+
+class FiltroKalman:
+    """
+    Kalman lineal 1D por track. sigma_medida: ruido del centroide (px);
+    sigma_proceso: ruido de aceleración (cv, px/s^2) o de jerk (ca, px/s^3).
+    """
+
+    def __init__(self, x, ts, modelo="cv", sigma_medida=6.0, sigma_proceso=400.0, sigma_vel0=150.0,
+                 max_gap=1.0):
+        self.modelo = modelo
+        self.n = 2 if modelo == "cv" else 3
+        self.R = sigma_medida ** 2
+        self.q = sigma_proceso ** 2
+        self.sigma_vel0 = sigma_vel0
+        self.max_gap = max_gap
+        self._reiniciar(x, ts)
+
+    def _reiniciar(self, x, ts):
+        self.estado = np.zeros(self.n)
+        self.estado[0] = x
+        self.P = np.diag([self.R, self.sigma_vel0 ** 2, 500.0 ** 2][:self.n])
+        self.ts = ts
+        self.actualizaciones = 0
+
+    def _matrices(self, dt):
+        if self.n == 2:
+            F = np.array([[1.0, dt], [0.0, 1.0]])
+            # Aceleración blanca discreta
+            G = np.array([[dt * dt / 2], [dt]])
+        else:
+            F = np.array([[1.0, dt, dt * dt / 2], [0.0, 1.0, dt], [0.0, 0.0, 1.0]])
+            G = np.array([[dt ** 3 / 6], [dt * dt / 2], [dt]])
+        return F, G @ G.T * self.q
+
+    def predecir(self, ts):
+        """Estado proyectado a ts sin modificar el filtro"""
+        dt = ts - self.ts
+        if dt <= 0:
+            return self.estado.copy()
+        F, _ = self._matrices(dt)
+        return F @ self.estado
+
+    def actualizar(self, x, ts):
+        """Incorpora la medición x (px) del frame capturado en ts. Devuelve (x suavizada, velocidad, aceleración)."""
+        dt = ts - self.ts
+        if dt > self.max_gap or dt < 0:
+            # Hueco largo (o reloj que retrocede): el estado anterior ya no sirve
+            self._reiniciar(x, ts)
+        elif dt > 0:
+            F, Q = self._matrices(dt)
+            self.estado = F @ self.estado
+            self.P = F @ self.P @ F.T + Q
+            self.ts = ts
+
+        # Corrección (también con dt = 0: dos mediciones del mismo instante). H = [1, 0, ...] solo observa x
+        S = self.P[0, 0] + self.R
+        K = self.P[:, 0] / S
+        self.estado = self.estado + K * (x - self.estado[0])
+        self.P = self.P - np.outer(K, self.P[0])
+        self.actualizaciones += 1
+        return self.posicion, self.velocidad, self.aceleracion
+
+    @property
+    def posicion(self):
+        return float(self.estado[0])
+
+    @property
+    def velocidad(self):
+        # Hasta la segunda medición no hay información de velocidad
+        return float(self.estado[1]) if self.actualizaciones > 1 else 0.0
+
+    @property
+    def aceleracion(self):
+        return float(self.estado[2]) if self.n == 3 and self.actualizaciones > 2 else 0.0
+
+    def tiempo_a_linea(self, line_x):
+        return float(tiempo_a_linea(line_x - self.posicion, self.velocidad, self.aceleracion))
@@ -0,0 +1,188 @@
+"""Snapshot en memoria del último estado del sistema (cerebro, visión, máquina) con versionado."""
+import threading
+import time
+
+import zmq
+
+from core.bus import PUERTO_PERCEPCION, PUERTO_TELEMETRIA, PUERTO_MAQUINA, crear_suscriptor, recibir_json
+
+
+# --- PROYECCIONES: solo los campos que ve la HMI (así el ruido de seq/ts no cuenta como cambio) ---
+
+def proyectar_telemetria(d):
+    return {"riesgo_actual": round(float(d.get("riesgo_actual") or 0.0), 1),
+            "estado_logico": d.get("estado_logico", "")}
+
+
+def proyectar_vision(d):
+    personas = d.get("personas")
+    return {"hay_persona": d.get("hay_persona", False), "punto_medio_x": d.get("punto_medio_x", 0),
+            "tiene_celular": d.get("tiene_celular", False),
+            "personas": len(personas) if personas is not None else int(bool(d.get("hay_persona")))}
+
+
+class VisionPorCamara:
+    """Última proyección de visión de cada cámara, resumida en una sola sección para la HMI"""
+
+    def __init__(self, ttl=2.0):
+        self.ttl = ttl
+        self._camaras = {}  # camara -> (ts, proyección)
+
+    def agregar(self, camara, datos):
+        ahora = time.time()
+        self._camaras[camara] = (ahora, proyectar_vision(datos))
+        vigentes = {c: v for c, (ts, v) in sorted(self._camaras.items()) if ahora - ts <= self.ttl}
+        # La cámara con la persona más adentrada define el punto medio del resumen
+        lider = max(vigentes.values(), key=lambda v: (v["hay_persona"], v["punto_medio_x"]))
+        return {"hay_persona": any(v["hay_persona"] for v in vigentes.values()),
+                "punto_medio_x": lider["punto_medio_x"],
+                "tiene_celular": any(v["tiene_celular"] for v in vigentes.values()),
+                "personas": sum(v["personas"] for v in vigentes.values()),
+                "camaras": vigentes}
+
+
+def proyectar_maquina(d):
+    return {k: d[k] for k in ("estado_operativo", "modo_mantenimiento") if k in d}
+
+
+def maquina_desde_bd(estado, fila, silencio):
+    """
+    Campos de la fila 'estado_maquina' que la BD puede imponer al snapshot. El modo mantenimiento vive solo en
+    la BD. El estado operativo lo publica el Ejecutor por el bus apenas lo aplica, mientras que la fila se escribe
+    por write-behind y puede ir atrasada (o quedar en el journal si Supabase no responde): solo se toma de la BD
+    cuando la sección lleva más de 'silencio' segundos sin eventos del bus.
+    """
+    datos = proyectar_maquina(fila)
+    if estado.antiguedad("machine") <= silencio:
+        datos.pop("estado_operativo", None)
+    return datos
+
+
+class LiveState:
+    """
+    Estado vivo por secciones. Cada cambio real incrementa la versión global, de modo que
+    un consumidor puede preguntar "¿hay algo más nuevo que la versión N?" sin tocar la BD.
+    """
+
+    SECCIONES = ("telemetry", "vision", "machine")
+
+    def __init__(self):
+        self._datos = {s: None for s in self.SECCIONES}
+        self.version = 0
+        self.actualizado = 0.0
+        self.recibido = {s: 0.0 for s in self.SECCIONES}  # Última vez que llegó dato del bus (cambie o no)
+        self._cond = threading.Condition()
+
+    def actualizar(self, seccion, datos, del_bus=True):
+        """
+        Reemplaza una sección. Devuelve True si cambió (y por lo tanto subió la versión).
+        Lo que llega de la BD (del_bus=False) no cuenta como actividad del bus para antiguedad().
+        """
+        with self._cond:
+            if del_bus:
+                self.recibido[seccion] = time.time()
+            if self._datos.get(seccion) == datos:
+                return False
+            self._datos[seccion] = datos
+            self.version += 1
+            self.actualizado = time.time()
+            self._cond.notify_all()
+            return True
+
+    def fusionar(self, seccion, datos, del_bus=True):
+        """Actualiza solo algunos campos de una sección (copia, mezcla y versión bajo el mismo lock)"""
+        with self._cond:  # Condition usa un RLock: actualizar() puede volver a tomarlo
+            nuevo = dict(self._datos.get(seccion) or {})
+            nuevo.update(datos)
+            return self.actualizar(seccion, nuevo, del_bus)
+
+    def antiguedad(self, seccion):
+        """Segundos desde el último dato recibido para una sección"""
+        return time.time() - self.recibido[seccion]
+
+    def snapshot(self):
+        """(version, {seccion: datos}) consistente"""
+        with self._cond:
+            return self.version, dict(self._datos)
+
+    def esperar(self, version, timeout):
+        """Bloquea hasta que haya una versión distinta de 'version' o venza el timeout"""
+        with self._cond:
+            self._cond.wait_for(lambda: self.version != version, timeout=timeout)
+            return self.version, dict(self._datos)
+
+
+# --- ALIMENTACIÓN DEL SNAPSHOT (un solo hilo por proceso, no por cliente) ---
+
+def alimentar_desde_bus(estado, context=None, host="localhost", historial=None):
+    """
+    Hilo que suscribe el snapshot a los eventos de los agentes (percepción, cerebro, máquina).
+    Con 'historial' (core.history.Historial) los mismos eventos alimentan también los rollups.
+    """
+    context = context or zmq.Context.instance()
+
+    def worker():
+        vision = VisionPorCamara()
+        percepcion = crear_suscriptor(context, PUERTO_PERCEPCION, host)
+        fuentes = {
+            crear_suscriptor(context, PUERTO_TELEMETRIA, host): ("telemetry", proyectar_telemetria, False),
+            crear_suscriptor(context, PUERTO_MAQUINA, host): ("machine", proyectar_maquina, True),
+        }
+        poller = zmq.Poller()
+        poller.register(percepcion, zmq.POLLIN)
+        for sock in fuentes:
+            poller.register(sock, zmq.POLLIN)
+        while True:
+            for sock, _ in poller.poll(1000):
+                try:
+                    if sock is percepcion:
+                        # Percepción por tópico de cámara: se resume con el resto de cámaras
+                        camara, crudo = recibir_json(sock)
+                        if historial:
+                            historial.percepcion(camara, crudo)
+                        estado.actualizar("vision", vision.agregar(camara, crudo))
+                        continue
+                    seccion, proyeccion, fusionar = fuentes[sock]
+                    crudo = sock.recv_json()
+                    if historial and seccion == "telemetry":
+                        historial.telemetria(crudo)
+                    datos = proyeccion(crudo)
+                except ValueError:
+                    continue
+                if fusionar:
+                    estado.fusionar(seccion, datos)
+                else:
+                    estado.actualizar(seccion, datos)
+
+    t = threading.Thread(target=worker, daemon=True, name="live-bus")
+    t.start()
+    return t
+
+
+def refrescar_desde_bd(estado, db, intervalo=2.0, silencio=5.0):
+    """
+    Hilo de respaldo: consulta la BD solo para las secciones sin eventos del bus en 'silencio' segundos.
+    El modo mantenimiento vive solo en la BD y se refresca siempre (ver maquina_desde_bd).
+    """
+
+    def worker():
+        while True:
+            try:
+                if estado.antiguedad("telemetry") > silencio:
+                    telemetry = db.table("telemetria_cerebro").select("*").eq("id", 1).maybe_single().execute().data
+                    if telemetry:
+                        estado.actualizar("telemetry", proyectar_telemetria(telemetry), del_bus=False)
+                if estado.antiguedad("vision") > silencio:
+                    vision = db.table("mundo_percepcion").select("*").order("id", desc=True).limit(1).execute().data
+                    if vision:
+                        estado.actualizar("vision", proyectar_vision(vision[0]), del_bus=False)
+                machine = db.table("estado_maquina").select("*").eq("id", 1).maybe_single().execute().data
+                if machine:
+                    estado.fusionar("machine", maquina_desde_bd(estado, machine, silencio), del_bus=False)
+            except Exception as e:
+                print(f"⚠️ [LIVE] Error refrescando desde BD: {e}")
+            time.sleep(intervalo)
+
+    t = threading.Thread(target=worker, daemon=True, name="live-bd")
+    t.start()
+    return t
@@ -0,0 +1,386 @@
+"""
+Almacenamiento local embebido (SQLite en modo WAL) con la misma API encadenada del cliente Supabase
+(table().select().eq()...execute()), para que la planta siga registrando aunque se caiga internet.
+
+- Una conexión por hilo (lectores en paralelo con WAL) y sentencias preparadas cacheadas por el driver:
+  el SQL de cada consulta depende solo de su forma, no de los valores.
+- Replicación periódica por lotes a Supabase: las tablas de inserción avanzan un cursor por id; las de
+  fila única (telemetría, estado de máquina) suben la última versión de las filas modificadas.
+  Varios procesos comparten el archivo: solo replica el que tiene el turno de líder (lease en la BD).
+"""
+import os
+import sqlite3
+import threading
+import time
+
+from core.memory_db import Resultado
+
+RUTA_LOCAL = os.getenv("SERPIENTE_BD_RUTA", "serpiente_local.db")
+
+# replica: "insercion" = solo se agregan filas (se suben por cursor) | "fila" = filas que se actualizan
+# bajada: columnas cuyo dueño es Supabase (p. ej. el modo mantenimiento lo cambia el operador desde el panel)
+ESQUEMA = {
+    "mundo_percepcion": {
+        "columnas": {"hay_persona": "bool", "punto_medio_x": "real", "tiene_celular": "bool",
+                     "zona_peligro": "bool", "zona_advertencia": "bool"},
+        "replica": "insercion",
+    },
+    "acciones_sistema": {
+        "columnas": {"accion": "text", "motivo": "text", "riesgo": "real"},
+        "replica": "insercion",
+    },
+    "telemetria_cerebro": {
+        "columnas": {"riesgo_actual": "real", "estado_logico": "text", "ultimo_calculo": "text"},
+        "replica": "fila",
+    },
+    "estado_maquina": {
+        "columnas": {"estado_operativo": "text", "modo_mantenimiento": "bool"},
+        "replica": "fila",
+        "bajada": ("modo_mantenimiento",),
+        "inicial": {"id": 1, "estado_operativo": "RUN", "modo_mantenimiento": False},
+    },
+}
+
+_TIPOS_SQL = {"bool": "INTEGER", "real": "REAL", "text": "TEXT", "int": "INTEGER"}
+_AHORA_ISO = "strftime('%Y-%m-%dT%H:%M:%fZ', 'now')"
+
+
+class _Consulta:
+    """Misma interfaz que core.memory_db._Consulta; los filtros se guardan como (columna, operador, valor)"""
+
+    def __init__(self, db, tabla):
+        self.db = db
+        self.tabla = tabla
+        self.op = "select"
+        self.columnas = "*"
+        self.valores = None
+        self.filtros = []
+        self.orden = None
+        self.limite = None
+        self.single = False
+
+    # --- operación ---
+    def select(self, columnas="*"):
+        self.op, self.columnas = "select", columnas
+        return self
+
+    def insert(self, filas):
+        self.op, self.valores = "insert", filas
+        return self
+
+    def update(self, valores):
+        self.op, self.valores = "update", valores
+        return self
+
+    def upsert(self, filas):
+        self.op, self.valores = "upsert", filas
+        return self
+
+    def delete(self):
+        self.op = "delete"
+        return self
+
+    # --- filtros / modificadores ---
+    def eq(self, columna, valor):
+        self.filtros.append((columna, "=", valor))
+        return self
+
+    def gte(self, columna, valor):
+        self.filtros.append((columna, ">=", valor))
+        return self
+
+    def lte(self, columna, valor):
+        self.filtros.append((columna, "<=", valor))
+        return self
+
+    def order(self, columna, desc=False):
+        self.orden = (columna, desc)
+        return self
+
+    def limit(self, n):
+        self.limite = n
+        return self
+
+    def maybe_single(self):
+        self.single = True
+        return self
+
+    def execute(self):
+        return self.db._ejecutar(self)
+
+
+class LocalClient:
+    """
+    Cliente SQLite con la API de Supabase para las tablas de ESQUEMA. 'upstream' (cliente Supabase u otro
+    con la misma API) activa la replicación cada 'periodo' segundos; sin él, la BD local es la única y la
+    retención (retencion_h) corre sola cada 'periodo_poda' segundos.
+    """
+
+    def __init__(self, ruta=RUTA_LOCAL, upstream=None, periodo=2.0, lote=500, retencion_h=72.0, periodo_poda=600.0):
+        self.ruta = ruta
+        self.upstream = upstream
+        self.periodo = periodo
+        self.lote = lote
+        self.retencion_s = retencion_h * 3600
+        self.periodo_poda = periodo_poda
+        self._local = threading.local()
+        self._id_lider = f"{os.getpid()}-{id(self)}"
+
+        # Métricas de replicación
+        self.replicadas = 0
+        self.pendientes = 0
+        self.ultimo_error = None
+        self.ultima_replicacion = 0.0
+
+        self._crear_esquema()
+        if upstream is not None:
+            threading.Thread(target=self._replicar_loop, daemon=True, name="bd-replicacion").start()
+        else:
+            # Modo offline: nada se replica, así que la poda no puede esperar al cursor de replicación
+            threading.Thread(target=self._podar_loop, daemon=True, name="bd-retencion").start()
+
+    # --- CONEXIÓN ---
+
+    def _con(self):
+        con = getattr(self._local, "con", None)
+        if con is None:
+            # Autocommit: cada sentencia suelta es su propia transacción; los lotes usan BEGIN IMMEDIATE
+            con = sqlite3.connect(self.ruta, timeout=5.0, isolation_level=None, check_same_thread=False,
+                                  cached_statements=256)
+            con.row_factory = sqlite3.Row
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")  # Con WAL: durable ante caídas del proceso, rápido
+            con.execute("PRAGMA busy_timeout=5000")
+            self._local.con = con
+        return con
+
+    def _crear_esquema(self):
+        con = self._con()
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            for tabla, definicion in ESQUEMA.items():
+                columnas = ", ".join(f"{c} {_TIPOS_SQL[t]}" for c, t in definicion["columnas"].items())
+                con.execute(f"CREATE TABLE IF NOT EXISTS {tabla} (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                            f"created_at TEXT NOT NULL DEFAULT ({_AHORA_ISO}), {columnas})")
+                con.execute(f"CREATE INDEX IF NOT EXISTS idx_{tabla}_created_at ON {tabla} (created_at)")
+                if "inicial" in definicion:
+                    fila = definicion["inicial"]
+                    con.execute(f"INSERT OR IGNORE INTO {tabla} ({', '.join(fila)}) "
+                                f"VALUES ({', '.join('?' * len(fila))})", list(fila.values()))
+            # Estado de la replicación (compartido por todos los procesos que abren el archivo)
+            con.execute("CREATE TABLE IF NOT EXISTS _cursor (tabla TEXT PRIMARY KEY, ultimo_id INTEGER NOT NULL)")
+            con.execute("CREATE TABLE IF NOT EXISTS _pendientes (tabla TEXT NOT NULL, fila_id INTEGER NOT NULL, "
+                        "version INTEGER NOT NULL, PRIMARY KEY (tabla, fila_id))")
+            con.execute("CREATE TABLE IF NOT EXISTS _lider (id INTEGER PRIMARY KEY, quien TEXT, expira REAL)")
+            con.execute("COMMIT")
+        except Exception:
+            con.execute("ROLLBACK")
+            raise
+
+    # --- API SUPABASE ---
+
+    def table(self, nombre):
+        if nombre not in ESQUEMA:
+            raise ValueError(f"Tabla desconocida en la BD local: {nombre}")
+        return _Consulta(self, nombre)
+
+    def _columna(self, tabla, columna):
+        """Valida el nombre (los identificadores van en el SQL; los valores siempre como parámetros)"""
+        if columna not in ("id", "created_at") and columna not in ESQUEMA[tabla]["columnas"]:
+            raise ValueError(f"Columna desconocida en {tabla}: {columna}")
+        return columna
+
+    def _fila(self, tabla, row):
+        tipos = ESQUEMA[tabla]["columnas"]
+        return {k: bool(row[k]) if tipos.get(k) == "bool" and row[k] is not None else row[k] for k in row.keys()}
+
+    def _where(self, q):
+        if not q.filtros:
+            return "", []
+        partes = [f"{self._columna(q.tabla, c)} {op} ?" for c, op, _ in q.filtros]
+        return " WHERE " + " AND ".join(partes), [v for _, _, v in q.filtros]
+
+    def _ejecutar(self, q):
+        con = self._con()
+        if q.op == "select":
+            if q.columnas.strip() == "*":
+                columnas = "*"
+            else:
+                columnas = ", ".join(self._columna(q.tabla, c.strip()) for c in q.columnas.split(","))
+            where, params = self._where(q)
+            sql = f"SELECT {columnas} FROM {q.tabla}{where}"
+            if q.orden:
+                sql += f" ORDER BY {self._columna(q.tabla, q.orden[0])} {'DESC' if q.orden[1] else 'ASC'}"
+            if q.limite is not None or q.single:
+                sql += " LIMIT ?"
+                params.append(1 if q.single else int(q.limite))
+            filas = [self._fila(q.tabla, r) for r in con.execute(sql, params)]
+            if q.single:
+                return Resultado(filas[0] if filas else None)
+            return Resultado(filas)
+
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            filas = self._escribir(con, q)
+            con.execute("COMMIT")
+        except Exception:
+            con.execute("ROLLBACK")
+            raise
+        return Resultado(filas)
+
+    def _escribir(self, con, q):
+        tabla = q.tabla
+        if q.op in ("insert", "upsert"):
+            nuevas = q.valores if isinstance(q.valores, list) else [q.valores]
+            salida = []
+            for fila in nuevas:
+                columnas = [self._columna(tabla, c) for c in fila]
+                sql = f"INSERT INTO {tabla} ({', '.join(columnas)}) VALUES ({', '.join('?' * len(columnas))})"
+                if q.op == "upsert" and "id" in fila:
+                    resto = [c for c in columnas if c != "id"]
+                    sql += (" ON CONFLICT (id) DO " + ("UPDATE SET " + ", ".join(f"{c} = excluded.{c}" for c in resto)
+                                                        if resto else "NOTHING"))
+                salida += [self._fila(tabla, r) for r in con.execute(sql + " RETURNING *", list(fila.values()))]
+        elif q.op == "update":
+            columnas = [self._columna(tabla, c) for c in q.valores]
+            where, params = self._where(q)
+            sql = f"UPDATE {tabla} SET {', '.join(f'{c} = ?' for c in columnas)}{where} RETURNING *"
+            salida = [self._fila(tabla, r) for r in con.execute(sql, list(q.valores.values()) + params)]
+        elif q.op == "delete":
+            where, params = self._where(q)
+            salida = [self._fila(tabla, r) for r in con.execute(f"DELETE FROM {tabla}{where} RETURNING *", params)]
+        else:
+            raise ValueError(f"Operación desconocida: {q.op}")
+
+        if ESQUEMA[tabla]["replica"] == "fila" and q.op != "delete":
+            # Marca la fila para subir su última versión (la versión evita perder un cambio a mitad de subida)
+            con.executemany("INSERT INTO _pendientes (tabla, fila_id, version) VALUES (?, ?, 1) "
+                            "ON CONFLICT (tabla, fila_id) DO UPDATE SET version = version + 1",
+                            [(tabla, f["id"]) for f in salida])
+        return salida
+
+    # --- REPLICACIÓN A SUPABASE ---
+
+    def _tomar_turno(self):
+        """Lease de líder: solo un proceso replica; si muere, otro lo toma al vencer el plazo"""
+        ahora = time.time()
+        con = self._con()
+        con.execute("INSERT OR IGNORE INTO _lider (id, quien, expira) VALUES (1, NULL, 0)")
+        cur = con.execute("UPDATE _lider SET quien = ?, expira = ? WHERE id = 1 AND (quien = ? OR expira < ?)",
+                          (self._id_lider, ahora + 3 * self.periodo, self._id_lider, ahora))
+        return cur.rowcount == 1
+
+    def _replicar_loop(self):
+        espera = self.periodo
+        while True:
+            time.sleep(espera)
+            try:
+                if not self._tomar_turno():
+                    espera = self.periodo
+                    continue
+                self.replicar()
+                espera = self.periodo
+            except Exception as e:
+                # Supabase inalcanzable: los datos siguen en la BD local y se suben al volver
+                if str(e) != self.ultimo_error:
+                    print(f"⚠️ [BD LOCAL] Replicación pausada: {e}")
+                self.ultimo_error = str(e)
+                self.pendientes = self._contar_pendientes(self._con())
+                espera = min(60.0, espera * 2)
+
+    def replicar(self):
+        """Una pasada de replicación completa (subida por lotes + bajada). Devuelve las filas subidas."""
+        con = self._con()
+        subidas = 0
+        for tabla, definicion in ESQUEMA.items():
+            if definicion["replica"] == "insercion":
+                subidas += self._subir_inserciones(con, tabla)
+            else:
+                subidas += self._subir_filas(con, tabla, definicion.get("bajada", ()))
+            if definicion.get("bajada"):
+                self._bajar(con, tabla, definicion["bajada"])
+        self._podar(con)
+
+        self.pendientes = self._contar_pendientes(con)
+        if self.ultimo_error:
+            print(f"✅ [BD LOCAL] Replicación reanudada ({self.pendientes} filas en espera)")
+        self.ultimo_error = None
+        self.replicadas += subidas
+        self.ultima_replicacion = time.time()
+        return subidas
+
+    def _cursor(self, con, tabla):
+        row = con.execute("SELECT ultimo_id FROM _cursor WHERE tabla = ?", (tabla,)).fetchone()
+        return row[0] if row else 0
+
+    def _contar_pendientes(self, con):
+        """Filas de inserción todavía sin subir"""
+        return sum(con.execute(f"SELECT COUNT(*) FROM {t} WHERE id > ?", (self._cursor(con, t),)).fetchone()[0]
+                   for t, d in ESQUEMA.items() if d["replica"] == "insercion")
+
+    def _subir_inserciones(self, con, tabla):
+        subidas = 0
+        while True:
+            cursor = self._cursor(con, tabla)
+            filas = [self._fila(tabla, r) for r in con.execute(
+                f"SELECT * FROM {tabla} WHERE id > ? ORDER BY id LIMIT ?", (cursor, self.lote))]
+            if not filas:
+                return subidas
+            # El id lo asigna Supabase; created_at conserva la hora real del evento aunque se suba tarde
+            self.upstream.table(tabla).insert([{k: v for k, v in f.items() if k != "id"} for f in filas]).execute()
+            con.execute("INSERT INTO _cursor (tabla, ultimo_id) VALUES (?, ?) "
+                        "ON CONFLICT (tabla) DO UPDATE SET ultimo_id = excluded.ultimo_id", (tabla, filas[-1]["id"]))
+            subidas += len(filas)
+            if len(filas) < self.lote:
+                return subidas
+
+    def _subir_filas(self, con, tabla, bajada):
+        pendientes = con.execute("SELECT fila_id, version FROM _pendientes WHERE tabla = ?", (tabla,)).fetchall()
+        for fila_id, version in pendientes:
+            fila = con.execute(f"SELECT * FROM {tabla} WHERE id = ?", (fila_id,)).fetchone()
+            if fila is not None:
+                valores = {k: v for k, v in self._fila(tabla, fila).items()
+                           if k not in ("id", "created_at") and k not in bajada}
+                self.upstream.table(tabla).update(valores).eq("id", fila_id).execute()
+            # Si cambió mientras se subía, queda pendiente para la próxima pasada
+            con.execute("DELETE FROM _pendientes WHERE tabla = ? AND fila_id = ? AND version = ?",
+                        (tabla, fila_id, version))
+        return len(pendientes)
+
+    def _bajar(self, con, tabla, columnas):
+        for fila in self.upstream.table(tabla).select(", ".join(("id",) + tuple(columnas))).execute().data or []:
+            valores = {c: fila[c] for c in columnas if c in fila}
+            if valores:
+                # Directo al SQL: no se marca como pendiente (no debe volver a subir)
+                con.execute(f"UPDATE {tabla} SET {', '.join(f'{c} = ?' for c in valores)} WHERE id = ?",
+                            list(valores.values()) + [fila["id"]])
+
+    def _podar(self, con):
+        """
+        Borra las filas de inserción más viejas que la retención. Con upstream, solo las ya replicadas;
+        sin él (BD local única), por antigüedad a secas.
+        """
+        limite = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(time.time() - self.retencion_s))
+        borradas = 0
+        for tabla, definicion in ESQUEMA.items():
+            if definicion["replica"] != "insercion":
+                continue
+            if self.upstream is None:
+                cur = con.execute(f"DELETE FROM {tabla} WHERE created_at < ?", (limite,))
+            else:
+                cur = con.execute(f"DELETE FROM {tabla} WHERE id <= ? AND created_at < ?",
+                                  (self._cursor(con, tabla), limite))
+            borradas += cur.rowcount
+        return borradas
+
+    def _podar_loop(self):
+        while True:
+            try:
+                self._podar(self._con())
+            except sqlite3.Error as e:
+                print(f"⚠️ [BD LOCAL] Error aplicando la retención: {e}")
+            time.sleep(self.periodo_poda)
+
+    def resumen(self):
+        estado = f"error: {self.ultimo_error}" if self.ultimo_error else "ok"
+        return f"BD local {self.ruta} | replicadas {self.replicadas} | en espera {self.pendientes} | {estado}"
@@ -0,0 +1,131 @@
+"""Sustituto en memoria del cliente Supabase (mismo encadenado table().select().eq()...execute())."""
+import threading
+from copy import deepcopy
+
+
+class Resultado:
+    def __init__(self, data):
+        self.data = data
+
+
+class _Consulta:
+    def __init__(self, db, tabla):
+        self.db = db
+        self.tabla = tabla
+        self.op = "select"
+        self.valores = None
+        self.filtros = []
+        self.orden = None
+        self.limite = None
+        self.single = False
+
+    # --- operación ---
+    def select(self, columnas="*"):
+        self.op = "select"
+        return self
+
+    def insert(self, filas):
+        self.op, self.valores = "insert", filas
+        return self
+
+    def update(self, valores):
+        self.op, self.valores = "update", valores
+        return self
+
+    def upsert(self, filas):
+        self.op, self.valores = "upsert", filas
+        return self
+
+    def delete(self):
+        self.op = "delete"
+        return self
+
+    # --- filtros / modificadores ---
+    def eq(self, columna, valor):
+        self.filtros.append(lambda f: f.get(columna) == valor)
+        return self
+
+    def gte(self, columna, valor):
+        self.filtros.append(lambda f: f.get(columna) is not None and f.get(columna) >= valor)
+        return self
+
+    def lte(self, columna, valor):
+        self.filtros.append(lambda f: f.get(columna) is not None and f.get(columna) <= valor)
+        return self
+
+    def order(self, columna, desc=False):
+        self.orden = (columna, desc)
+        return self
+
+    def limit(self, n):
+        self.limite = n
+        return self
+
+    def maybe_single(self):
+        self.single = True
+        return self
+
+    def execute(self):
+        return self.db._ejecutar(self)
+
+
+class MemoryClient:
+    """Tablas como listas de dicts con 'id' autoincremental. Pensado para replays y pruebas, no para volumen."""
+
+    def __init__(self, tablas=None):
+        self.tablas = {}
+        self._ids = {}
+        self._lock = threading.Lock()
+        for nombre, filas in (tablas or {}).items():
+            for fila in filas:
+                self._insertar(nombre, fila)
+
+    def table(self, nombre):
+        return _Consulta(self, nombre)
+
+    def _insertar(self, tabla, fila):
+        fila = dict(fila)
+        if "id" not in fila:
+            self._ids[tabla] = self._ids.get(tabla, 0) + 1
+            fila["id"] = self._ids[tabla]
+        else:
+            self._ids[tabla] = max(self._ids.get(tabla, 0), fila["id"])
+        self.tablas.setdefault(tabla, []).append(fila)
+        return fila
+
+    def _ejecutar(self, q):
+        with self._lock:
+            filas = self.tablas.setdefault(q.tabla, [])
+            elegidas = [f for f in filas if all(c(f) for c in q.filtros)]
+
+            if q.op == "insert":
+                nuevas = q.valores if isinstance(q.valores, list) else [q.valores]
+                return Resultado([deepcopy(self._insertar(q.tabla, f)) for f in nuevas])
+            if q.op == "upsert":
+                nuevas = q.valores if isinstance(q.valores, list) else [q.valores]
+                salida = []
+                for f in nuevas:
+                    existente = next((e for e in filas if "id" in f and e["id"] == f["id"]), None)
+                    if existente:
+                        existente.update(f)
+                    else:
+                        existente = self._insertar(q.tabla, f)
+                    salida.append(deepcopy(existente))
+                return Resultado(salida)
+            if q.op == "update":
+                for f in elegidas:
+                    f.update(q.valores)
+                return Resultado(deepcopy(elegidas))
+            if q.op == "delete":
+                self.tablas[q.tabla] = [f for f in filas if f not in elegidas]
+                return Resultado(deepcopy(elegidas))
+
+            if q.orden:
+                columna, desc = q.orden
+                elegidas = sorted(elegidas, key=lambda f: (f.get(columna) is None, f.get(columna)), reverse=desc)
+            if q.limite is not None:
+                elegidas = elegidas[:q.limite]
+            elegidas = deepcopy(elegidas)
+            if q.single:
+                return Resultado(elegidas[0] if elegidas else None)
+            return Resultado(elegidas)
@@ -0,0 +1,207 @@
+"""Servicio de notificaciones Telegram en segundo plano: pool de conexiones, rate limit y deduplicación."""
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class TelegramRateLimit(Exception):
+    """Telegram respondió 429: hay que esperar retry_after segundos"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"rate limit, reintentar en {retry_after}s")
+        self.retry_after = retry_after
+
+
+class RequestsTransport:
+    """Transporte HTTP real con sesión persistente (keep-alive, sin un handshake TLS por mensaje)"""
+
+    def __init__(self, token, base_url=None, timeout=5.0):
+        self.base_url = (base_url or os.getenv("TELEGRAM_API_URL", "https://api.telegram.org")).rstrip("/")
+        self.url = f"{self.base_url}/bot{token}/sendMessage"
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.mount(self.base_url, HTTPAdapter(pool_connections=1, pool_maxsize=2, max_retries=0))
+
+    def enviar(self, chat_id, texto):
+        r = self.session.post(self.url, json={"chat_id": chat_id, "text": texto}, timeout=self.timeout)
+        if r.status_code == 429:
+            retry_after = r.json().get("parameters", {}).get("retry_after", 1)
+            raise TelegramRateLimit(retry_after)
+        r.raise_for_status()
+
+
+class MemoryTransport:
+    """Transporte en memoria para pruebas y simulaciones (no sale a la red)"""
+
+    def __init__(self):
+        self.enviados = []
+
+    def enviar(self, chat_id, texto):
+        self.enviados.append((time.time(), chat_id, texto))
+
+
+class TokenBucket:
+    """Cubeta de tokens: 'tasa' tokens por segundo con ráfagas de hasta 'capacidad'"""
+
+    def __init__(self, tasa, capacidad):
+        self.tasa = tasa
+        self.capacidad = capacidad
+        self.tokens = capacidad
+        self.t = time.monotonic()
+
+    def espera(self):
+        """Segundos a esperar para disponer de un token (0 si ya hay uno)"""
+        ahora = time.monotonic()
+        self.tokens = min(self.capacidad, self.tokens + (ahora - self.t) * self.tasa)
+        self.t = ahora
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.tasa
+
+    def consumir(self):
+        self.tokens -= 1
+
+
+def firma(texto):
+    """Texto sin cifras: "Riesgo 97.2%" y "Riesgo 98.0%" son la misma alerta"""
+    return re.sub(r"\d+(?:[.,]\d+)?", "#", texto)
+
+
+class TelegramNotifier:
+    """
+    Outbox acotado + hilo de envío. Las alertas con la misma clave (mismo incidente):
+    - se fusionan mientras esperan en el outbox (ventana de agrupación corta),
+    - y si ya se enviaron dentro de la ventana del incidente, las líneas repetidas (misma firma,
+      aunque cambien las cifras) se descartan.
+    Límites por defecto según Telegram: ~1 msg/s por chat y 30 msg/s globales.
+    """
+
+    def __init__(self, transport, chat_id, max_outbox=50, agrupacion=0.5, ventana_incidente=60.0,
+                 tasa_chat=1.0, rafaga_chat=3, tasa_global=30.0, max_reintentos=3):
+        self.transport = transport
+        self.chat_id = chat_id
+        self.max_outbox = max_outbox
+        self.agrupacion = agrupacion
+        self.ventana_incidente = ventana_incidente
+        self.max_reintentos = max_reintentos
+
+        self._outbox = OrderedDict()  # (chat_id, clave) -> {"lineas", "listo", "intentos"}
+        self._enviados = {}  # (chat_id, clave) -> (ts, set(lineas))
+        self._buckets = {}
+        self._bucket_chat = (tasa_chat, rafaga_chat)
+        self._global = TokenBucket(tasa_global, tasa_global)
+        self._cond = threading.Condition()
+
+        # Métricas
+        self.enviados = 0
+        self.fusionados = 0
+        self.suprimidos = 0
+        self.descartados = 0
+        self.errores = 0
+
+        self._thread = threading.Thread(target=self._worker, daemon=True, name="telegram")
+        self._thread.start()
+
+    def notificar(self, texto, clave=None, chat_id=None):
+        """Encola una alerta sin bloquear. clave identifica el incidente (por defecto, el propio texto)."""
+        chat_id = chat_id or self.chat_id
+        k = (chat_id, clave or texto)
+        ahora = time.monotonic()
+        f = firma(texto)
+        with self._cond:
+            # Líneas ya enviadas para este incidente dentro de la ventana: no se repiten
+            previo = self._enviados.get(k)
+            if previo and ahora - previo[0] < self.ventana_incidente and f in previo[1]:
+                self.suprimidos += 1
+                return False
+
+            pendiente = self._outbox.get(k)
+            if pendiente:
+                # Misma alerta pendiente: se queda el texto más reciente; si es nueva, se agrega
+                firmas = [firma(l) for l in pendiente["lineas"]]
+                if f in firmas:
+                    pendiente["lineas"][firmas.index(f)] = texto
+                else:
+                    pendiente["lineas"].append(texto)
+                self.fusionados += 1
+                return True
+
+            if len(self._outbox) >= self.max_outbox:
+                self._outbox.popitem(last=False)
+                self.descartados += 1
+            self._outbox[k] = {"lineas": [texto], "listo": ahora + self.agrupacion, "intentos": 0}
+            self._cond.notify()
+        return True
+
+    def metricas(self):
+        with self._cond:
+            return {"outbox": len(self._outbox), "enviados": self.enviados, "fusionados": self.fusionados,
+                    "suprimidos": self.suprimidos, "descartados": self.descartados, "errores": self.errores}
+
+    def _bucket(self, chat_id):
+        if chat_id not in self._buckets:
+            self._buckets[chat_id] = TokenBucket(*self._bucket_chat)
+        return self._buckets[chat_id]
+
+    def _siguiente(self):
+        """Primer mensaje listo para salir y, si no hay, cuánto esperar"""
+        ahora = time.monotonic()
+        espera = None
+        for k, m in self._outbox.items():
+            falta = max(m["listo"] - ahora, self._bucket(k[0]).espera(), self._global.espera())
+            if falta <= 0:
+                return k, 0.0
+            espera = falta if espera is None else min(espera, falta)
+        return None, espera
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                k, espera = self._siguiente()
+                if k is None:
+                    self._cond.wait(timeout=espera)
+                    continue
+                m = self._outbox.pop(k)
+                self._bucket(k[0]).consumir()
+                self._global.consumir()
+
+            chat_id, clave = k
+            texto = "\n".join(m["lineas"])
+            try:
+                self.transport.enviar(chat_id, texto)
+                self.enviados += 1
+                with self._cond:
+                    previo = self._enviados.get(k)
+                    lineas = {firma(l) for l in m["lineas"]}
+                    if previo and time.monotonic() - previo[0] < self.ventana_incidente:
+                        lineas |= previo[1]
+                    self._enviados[k] = (time.monotonic(), lineas)
+                    # Olvidar incidentes cuya ventana ya venció
+                    for viejo in [x for x, (ts, _) in self._enviados.items()
+                                  if time.monotonic() - ts > self.ventana_incidente]:
+                        del self._enviados[viejo]
+                print("✈️ Telegram Enviado.")
+            except TelegramRateLimit as e:
+                self._reencolar(k, m, time.monotonic() + e.retry_after)
+            except Exception as e:
+                self.errores += 1
+                m["intentos"] += 1
+                if m["intentos"] <= self.max_reintentos:
+                    self._reencolar(k, m, time.monotonic() + 2 ** m["intentos"])
+                else:
+                    print(f"❌ Error Telegram: {e}")
+
+    def _reencolar(self, k, m, listo):
+        with self._cond:
+            pendiente = self._outbox.get(k)
+            if pendiente:
+                # Llegaron alertas nuevas del mismo incidente mientras tanto: se fusionan
+                pendiente["lineas"] = m["lineas"] + [l for l in pendiente["lineas"] if l not in m["lineas"]]
+            else:
+                self._outbox[k] = m
+                self._outbox.move_to_end(k, last=False)
+            self._outbox[k]["listo"] = listo
+            self._cond.notify()
@@ -0,0 +1,98 @@
+"""Primitivas para pipelines por etapas: colas 'último gana' y métricas por etapa."""
+import threading
+import time
+from collections import deque
+
+
+class LatestQueue:
+    """Cola acotada donde el elemento más nuevo desplaza al más viejo (nunca bloquea al productor)"""
+
+    def __init__(self, maxsize=1):
+        self._items = deque()
+        self._maxsize = maxsize
+        self._cond = threading.Condition()
+        self.descartados = 0
+
+    def put(self, item):
+        with self._cond:
+            if len(self._items) >= self._maxsize:
+                self._items.popleft()
+                self.descartados += 1
+            self._items.append(item)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """Devuelve el siguiente elemento o None si vence el timeout"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items, timeout=timeout):
+                return None
+            return self._items.popleft()
+
+    def qsize(self):
+        with self._cond:
+            return len(self._items)
+
+
+class StageStats:
+    """FPS y latencia media de una etapa del pipeline (ventana deslizante)"""
+
+    def __init__(self, nombre, ventana=2.0):
+        self.nombre = nombre
+        self.ventana = ventana
+        self._marcas = deque()
+        self._lock = threading.Lock()
+        self.total = 0
+        self.latencia_media = 0.0
+
+    def tick(self, latencia=None):
+        ahora = time.monotonic()
+        with self._lock:
+            self._marcas.append(ahora)
+            while self._marcas and ahora - self._marcas[0] > self.ventana:
+                self._marcas.popleft()
+            self.total += 1
+            if latencia is not None:
+                # Media exponencial para no guardar historia
+                self.latencia_media = 0.9 * self.latencia_media + 0.1 * latencia
+
+    def fps(self):
+        ahora = time.monotonic()
+        with self._lock:
+            while self._marcas and ahora - self._marcas[0] > self.ventana:
+                self._marcas.popleft()
+            return len(self._marcas) / self.ventana
+
+    def resumen(self, cola=None):
+        txt = f"{self.nombre}: {self.fps():4.1f} FPS | {self.latencia_media * 1000:5.1f} ms"
+        if cola is not None:
+            txt += f" | cola {cola.qsize()} | descartes {cola.descartados}"
+        return txt
+
+
+class Fases:
+    """Cronometraje del arranque de un proceso: duración de cada fase (pueden correr en paralelo) e hitos"""
+
+    def __init__(self, t0=None):
+        self.t0 = t0 or time.monotonic()
+        self.duraciones = {}  # fase -> s
+        self.hitos = {}  # hito -> s desde t0
+        self._lock = threading.Lock()
+
+    def medir(self, fase, fn, *args, **kwargs):
+        t = time.monotonic()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self.duraciones[fase] = time.monotonic() - t
+
+    def marcar(self, hito):
+        with self._lock:
+            self.hitos[hito] = time.monotonic() - self.t0
+        return self.hitos[hito]
+
+    def resumen(self):
+        with self._lock:
+            partes = [f"{f} {d:.2f}s" for f, d in self.duraciones.items()]
+            partes += [f"{h} @{t:.2f}s" for h, t in self.hitos.items()]
+        return " | ".join(partes)
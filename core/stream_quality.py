@@ -0,0 +1,104 @@
+"""Calidad adaptativa del stream JPEG: fps, calidad y resolución según lo que consumen los visores."""
+import os
+import time
+
+import cv2
+
+
+class Codificador:
+    """JPEG con libjpeg-turbo (PyTurboJPEG) si está instalado; si no, OpenCV"""
+
+    def __init__(self, usar_turbo=None):
+        usar_turbo = os.getenv("SERPIENTE_TURBOJPEG", "1") != "0" if usar_turbo is None else usar_turbo
+        self.turbo = None
+        if usar_turbo:
+            try:
+                from turbojpeg import TurboJPEG, TJSAMP_420
+                self.turbo = TurboJPEG()
+                self._submuestreo = TJSAMP_420
+            except (ImportError, OSError):
+                # Falta el paquete o la librería nativa libjpeg-turbo
+                self.turbo = None
+        self.nombre = "turbojpeg" if self.turbo else "opencv"
+
+    def codificar(self, frame, calidad):
+        if self.turbo:
+            return self.turbo.encode(frame, quality=calidad, jpeg_subsample=self._submuestreo)
+        _, buffer = cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), calidad])
+        return buffer
+
+
+class ControlCalidad:
+    """
+    Controlador por cámara alimentado por el feedback de los servidores de stream
+    ({"fps": consumo real del visor más rápido, "fps_pedido": tope pedido por los visores}):
+    - fps objetivo: lo que los visores piden y realmente alcanzan a consumir (no se codifica de más).
+    - Si el visor más rápido consume bastante menos de lo que se le entrega, su enlace está saturado:
+      se baja calidad y, llegado el piso, resolución (menos bytes por frame).
+    - Si consume al ritmo entregado, se recupera calidad y resolución de a poco.
+    Sin feedback reciente vuelve a los valores por defecto.
+    """
+
+    def __init__(self, fps_defecto=15.0, calidad=60, calidad_min=35, calidad_max=80,
+                 escalas=(1.0, 0.75, 0.5), vigencia=5.0):
+        self.fps_defecto = fps_defecto
+        self.calidad_defecto = calidad
+        self.calidad_min = calidad_min
+        self.calidad_max = calidad_max
+        self.escalas = escalas
+        self.vigencia = vigencia
+
+        self.ultimo_envio = 0.0
+        self._restablecer()
+
+    def _restablecer(self):
+        self.fps = self.fps_defecto
+        self.calidad = self.calidad_defecto
+        self.i_escala = 0
+        self.ultimo_feedback = 0.0
+        self.entregados = 0  # Frames codificados desde el último feedback
+
+    @property
+    def escala(self):
+        return self.escalas[self.i_escala]
+
+    def toca_codificar(self):
+        """Respeta el fps objetivo: un frame se salta si el anterior salió hace menos de 1/fps"""
+        ahora = time.monotonic()
+        if self.ultimo_feedback and ahora - self.ultimo_feedback > self.vigencia:
+            self._restablecer()
+        if ahora - self.ultimo_envio < 1.0 / self.fps:
+            return False
+        self.ultimo_envio = ahora
+        self.entregados += 1
+        return True
+
+    def feedback(self, datos):
+        ahora = time.monotonic()
+        dt = ahora - self.ultimo_feedback if self.ultimo_feedback else None
+        self.ultimo_feedback = ahora
+        entregado = self.entregados / dt if dt else None
+        self.entregados = 0
+
+        consumo = float(datos.get("fps", 0.0))
+        pedido = float(datos.get("fps_pedido", self.fps_defecto))
+        # No producir más de lo pedido, ni mucho más de lo que el visor más rápido alcanza a llevarse
+        self.fps = max(1.0, min(pedido, consumo * 1.25 + 1.0) if consumo else pedido)
+
+        if entregado is None or entregado < 1.0:
+            return
+        if consumo < 0.8 * entregado:
+            # Enlace saturado: menos bytes por frame
+            if self.calidad > self.calidad_min:
+                self.calidad = max(self.calidad_min, self.calidad - 10)
+            elif self.i_escala < len(self.escalas) - 1:
+                self.i_escala += 1
+        elif consumo >= 0.95 * entregado:
+            # Holgura: primero se recupera resolución, después calidad
+            if self.i_escala > 0 and self.calidad >= self.calidad_defecto:
+                self.i_escala -= 1
+            elif self.calidad < self.calidad_max:
+                self.calidad = min(self.calidad_max, self.calidad + 2)
+
+    def resumen(self):
+        return f"[STREAM] {self.fps:4.1f} FPS | Q{self.calidad} | escala {self.escala:.2f}"
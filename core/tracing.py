@@ -0,0 +1,180 @@
+"""
+Trazas de latencia entre agentes: histogramas por etapa estilo HDR (error relativo < 1% en todo el rango)
+y exportación en formato de texto Prometheus.
+
+Cada frame nace con un trace_id y un timestamp monotónico de captura (time.monotonic es común a todos
+los procesos del equipo), que viajan en la Percepcion y en la Orden hasta el interlock del ejecutor.
+"""
+import threading
+import time
+import uuid
+
+import zmq
+
+from core.bus import PUERTO_METRICAS, crear_push
+
+# Límites (s) de los buckets que se exponen a Prometheus; internamente la resolución es mucho más fina
+BUCKETS_PROMETHEUS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0)
+CUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+
+_SESION = uuid.uuid4().hex[:6]
+
+
+def nuevo_trace(*partes):
+    """ID de traza: sesión del proceso + partes (cámara, secuencia)"""
+    return ":".join([_SESION, *map(str, partes)])
+
+
+class Histograma:
+    """
+    Histograma log-lineal en microsegundos (como HdrHistogram): 2^bits sub-buckets por potencia de 2,
+    memoria fija y registro O(1). Con bits=8 el error relativo de cualquier percentil es < 0.8%.
+    """
+
+    def __init__(self, bits=8, maximo_s=60.0):
+        self.bits = bits
+        self.mitad = 1 << (bits - 1)
+        self.maximo_us = int(maximo_s * 1e6)
+        self.cuentas = [0] * (self._indice(self.maximo_us) + 1)
+        self.n = 0
+        self.suma = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def _indice(self, us):
+        e = max(0, us.bit_length() - self.bits)
+        return e * self.mitad + (us >> e)
+
+    def _valor(self, i):
+        """Límite superior (us) del bucket i"""
+        e = max(0, i // self.mitad - 1)
+        return ((i - e * self.mitad + 1) << e) - 1
+
+    def registrar(self, segundos):
+        if segundos < 0:
+            return
+        us = min(int(segundos * 1e6), self.maximo_us)
+        with self._lock:
+            self.cuentas[self._indice(us)] += 1
+            self.n += 1
+            self.suma += segundos
+            self.max = max(self.max, segundos)
+
+    def percentil(self, p):
+        """Percentil p (0..100) en segundos"""
+        with self._lock:
+            if not self.n:
+                return 0.0
+            objetivo = max(1, int(round(p / 100.0 * self.n)))
+            acumulado = 0
+            for i, c in enumerate(self.cuentas):
+                acumulado += c
+                if acumulado >= objetivo:
+                    return min(self._valor(i) / 1e6, self.max)
+        return self.max
+
+    def acumulado_hasta(self, segundos):
+        """Cuántas muestras son <= segundos (para los buckets 'le' de Prometheus)"""
+        us = min(int(segundos * 1e6), self.maximo_us)
+        limite = self._indice(us)
+        if self._valor(limite) > us:
+            limite -= 1  # El bucket del límite también tiene valores mayores: no se cuenta
+        with self._lock:
+            return sum(self.cuentas[:limite + 1])
+
+    def to_dict(self):
+        with self._lock:
+            return {"n": self.n, "suma": self.suma, "max": self.max, "bits": self.bits,
+                    "cuentas": {i: c for i, c in enumerate(self.cuentas) if c}}
+
+    @classmethod
+    def from_dict(cls, datos):
+        h = cls(bits=datos.get("bits", 8))
+        for i, c in datos["cuentas"].items():
+            h.cuentas[int(i)] = c
+        h.n, h.suma, h.max = datos["n"], datos["suma"], datos["max"]
+        return h
+
+    def resumen(self):
+        return (f"n={self.n} | p50 {self.percentil(50) * 1000:.1f}ms | p99 {self.percentil(99) * 1000:.1f}ms | "
+                f"max {self.max * 1000:.1f}ms")
+
+
+class Trazador:
+    """
+    Histogramas por etapa de un agente. Con un contexto ZMQ, publica cada 'periodo' segundos la foto
+    acumulada de todos sus histogramas al servidor de métricas (PUSH sin bloqueo: si no hay nadie, se descarta).
+    """
+
+    def __init__(self, agente, context=None, periodo=2.0):
+        self.agente = agente
+        self.etapas = {}
+        self._lock = threading.Lock()
+        if context is not None:
+            self.socket = crear_push(context, PUERTO_METRICAS, host="localhost", hwm=4)
+            threading.Thread(target=self._publicar, args=(periodo,), daemon=True, name=f"metricas-{agente}").start()
+
+    def histograma(self, etapa):
+        with self._lock:
+            if etapa not in self.etapas:
+                self.etapas[etapa] = Histograma()
+            return self.etapas[etapa]
+
+    def agregar(self, etapa, histograma):
+        """Adopta un histograma que mantiene otro componente (p. ej. el escritor de BD)"""
+        with self._lock:
+            self.etapas[etapa] = histograma
+
+    def registrar(self, etapa, segundos):
+        self.histograma(etapa).registrar(segundos)
+
+    def desde(self, etapa, t0_mono):
+        """Registra el tiempo transcurrido desde un timestamp monotónico (p. ej. el de captura del frame)"""
+        if t0_mono:
+            self.registrar(etapa, time.monotonic() - t0_mono)
+
+    def instantanea(self):
+        with self._lock:
+            etapas = dict(self.etapas)
+        return {"agente": self.agente, "ts": time.time(), "etapas": {e: h.to_dict() for e, h in etapas.items()}}
+
+    def resumen(self):
+        with self._lock:
+            etapas = dict(self.etapas)
+        return " | ".join(f"{e} p99 {h.percentil(99) * 1000:.1f}ms" for e, h in etapas.items() if h.n)
+
+    def _publicar(self, periodo):
+        while True:
+            time.sleep(periodo)
+            try:
+                self.socket.send_json(self.instantanea(), zmq.NOBLOCK)
+            except zmq.Again:
+                pass
+
+
+def prometheus(instantaneas):
+    """Texto de exposición Prometheus para las fotos de histogramas de cada agente"""
+    lineas = [
+        "# HELP serpiente_latencia_segundos Latencia por etapa del pipeline (histograma).",
+        "# TYPE serpiente_latencia_segundos histogram",
+    ]
+    cuantiles = [
+        "# HELP serpiente_latencia_cuantil_segundos Cuantiles de latencia por etapa (resolución HDR).",
+        "# TYPE serpiente_latencia_cuantil_segundos gauge",
+    ]
+    for foto in instantaneas:
+        for etapa, datos in sorted(foto["etapas"].items()):
+            h = Histograma.from_dict(datos)
+            etiquetas = f'agente="{foto["agente"]}",etapa="{etapa}"'
+            for limite in BUCKETS_PROMETHEUS:
+                lineas.append(f'serpiente_latencia_segundos_bucket{{{etiquetas},le="{limite}"}} '
+                              f'{h.acumulado_hasta(limite)}')
+            lineas.append(f'serpiente_latencia_segundos_bucket{{{etiquetas},le="+Inf"}} {h.n}')
+            lineas.append(f"serpiente_latencia_segundos_sum{{{etiquetas}}} {h.suma:.6f}")
+            lineas.append(f"serpiente_latencia_segundos_count{{{etiquetas}}} {h.n}")
+            for q in CUANTILES:
+                cuantiles.append(f'serpiente_latencia_cuantil_segundos{{{etiquetas},quantile="{q}"}} '
+                                 f'{h.percentil(q * 100):.6f}')
+            cuantiles.append(f'serpiente_latencia_cuantil_segundos{{{etiquetas},quantile="1"}} {h.max:.6f}')
+    return "\n".join(lineas + cuantiles) + "\n"
@@ -0,0 +1,133 @@
+"""Tracker multi-persona por centroide + IoU con IDs estables."""
+import bisect
+import itertools
+import math
+
+CLASE_PERSONA = 0
+CLASE_CELULAR = 67
+
+
+def iou(a, b):
+    """Intersección sobre unión de dos cajas (x1, y1, x2, y2)"""
+    ix = min(a[2], b[2]) - max(a[0], b[0])
+    iy = min(a[3], b[3]) - max(a[1], b[1])
+    if ix <= 0 or iy <= 0:
+        return 0.0
+    inter = ix * iy
+    area_a = (a[2] - a[0]) * (a[3] - a[1])
+    area_b = (b[2] - b[0]) * (b[3] - b[1])
+    return inter / float(area_a + area_b - inter)
+
+
+def centro(caja):
+    return (caja[0] + caja[2]) / 2.0, (caja[1] + caja[3]) / 2.0
+
+
+class Track:
+    """Persona seguida entre frames"""
+
+    def __init__(self, track_id, caja, ts):
+        self.id = track_id
+        self.caja = caja
+        self.cx, self.cy = centro(caja)
+        self.creado_ts = ts
+        self.visto_ts = ts
+        self.celular = False
+
+    def actualizar(self, caja, ts):
+        self.caja = caja
+        self.cx, self.cy = centro(caja)
+        self.visto_ts = ts
+
+    def to_dict(self):
+        x1, y1, x2, y2 = self.caja
+        return {"id": self.id, "x": int(self.cx), "y": int(self.cy),
+                "caja": [int(x1), int(y1), int(x2), int(y2)], "celular": self.celular}
+
+
+class CentroidTracker:
+    """
+    Asociación detección-track por centroide e IoU.
+    Los tracks se indexan ordenados por x, así cada detección solo revisa los tracks dentro de
+    su radio de búsqueda (bisect): O((n + m) log n + k log k) con k = pares candidatos.
+    """
+
+    def __init__(self, max_dist=80, max_ausencia=1.0):
+        self.max_dist = max_dist  # Radio mínimo de búsqueda (px)
+        self.max_ausencia = max_ausencia  # Segundos sin ver un track antes de olvidarlo
+        self.tracks = {}
+        self._ids = itertools.count(1)
+
+    def actualizar(self, detecciones, ts):
+        """
+        detecciones: [(cls, x1, y1, x2, y2[, conf]), ...] del frame actual.
+        Devuelve los tracks visibles en este frame (con el flag de celular ya asociado).
+        """
+        personas = [tuple(d[1:5]) for d in detecciones if d[0] == CLASE_PERSONA]
+        celulares = [tuple(d[1:5]) for d in detecciones if d[0] == CLASE_CELULAR]
+
+        # 1. Índice de tracks existentes ordenado por x
+        existentes = sorted(self.tracks.values(), key=lambda t: t.cx)
+        xs = [t.cx for t in existentes]
+
+        # 2. Pares candidatos dentro del radio de cada detección
+        candidatos = []
+        for di, caja in enumerate(personas):
+            cx, cy = centro(caja)
+            radio = max(self.max_dist, (caja[2] - caja[0]) / 2.0)
+            lo = bisect.bisect_left(xs, cx - radio)
+            hi = bisect.bisect_right(xs, cx + radio)
+            for t in existentes[lo:hi]:
+                dist = math.hypot(t.cx - cx, t.cy - cy)
+                if dist <= radio:
+                    costo = dist / radio - iou(t.caja, caja)
+                    candidatos.append((costo, di, t.id))
+
+        # 3. Asignación voraz por costo creciente
+        candidatos.sort()
+        asignadas, usados = {}, set()
+        for _, di, tid in candidatos:
+            if di in asignadas or tid in usados:
+                continue
+            asignadas[di] = tid
+            usados.add(tid)
+
+        visibles = []
+        for di, caja in enumerate(personas):
+            tid = asignadas.get(di)
+            if tid is None:
+                t = Track(next(self._ids), caja, ts)
+                self.tracks[t.id] = t
+            else:
+                t = self.tracks[tid]
+                t.actualizar(caja, ts)
+            t.celular = False
+            visibles.append(t)
+
+        # 4. Olvidar tracks ausentes demasiado tiempo
+        for tid in [tid for tid, t in self.tracks.items() if ts - t.visto_ts > self.max_ausencia]:
+            del self.tracks[tid]
+
+        self._asociar_celulares(visibles, celulares)
+        return visibles
+
+    @staticmethod
+    def _asociar_celulares(visibles, celulares):
+        """Cada celular se asigna a la persona visible más cercana"""
+        if not visibles:
+            return
+        orden = sorted(visibles, key=lambda t: t.cx)
+        xs = [t.cx for t in orden]
+        for caja in celulares:
+            cx, cy = centro(caja)
+            i = bisect.bisect_left(xs, cx)
+            mejor, mejor_d = None, float("inf")
+            # Expandimos hacia ambos lados hasta que la distancia en x ya no pueda mejorar
+            for rango in (range(i, len(orden)), range(i - 1, -1, -1)):
+                for j in rango:
+                    if abs(xs[j] - cx) >= mejor_d:
+                        break
+                    d = math.hypot(orden[j].cx - cx, orden[j].cy - cy)
+                    if d < mejor_d:
+                        mejor, mejor_d = orden[j], d
+            mejor.celular = True
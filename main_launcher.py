@@ -1,71 +1,295 @@
 import subprocess
+import threading
+import socket
 import time
 import sys
 import os
+import urllib.request
+
+try:
+    import psutil  # Opcional: afinidad/prioridad en Windows y muestreo de CPU/memoria más preciso
+except ImportError:
+    psutil = None
+
+from core.bus import PUERTO_PERCEPCION, PUERTO_TELEMETRIA, PUERTO_MAQUINA
 
 project_root = os.getcwd()
 env = os.environ.copy()
 env["PYTHONPATH"] = project_root
+env["PYTHONUNBUFFERED"] = "1"
 if sys.platform == "win32":
     env["PYTHONPATH"] = project_root + ";" + env.get("PYTHONPATH", "")
 
-commands = [
+
+# --- SONDAS DE DISPONIBILIDAD ---
+# Un agente está listo cuando su puerto ZMQ está enlazado (el detector lo enlaza con cámaras abiertas y el modelo
+# ya calentado) o cuando su servidor HTTP responde; así el arranque no depende de esperas fijas.
+
+def sonda_puerto(puerto):
+    def sonda():
+        with socket.socket() as s:
+            s.settimeout(0.5)
+            return s.connect_ex(("127.0.0.1", puerto)) == 0
+    return sonda
+
+
+def sonda_http(url):
+    def sonda():
+        try:
+            with urllib.request.urlopen(url, timeout=1.0) as r:
+                return r.status < 500
+        except Exception:
+            return False
+    return sonda
+
+
+# --- PLAN DE CPU ---
+
+def cpus_por_defecto():
+    """Inferencia en núcleos dedicados (la mitad alta); el resto comparte la mitad baja"""
+    n = os.cpu_count() or 1
+    if n < 4:
+        return {}
+    todos = list(range(n))
+    return {"detector": todos[n // 2:], "otros": todos[:n // 2]}
+
+
+def cpus_de(nombre, plan):
+    valor = os.getenv(f"SERPIENTE_CPUS_{nombre.upper()}")
+    if valor:
+        return [int(c) for c in valor.split(",") if c.strip()]
+    return plan.get(nombre, plan.get("otros"))
+
+
+class Servicio:
+    def __init__(self, nombre, cmd, sonda, depende=(), timeout_listo=30.0, nice=0):
+        self.nombre = nombre
+        self.cmd = cmd
+        self.sonda = sonda
+        self.depende = depende
+        self.timeout_listo = timeout_listo
+        self.nice = int(os.getenv(f"SERPIENTE_NICE_{nombre.upper()}", nice))
+        self.cpus = None
+
+        self.proceso = None
+        self.listo = threading.Event()
+        self.reinicios = 0
+        self.t_arranque = 0.0
+        self.t_listo = None  # Segundos hasta estar listo en el último arranque
+        self._cpu_previo = None
+
+
+# Orden por dependencias: cada agente arranca apenas sus dependencias están listas (en paralelo con el resto).
+# Los sockets ZMQ reconectan solos, así que solo se declaran dependencias reales de funcionamiento.
+servicios = [
     # 1. Backend Web
-    [sys.executable, "backend/app.py"],
+    Servicio("backend", [sys.executable, "backend/app.py"], sonda_http("http://127.0.0.1:5000/api/live"), nice=10),
 
-    # 2.A. Agente 1 PARTE A: Detector (YOLO + Cámara + ZMQ)
-    [sys.executable, "agents/agent_1_detector.py"],
+    # 2.A. Agente 1 PARTE A: Detector (YOLO + Cámara + ZMQ). Sin caché ONNX la carga de torch domina el arranque.
+    Servicio("detector", [sys.executable, "agents/agent_1_detector.py"], sonda_puerto(PUERTO_PERCEPCION),
+             timeout_listo=180.0),
 
-    # 2.B. Agente 1 PARTE B: Streamer (Flask + ZMQ)
-    [sys.executable, "agents/agent_1_streamer.py"],
+    # 2.B. Agente 1 PARTE B: Streamer asyncio (MJPEG + eventos SSE de telemetría)
+    Servicio("stream", [sys.executable, "backend/stream_server.py"], sonda_http("http://127.0.0.1:5001/status"),
+             nice=5),
 
     # 3. Agente 2: Cerebro
-    [sys.executable, "agents/agent_2_brain.py"],
+    Servicio("cerebro", [sys.executable, "agents/agent_2_brain.py"], sonda_puerto(PUERTO_TELEMETRIA)),
 
-    # 4. Agente 3: Ejecutor
-    [sys.executable, "agents/agent_3_notifier.py"]
+    # 4. Agente 3: Ejecutor (recibe órdenes del Cerebro: arranca con el Cerebro ya escuchando)
+    Servicio("ejecutor", [sys.executable, "agents/agent_3_notifier.py"], sonda_puerto(PUERTO_MAQUINA),
+             depende=("cerebro",)),
 ]
 
-# ... (El resto del código de launch_system y stop_system queda IGUAL)
-# Solo asegúrate de copiar el resto del archivo anterior o déjalo como estaba si ya lo tenías.
-# Aquí repito la función launch para que no te pierdas:
 
-processes = []
+class Supervisor:
+    """
+    Arranque en paralelo ordenado por dependencias, sondas de disponibilidad, reinicio con backoff
+    exponencial, afinidad de CPU / prioridad por agente y muestreo periódico de CPU y memoria.
+    """
 
+    def __init__(self, servicios, backoff_base=1.0, backoff_max=60.0, estable=30.0, muestreo=10.0):
+        self.servicios = {s.nombre: s for s in servicios}
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.estable = estable  # Un proceso que vivió esto sin caerse reinicia el backoff
+        self.muestreo = muestreo
+        self.parada = threading.Event()
+        self._lock = threading.Lock()  # Evita lanzar un proceso mientras se apaga todo
 
-def launch_system():
-    print(f"🚀 [SISTEMA INDUSTRIAL] Inicializando Arquitectura Desacoplada...")
-    print(f"📂 Root: {project_root}")
-    print("-------------------------------------------------------")
+        plan = cpus_por_defecto()
+        for s in servicios:
+            s.cpus = cpus_de(s.nombre, plan)
 
-    for cmd in commands:
+    # --- PROCESOS ---
+
+    def _aplicar_plan(self, servicio):
+        """
+        Afinidad y prioridad aplicadas desde el padre justo después del spawn (sin preexec_fn, que no es seguro
+        con hilos). El hijo todavía está arrancando el intérprete: los hilos que cree después las heredan.
+        """
+        if not (servicio.cpus or servicio.nice):
+            return
+        pid = servicio.proceso.pid
         try:
-            p = subprocess.Popen(cmd, env=env, shell=False)
-            processes.append(p)
-            print(f"✅ Proceso Iniciado: {cmd[1]}")
-            time.sleep(1.0)
-        except Exception as e:
-            print(f"❌ Error: {e}")
+            if sys.platform != "win32":
+                if servicio.cpus and hasattr(os, "sched_setaffinity"):
+                    os.sched_setaffinity(pid, servicio.cpus)
+                if servicio.nice:
+                    os.setpriority(os.PRIO_PROCESS, pid, servicio.nice)
+            elif psutil is not None:
+                p = psutil.Process(pid)
+                if servicio.cpus:
+                    p.cpu_affinity(servicio.cpus)
+                if servicio.nice > 0:
+                    p.nice(psutil.BELOW_NORMAL_PRIORITY_CLASS)
+        except Exception as e:  # OSError, o psutil.Error en Windows
+            print(f"⚠️ [SUPERVISOR] {servicio.nombre}: no se pudo fijar afinidad/prioridad ({e})")
 
-    print("-------------------------------------------------------")
-    print("✨ SISTEMA 100% OPERATIVO. (Ctrl+C para salir)")
+    def _lanzar(self, servicio):
+        """Devuelve False si el sistema se está apagando"""
+        env_hijo = dict(env)
+        if servicio.nombre == "detector" and servicio.cpus and "SERPIENTE_HILOS" not in env_hijo:
+            # Los hilos de inferencia coinciden con los núcleos dedicados
+            env_hijo["SERPIENTE_HILOS"] = str(len(servicio.cpus))
+        with self._lock:
+            if self.parada.is_set():
+                return False
+            servicio.listo.clear()
+            servicio.t_arranque = time.monotonic()
+            servicio.proceso = subprocess.Popen(servicio.cmd, env=env_hijo, shell=False)
+        self._aplicar_plan(servicio)
+        cpus = f" | CPUs {servicio.cpus}" if servicio.cpus else ""
+        print(f"✅ [SUPERVISOR] Proceso Iniciado: {servicio.nombre} ({servicio.cmd[1]}, "
+              f"pid {servicio.proceso.pid}{cpus})")
+        return True
 
+    def _esperar_listo(self, servicio):
+        limite = servicio.t_arranque + servicio.timeout_listo
+        while not self.parada.is_set() and time.monotonic() < limite:
+            if servicio.proceso.poll() is not None:
+                return False
+            if servicio.sonda():
+                servicio.t_listo = time.monotonic() - servicio.t_arranque
+                servicio.listo.set()
+                print(f"🟢 [SUPERVISOR] {servicio.nombre} listo en {servicio.t_listo:.1f}s")
+                return True
+            self.parada.wait(0.1)
+        return False
 
-def stop_system():
-    print("\n🛑 Apagando...")
-    for p in processes:
+    def _detener(self, servicio):
+        p = servicio.proceso
+        if p is None or p.poll() is not None:
+            return
         try:
             if sys.platform == "win32":
                 subprocess.call(['taskkill', '/F', '/T', '/PID', str(p.pid)])
             else:
                 p.terminate()
-        except:
+                p.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            p.kill()
+        except Exception:
             pass
 
+    def _ciclo(self, servicio):
+        """Vida completa de un agente: dependencias -> arranque -> sonda -> vigilancia -> reinicio"""
+        for dep in servicio.depende:
+            while not self.parada.is_set() and not self.servicios[dep].listo.wait(timeout=0.5):
+                pass
+
+        intentos = 0
+        while self._lanzar(servicio):
+            if self._esperar_listo(servicio):
+                while not self.parada.is_set() and servicio.proceso.poll() is None:
+                    self.parada.wait(0.5)
+            elif servicio.proceso.poll() is None and not self.parada.is_set():
+                print(f"⏱️ [SUPERVISOR] {servicio.nombre} no respondió en {servicio.timeout_listo:.0f}s")
+                self._detener(servicio)
+            servicio.listo.clear()
+            if self.parada.is_set():
+                break
+
+            # Caída: reinicio con backoff exponencial (se reinicia si el proceso había estado estable)
+            vivio = time.monotonic() - servicio.t_arranque
+            intentos = 0 if vivio > self.estable else intentos + 1
+            espera = min(self.backoff_max, self.backoff_base * 2 ** intentos)
+            servicio.reinicios += 1
+            print(f"❌ [SUPERVISOR] {servicio.nombre} terminó (código {servicio.proceso.returncode}, "
+                  f"vivió {vivio:.0f}s). Reinicio #{servicio.reinicios} en {espera:.1f}s")
+            self.parada.wait(espera)
+
+    # --- MÉTRICAS ---
+
+    def _uso(self, servicio):
+        """(cpu %, memoria MB) del proceso desde la muestra anterior, o None si no se puede medir"""
+        pid = servicio.proceso.pid
+        ahora = time.monotonic()
+        try:
+            if psutil:
+                p = psutil.Process(pid)
+                procesos = [p] + p.children(recursive=True)
+                cpu = sum(sum(x.cpu_times()[:2]) for x in procesos)
+                rss = sum(x.memory_info().rss for x in procesos)
+            elif os.path.exists(f"/proc/{pid}/stat"):
+                with open(f"/proc/{pid}/stat") as f:
+                    campos = f.read().rsplit(")", 1)[1].split()
+                cpu = (int(campos[11]) + int(campos[12])) / os.sysconf("SC_CLK_TCK")
+                with open(f"/proc/{pid}/statm") as f:
+                    rss = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+            else:
+                return None
+        except Exception:
+            return None
+        previo, servicio._cpu_previo = servicio._cpu_previo, (ahora, cpu)
+        if previo is None or ahora <= previo[0]:
+            return None
+        return 100.0 * (cpu - previo[1]) / (ahora - previo[0]), rss / 1e6
+
+    def _muestrear(self):
+        while not self.parada.wait(self.muestreo):
+            partes = []
+            for s in self.servicios.values():
+                if s.proceso is None:
+                    partes.append(f"{s.nombre} ⏳")
+                    continue
+                if s.proceso.poll() is not None:
+                    partes.append(f"{s.nombre} ⛔")
+                    continue
+                uso = self._uso(s)
+                estado = "🟢" if s.listo.is_set() else "🟡"
+                partes.append(f"{s.nombre} {estado} {uso[0]:.0f}% {uso[1]:.0f}MB" if uso else f"{s.nombre} {estado}")
+            print("📊 [SUPERVISOR] " + " | ".join(partes))
+
+    # --- ARRANQUE / PARADA ---
+
+    def iniciar(self):
+        print(f"🚀 [SISTEMA INDUSTRIAL] Inicializando Arquitectura Desacoplada...")
+        print(f"📂 Root: {project_root}")
+        print("-------------------------------------------------------")
+        t0 = time.monotonic()
+        for s in self.servicios.values():
+            threading.Thread(target=self._ciclo, args=(s,), daemon=True, name=f"sup-{s.nombre}").start()
+        threading.Thread(target=self._muestrear, daemon=True, name="sup-muestreo").start()
+
+        for s in self.servicios.values():
+            while not self.parada.is_set() and not s.listo.wait(timeout=0.5):
+                pass
+        print("-------------------------------------------------------")
+        print(f"✨ SISTEMA 100% OPERATIVO en {time.monotonic() - t0:.1f}s. (Ctrl+C para salir)")
+
+    def detener(self):
+        print("\n🛑 Apagando...")
+        with self._lock:
+            self.parada.set()
+        for s in self.servicios.values():
+            self._detener(s)
+
 
 if __name__ == "__main__":
+    supervisor = Supervisor(servicios)
     try:
-        launch_system()
+        supervisor.iniciar()
         while True: time.sleep(1)
     except KeyboardInterrupt:
-        stop_system()
\ No newline at end of file
+        supervisor.detener()
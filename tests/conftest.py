@@ -0,0 +1,40 @@
+import os
+import sys
+
+import pytest
+
+# Fix de rutas: los tests importan core/, agents/ y benchmarks/ como el resto del proyecto
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.join(RAIZ, "benchmarks"))
+
+from core.clock import RelojVirtual
+from core.config import GestorConfig
+from core.db_writer import DatabaseWriter
+from core.memory_db import MemoryClient
+from replay import SocketMemoria
+
+
+@pytest.fixture
+def cerebro(tmp_path):
+    """AgentBrain sin red ni BD real: sockets en memoria, reloj virtual y config por defecto"""
+    from agents.agent_2_brain import AgentBrain
+
+    db = MemoryClient()
+    sockets = {"ordenes": SocketMemoria(), "acks": SocketMemoria(), "telemetria": SocketMemoria()}
+    return AgentBrain(db=db, writer=DatabaseWriter(db, nombre="CEREBRO", journal_path=str(tmp_path / "c.jsonl")),
+                      sockets=sockets, reloj=RelojVirtual(), gestor_config=GestorConfig())
+
+
+@pytest.fixture
+def ejecutor(tmp_path):
+    """Fábrica de AgentExecutor con sockets en memoria y los actuadores que se le pasen"""
+    from agents.agent_3_notifier import AgentExecutor
+
+    def crear(actuadores=None):
+        db = MemoryClient()
+        return AgentExecutor(db=db, writer=DatabaseWriter(db, nombre="EJECUTOR",
+                                                          journal_path=str(tmp_path / "e.jsonl")),
+                             sockets={"acks": SocketMemoria(), "maquina": SocketMemoria()}, reloj=RelojVirtual(),
+                             efectos=False, gestor_config=GestorConfig(), actuadores=actuadores)
+    return crear
@@ -0,0 +1,118 @@
+import socket
+import threading
+import time
+
+from core.actuators import Actuadores, ModbusTCP, SimuladorModbus
+from core.tracing import Trazador
+
+INTERLOCK, SIRENA, ROJO, AMARILLO, VERDE = 0, 1, 2, 3, 4
+
+
+def esperar(condicion, timeout=3.0):
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        if condicion():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def confirmacion():
+    """Callback al_aplicar que guarda (ok, instante)"""
+    evento = threading.Event()
+    resultado = {}
+
+    def al_aplicar(ok):
+        resultado.update(ok=ok, t=time.monotonic())
+        evento.set()
+    return evento, resultado, al_aplicar
+
+
+def modbus(sim, **kwargs):
+    return ModbusTCP("127.0.0.1", sim.puerto, **kwargs)
+
+
+def test_interlock_no_espera_a_una_baliza_lenta():
+    # Cada bobina de la baliza tarda 0.5 s en el equipo: su escritura queda en vuelo mientras llega el interlock
+    sim = SimuladorModbus(0, demoras={ROJO: 0.5, AMARILLO: 0.5, VERDE: 0.5})
+    actuadores = Actuadores([modbus(sim)])
+    evento, resultado, al_aplicar = confirmacion()
+
+    actuadores.fijar("baliza", "amarillo")
+    time.sleep(0.05)
+    t0 = time.monotonic()
+    actuadores.pulso("interlock", True, 5.0, False, al_aplicar=al_aplicar)
+
+    assert evento.wait(2.0)
+    assert resultado["ok"]
+    assert resultado["t"] - t0 < 0.3
+    assert sim.bobinas[INTERLOCK] is True
+    assert sim.bobinas.get(VERDE) is None  # La baliza sigue en vuelo
+
+
+def test_pulso_vuelve_al_reposo():
+    sim = SimuladorModbus(0)
+    actuadores = Actuadores([modbus(sim)])
+    actuadores.pulso("interlock", True, 0.3, False)
+
+    assert esperar(lambda: sim.bobinas.get(INTERLOCK) is True)
+    assert actuadores.activo("interlock") is True
+    time.sleep(0.1)
+    assert sim.bobinas[INTERLOCK] is True
+    assert esperar(lambda: sim.bobinas[INTERLOCK] is False)
+    assert actuadores.activo("interlock") is None
+
+
+def test_pulso_nuevo_extiende_el_anterior():
+    sim = SimuladorModbus(0)
+    actuadores = Actuadores([modbus(sim)])
+    actuadores.pulso("interlock", True, 0.2, False)
+    time.sleep(0.15)
+    actuadores.pulso("interlock", True, 0.4, False)
+    time.sleep(0.2)
+    assert sim.bobinas[INTERLOCK] is True
+    assert esperar(lambda: sim.bobinas[INTERLOCK] is False)
+
+
+def test_baliza_enciende_un_solo_color():
+    sim = SimuladorModbus(0)
+    actuadores = Actuadores([modbus(sim)])
+    actuadores.fijar("baliza", "rojo")
+    assert esperar(lambda: len(sim.bobinas) == 3)
+    assert (sim.bobinas[ROJO], sim.bobinas[AMARILLO], sim.bobinas[VERDE]) == (True, False, False)
+
+
+def test_excepcion_modbus_confirma_fallo():
+    sim = SimuladorModbus(0, fallas={INTERLOCK})
+    traza = Trazador("prueba")
+    actuadores = Actuadores([modbus(sim)], traza=traza)
+    evento, resultado, al_aplicar = confirmacion()
+
+    actuadores.pulso("interlock", True, 1.0, False, al_aplicar=al_aplicar)
+    assert evento.wait(2.0)
+    assert resultado["ok"] is False
+    canal = next(c for c in actuadores.canales if c.senales == ("interlock",))
+    assert canal.fallos == 1
+    assert not any(e.startswith("interlock_") for e in traza.etapas)
+
+
+def test_equipo_caido_no_frena_a_las_demas_salidas():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        puerto_cerrado = s.getsockname()[1]
+    sim = SimuladorModbus(0)
+    actuadores = Actuadores([ModbusTCP("127.0.0.1", puerto_cerrado), modbus(sim)])
+    evento, resultado, al_aplicar = confirmacion()
+
+    actuadores.pulso("interlock", True, 1.0, False, al_aplicar=al_aplicar)
+    assert evento.wait(3.0)
+    # Una salida falló: la señal no cuenta como aplicada, pero la otra sí escribió su relé
+    assert resultado["ok"] is False
+    assert sim.bobinas[INTERLOCK] is True
+
+
+def test_sin_salidas_confirma_al_instante():
+    resultados = []
+    Actuadores([]).pulso("interlock", True, 1.0, False, al_aplicar=resultados.append)
+    assert resultados == [True]
+
@@ -0,0 +1,27 @@
+from core.bus import TIPO_ORDEN
+
+
+def _parada(cerebro):
+    cerebro.despachar(TIPO_ORDEN, 100.0, cerebro.reloj.ahora(), accion="PARADA_TOTAL", motivo="prueba")
+    return cerebro.cmd_seq
+
+
+def test_ack_confirma_orden_pendiente(cerebro):
+    seq = _parada(cerebro)
+    cerebro.acks_socket.cola.append({"seq": seq, "origen": cerebro.origen, "ts_ack": cerebro.reloj.ahora()})
+    cerebro.revisar_acks()
+    assert seq not in cerebro.pendientes
+
+
+def test_ack_de_otra_sesion_no_cancela_reintentos(cerebro):
+    seq = _parada(cerebro)
+    # Mismo seq, pero de un cerebro anterior (o ajeno): la PARADA_TOTAL sigue pendiente
+    cerebro.acks_socket.cola.append({"seq": seq, "origen": "viejo000", "ts_ack": cerebro.reloj.ahora()})
+    cerebro.revisar_acks()
+    assert seq in cerebro.pendientes
+
+    # ...y se reenvía al vencer el timeout del ACK
+    cerebro.reloj.dormir(cerebro.ack_timeout)
+    cerebro.revisar_acks()
+    reenvios = [o for o in cerebro.ordenes_socket.enviados if o["seq"] == seq]
+    assert len(reenvios) == 2
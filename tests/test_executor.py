@@ -0,0 +1,72 @@
+import time
+
+from core.actuators import Actuadores, Salida
+from core.bus import Orden, TIPO_ORDEN
+
+
+class SalidaFalla(Salida):
+    """Relé que falla las primeras 'fallas' escrituras del interlock"""
+    nombre = "falla"
+
+    def __init__(self, fallas=1):
+        self.fallas = fallas
+        self.escrituras = []
+
+    def aplicar(self, senal, valor):
+        if senal == "interlock" and valor and self.fallas:
+            self.fallas -= 1
+            raise IOError("relé sin respuesta")
+        self.escrituras.append((senal, valor))
+
+
+def parada(seq=1, origen="cerebro1"):
+    return Orden(seq=seq, origen=origen, tipo=TIPO_ORDEN, riesgo=95.0, ts=0.0, accion="PARADA_TOTAL",
+                 motivo="prueba", mono_captura=time.monotonic())
+
+
+def esperar(condicion, timeout=2.0):
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite and not condicion():
+        time.sleep(0.01)
+    return condicion()
+
+
+def test_parada_sin_actuadores_confirma(ejecutor):
+    ex = ejecutor()
+    ex.atender(parada())
+    assert [a["seq"] for a in ex.acks_socket.enviados] == [1]
+
+
+def test_ack_solo_cuando_el_rele_quedo_escrito(ejecutor):
+    salida = SalidaFalla(fallas=1)
+    ex = ejecutor(Actuadores([salida]))
+
+    ex.atender(parada())
+    # El relé falló: sin ACK, el cerebro debe reintentar
+    assert esperar(lambda: ("cerebro1", 1) in ex.ordenes_fallidas)
+    assert ex.acks_socket.enviados == []
+
+    # El reenvío del cerebro vuelve a ejecutar el interlock (no solo re-confirma)
+    ex.atender(parada())
+    assert esperar(lambda: len(ex.acks_socket.enviados) == 1)
+    assert ("interlock", True) in salida.escrituras
+    assert ex.traza.etapas["interlock"].n == 1
+
+    # Un reenvío ya confirmado solo se vuelve a confirmar
+    ex.atender(parada())
+    assert len(ex.acks_socket.enviados) == 2
+    assert salida.escrituras.count(("interlock", True)) == 1
+
+
+def test_reenvio_con_rele_en_vuelo_no_confirma(ejecutor):
+    class Lenta(Salida):
+        nombre = "lenta"
+
+        def aplicar(self, senal, valor):
+            time.sleep(0.3)
+
+    ex = ejecutor(Actuadores([Lenta()]))
+    ex.atender(parada())
+    ex.atender(parada())
+    assert ex.acks_socket.enviados == []
+    assert esperar(lambda: len(ex.acks_socket.enviados) == 1)
@@ -0,0 +1,50 @@
+import uuid
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+
+from core.frame_ring import FrameRing
+
+
+@pytest.fixture
+def anillo():
+    a = FrameRing.crear(f"serpiente_test_{uuid.uuid4().hex[:8]}", forma=(4, 6, 3), n_slots=2)
+    yield a
+    a.cerrar()
+
+
+def test_escribir_y_leer(anillo):
+    frame = np.full((4, 6, 3), 7, dtype=np.uint8)
+    slot = anillo.escribir(frame, seq=1, ts=10.0)
+    copia, seq, ts = anillo.leer(slot, seq=1)
+    assert (copia == frame).all() and (seq, ts) == (1, 10.0)
+    assert anillo.leer(slot, seq=2) is None
+
+
+def test_cerrar_con_vistas_vivas(anillo):
+    nombre = anillo.shm.name
+    anillo.escribir(np.zeros((4, 6, 3), dtype=np.uint8), seq=1, ts=0.0)
+    lector = FrameRing.abrir(nombre)
+    vista_lector, _, _, _ = lector.vista(0)
+    vista_creador, _, _, _ = anillo.vista(0)
+
+    # Ni el lector ni el creador fallan al cerrar con frames prestados todavía en uso: el mapeo sigue abierto
+    assert not lector.cerrar()
+    assert not anillo.cerrar()
+    assert vista_lector[1:].sum() == 0 and vista_creador.sum() == 0
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=nombre)
+
+    # Soltadas las vistas, el siguiente cerrar() libera el mapeo
+    del vista_lector, vista_creador
+    assert lector.cerrar() and anillo.cerrar()
+    assert lector.shm.buf is None and anillo.shm.buf is None
+
+
+def test_cerrar_sin_vistas_libera_el_mapeo():
+    a = FrameRing.crear(f"serpiente_test_{uuid.uuid4().hex[:8]}", forma=(4, 6, 3), n_slots=2)
+    a.escribir(np.zeros((4, 6, 3), dtype=np.uint8), seq=1, ts=0.0)
+    a.leer(0)  # Copia: no deja vistas prestadas
+    assert a.cerrar()
+    assert a.shm.buf is None
@@ -0,0 +1,40 @@
+import sqlite3
+
+import pytest
+
+from core.history import Historial
+
+
+@pytest.fixture
+def historial(tmp_path):
+    return Historial(str(tmp_path / "historia.db"), periodo=3600)
+
+
+def test_vaciar_con_error_no_pierde_deltas_ni_deja_transaccion(historial):
+    historial.telemetria({"ts": 1000.0, "camaras": {"cam0": 50.0}, "accion": "PARADA_TOTAL", "camara": "cam0"})
+
+    # Falla a mitad de la transacción (la tabla desaparece desde otra conexión)
+    otra = sqlite3.connect(historial.ruta)
+    otra.execute("ALTER TABLE rollup RENAME TO rollup_aparte")
+    otra.commit()
+    with pytest.raises(sqlite3.Error):
+        historial.vaciar()
+    assert not historial._con().in_transaction
+
+    # Llegan más eventos y la BD se recupera: se guarda todo, sin duplicar ni perder
+    historial.telemetria({"ts": 1010.0, "camaras": {"cam0": 90.0}, "accion": "PARADA_TOTAL", "camara": "cam0"})
+    otra.execute("ALTER TABLE rollup_aparte RENAME TO rollup")
+    otra.commit()
+    otra.close()
+    historial.vaciar()
+
+    total = historial.resumen(0, 2000)["camaras"]["cam0"]
+    assert total["riesgo_max"] == 90.0
+    assert total["riesgo_medio"] == 70.0
+    assert total["paradas"] == 1  # La segunda PARADA_TOTAL seguida no es una transición
+
+
+def test_serie_con_desfase_que_no_es_minuto_exacto(historial):
+    with pytest.raises(ValueError, match="múltiplo de 60"):
+        historial.serie(0, 86400, paso=3600, desfase=30)
+    assert historial.serie(0, 86400, paso=3600, desfase=1800)["resolucion"] == 60
@@ -0,0 +1,49 @@
+import threading
+import time
+
+from core.live_state import LiveState, maquina_desde_bd
+
+
+def test_fusionar_concurrente_no_pierde_campos():
+    estado = LiveState()
+    reemplazar = estado.actualizar
+
+    def actualizar_lento(*args):
+        time.sleep(0.0005)  # Agranda la ventana entre copiar la sección y reemplazarla
+        return reemplazar(*args)
+
+    estado.actualizar = actualizar_lento
+    n = 200
+
+    def fusionar(clave):
+        for i in range(n):
+            estado.fusionar("machine", {clave: i})
+
+    # Como el hilo del bus y el de respaldo de la BD en backend/app.py, cada uno con sus propios campos
+    hilos = [threading.Thread(target=fusionar, args=(clave,)) for clave in ("estado_operativo", "modo_mantenimiento")]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+
+    _, datos = estado.snapshot()
+    assert datos["machine"] == {"estado_operativo": n - 1, "modo_mantenimiento": n - 1}
+    assert estado.version == 2 * n
+
+
+def test_fila_atrasada_de_la_bd_no_pisa_el_estado_del_bus():
+    estado = LiveState()
+    fila = {"id": 1, "estado_operativo": "RUNNING", "modo_mantenimiento": False}
+    estado.fusionar("machine", maquina_desde_bd(estado, fila, silencio=5.0), del_bus=False)
+    assert estado.snapshot()[1]["machine"]["estado_operativo"] == "RUNNING"  # Sin bus todavía: manda la BD
+
+    # El Ejecutor publica la parada; la fila sigue en RUNNING mientras el write-behind no la vacía
+    estado.fusionar("machine", {"estado_operativo": "STOP"})
+    fila["modo_mantenimiento"] = True
+    estado.fusionar("machine", maquina_desde_bd(estado, fila, silencio=5.0), del_bus=False)
+    assert estado.snapshot()[1]["machine"] == {"estado_operativo": "STOP", "modo_mantenimiento": True}
+
+    # Con la sección en silencio más que 'silencio', la BD vuelve a mandar (p. ej. un rearme del operador)
+    estado.recibido["machine"] -= 10.0
+    estado.fusionar("machine", maquina_desde_bd(estado, fila, silencio=5.0), del_bus=False)
+    assert estado.snapshot()[1]["machine"]["estado_operativo"] == "RUNNING"
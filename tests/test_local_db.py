@@ -0,0 +1,31 @@
+import time
+
+from core.local_db import LocalClient
+
+
+def _insertar(db, created_at):
+    db.table("acciones_sistema").insert({"accion": "LOG", "motivo": "prueba", "riesgo": 0.0,
+                                         "created_at": created_at}).execute()
+
+
+def _filas(db):
+    return db.table("acciones_sistema").select("*").execute().data
+
+
+def test_retencion_sin_upstream(tmp_path):
+    db = LocalClient(str(tmp_path / "local.db"), retencion_h=1.0, periodo_poda=0.05)
+    _insertar(db, "2000-01-01T00:00:00.000Z")
+    _insertar(db, time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime()))
+
+    # Sin Supabase nada avanza el cursor de replicación: la poda corre sola y por antigüedad
+    limite = time.monotonic() + 2.0
+    while len(_filas(db)) > 1 and time.monotonic() < limite:
+        time.sleep(0.02)
+    assert [f["created_at"][:4] for f in _filas(db)] == [time.strftime("%Y", time.gmtime())]
+
+
+def test_retencion_con_upstream_respeta_lo_no_replicado(tmp_path):
+    db = LocalClient(str(tmp_path / "local.db"), upstream=object(), periodo=3600, retencion_h=1.0)
+    _insertar(db, "2000-01-01T00:00:00.000Z")
+    assert db._podar(db._con()) == 0
+    assert len(_filas(db)) == 1
@@ -0,0 +1,41 @@
+import json
+
+from replay import Replay
+
+LINE_X = 300
+FPS = 10
+
+
+def escenario(ruta):
+    """Una persona camina de x=100 hasta pasar la línea (x=400), se queda 1 s adentro y se va"""
+    with open(ruta, "w", encoding="utf-8") as f:
+        for i in range(60):
+            x = min(400, 100 + i * 10)
+            datos = {"seq": i + 1, "ts": 1000 + i / FPS, "line_x": LINE_X}
+            if i < 40:
+                datos.update(hay_persona=True, punto_medio_x=x,
+                             personas=[{"id": 1, "x": x, "y": 240, "caja": [x - 40, 100, x + 40, 400],
+                                        "celular": False}])
+            f.write(json.dumps(datos) + "\n")
+    return ruta
+
+
+def test_replay_advertencia_parada_y_acks(tmp_path):
+    r = Replay(line_x=LINE_X)
+    r.correr_log(escenario(tmp_path / "percepciones.jsonl"))
+    rep = r.reporte(1.0)
+
+    acciones = [a["accion"] for a in rep["acciones"]]
+    assert acciones[0] == "ADVERTENCIA"
+    assert "PARADA_TOTAL" in acciones
+    paradas = [a for a in rep["acciones"] if a["accion"] == "PARADA_TOTAL"]
+    # El tiempo hasta la línea adelanta la parada: antes de que la persona la cruce (t = 1002.0)
+    assert paradas[0]["ts"] < 1002.0
+    # Ninguna orden después de que la persona se fue (t >= 1004.0)
+    assert all(a["ts"] < 1004.0 for a in rep["acciones"])
+
+    # Todas las órdenes confirmadas por el ejecutor, y cada parada aplicada a la máquina
+    assert rep["ordenes_sin_ack"] == 0
+    assert [m["estado_operativo"] for m in rep["maquina"]] == ["STOP"] * len(paradas)
+    assert [m["ts"] for m in rep["maquina"]] == [p["ts"] for p in paradas]
+    assert rep["tramos"][-1]["accion"] is None